@@ -2,6 +2,7 @@ from django.urls import path
 from api.address.views import (
     AddressListView,
     AddressTopHoldersListView,
+    AddressTopHolderRankView,
     AddressDetailView,
     AddressAdnrDetailView,
     AddressTokensDetailView,
@@ -10,6 +11,7 @@ from api.address.views import (
 urlpatterns = [
     path("", AddressListView.as_view()),
     path("top-holders/", AddressTopHoldersListView.as_view()),
+    path("top-holders/<str:address>/", AddressTopHolderRankView.as_view()),
     path("adnr/<str:domain>/", AddressAdnrDetailView.as_view()),
     path("<str:address>/", AddressDetailView.as_view()),
     path("<str:address>/tokens/", AddressTokensDetailView.as_view()),
@@ -6,11 +6,15 @@ from rest_framework.response import Response
 
 from api import exceptions
 from api.fungible_token.serializers import FungibleTokenSerializer
-from rbx.models import Address, Transaction
+from rbx.models import Address, AddressLedger, Transaction
 from api.address.serializers import AddressSerializer
 from api.address.querysets import ALL_ADDRESSES_QUERYSET
 from decimal import Decimal
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.db.models import Q
+from django.utils.decorators import method_decorator
+from api.decorators import cache_request
 
 
 class AddressView(GenericAPIView):
@@ -30,10 +34,50 @@ class AddressListView(ListModelMixin, AddressView):
         return self.list(request, *args, **kwargs)
 
 
+TOP_HOLDERS_DEFAULT_LIMIT = 100
+TOP_HOLDERS_MAX_LIMIT = 500
+
+
+def top_holder_row(ledger, rank):
+    return {
+        "rank": rank,
+        "address": ledger.address,
+        "balance": ledger.holdings,
+        "received": ledger.received,
+        "sent": ledger.sent,
+    }
+
+
+@method_decorator(cache_request(settings.CACHE_TIMEOUT_SHORT), name="get")
 class AddressTopHoldersListView(GenericAPIView):
     # This view returns a custom list, so it doesn't need filter backends
 
     def get(self, request, *args, **kwargs):
+        try:
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+            limit = int(request.query_params.get("limit", TOP_HOLDERS_DEFAULT_LIMIT))
+        except ValueError:
+            return Response(
+                {"message": "offset and limit must be integers"}, status=400
+            )
+        limit = min(max(limit, 1), TOP_HOLDERS_MAX_LIMIT)
+
+        if not settings.RBX_ADDRESS_LEDGER:
+            return Response(self.aggregate_top_holders(offset, limit), status=200)
+
+        # Served from the holdings index on AddressLedger, which ingestion
+        # keeps current, so a page costs one index range scan.
+        ledgers = AddressLedger.objects.order_by("-holdings", "address")[
+            offset : offset + limit
+        ]
+
+        top_balances = [
+            top_holder_row(ledger, offset + i + 1) for i, ledger in enumerate(ledgers)
+        ]
+
+        return Response(top_balances, status=200)
+
+    def aggregate_top_holders(self, offset, limit):
         from django.db.models import Sum, F, Value
         from django.db.models.functions import Coalesce
         from django.db.models import Subquery, OuterRef, ExpressionWrapper, DecimalField
@@ -67,20 +111,45 @@ class AddressTopHoldersListView(GenericAPIView):
                     output_field=DecimalField(decimal_places=16, max_digits=32),
                 )
             )
-            .order_by("-balance")[:100]
+            .order_by("-balance")[offset : offset + limit]
         )
 
-        top_balances = [
+        return [
             {
+                "rank": offset + i + 1,
                 "address": row["to_address"],
                 "balance": row["balance"],
                 "received": row["total_received"],
                 "sent": row["total_sent"],
             }
-            for row in received_qs
+            for i, row in enumerate(received_qs)
         ]
 
-        return Response(top_balances, status=200)
+
+@method_decorator(cache_request(settings.CACHE_TIMEOUT_SHORT), name="get")
+class AddressTopHolderRankView(GenericAPIView):
+    def get(self, request, *args, **kwargs):
+        if not settings.RBX_ADDRESS_LEDGER:
+            return Response({"detail": "Ranking unavailable"}, status=503)
+
+        try:
+            ledger = AddressLedger.objects.get(address=kwargs.get("address"))
+        except AddressLedger.DoesNotExist:
+            return Response(
+                {"detail": "Address not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Counting the rows above it walks the same index as the list, with
+        # ties broken by address as the list orders them.
+        rank = (
+            AddressLedger.objects.filter(
+                Q(holdings__gt=ledger.holdings)
+                | Q(holdings=ledger.holdings, address__lt=ledger.address)
+            ).count()
+            + 1
+        )
+
+        return Response(top_holder_row(ledger, rank), status=200)
 
 
 class AddressDetailView(AddressView):
@@ -27,6 +27,7 @@ class BlockView(GenericAPIView):
 
     ordering_fields = ["height"]
     ordering = ["-height"]
+    cursor_ordering = ["-height"]
     filterset_fields = ["master_node"]
 
 
@@ -57,6 +58,7 @@ class BlockAddressView(ListModelMixin, GenericAPIView):
     serializer_class = BlockSerializer
     queryset = ALL_BLOCKS_QUERYSET
     ordering = ["-height"]
+    cursor_ordering = ["-height"]
 
     def get_queryset(self):
         address = self.kwargs.get("address", None)
@@ -4,10 +4,12 @@ from .views import (
     BtcBroadcastView,
     VbtcCompileDataView,
     VbtcDefaultImageView,
+    VbtcBulkListView,
     VbtcListView,
     VbtcListAllView,
     VbtcDetailView,
     VbtcV2ListAllView,
+    VbtcV2BulkListView,
     VbtcV2ListView,
     VbtcV2DetailView,
     VbtcV2TransfersView,
@@ -36,6 +38,7 @@ urlpatterns = [
     path("address/<str:address>/", BtcAddressView.as_view()),
     path("broadcast/", BtcBroadcastView.as_view()),
     path("vbtc/", VbtcListAllView.as_view()),
+    path("vbtc/bulk/", VbtcBulkListView.as_view()),
     path("vbtc/<str:vfx_address>/", VbtcListView.as_view()),
     path("vbtc/detail/<str:sc_identifier>/", VbtcDetailView.as_view()),
     path("vbtc-compile-data/<str:address>/", VbtcCompileDataView.as_view()),
@@ -72,5 +75,6 @@ urlpatterns = [
     path("vbtc-v2/transfers/<str:sc_identifier>/", VbtcV2TransfersView.as_view()),
     path("vbtc-v2/withdrawals/<str:sc_identifier>/", VbtcV2WithdrawalsView.as_view()),
     path("vbtc-v2/", VbtcV2ListAllView.as_view()),
+    path("vbtc-v2/bulk/", VbtcV2BulkListView.as_view()),
     path("vbtc-v2/<str:vfx_address>/", VbtcV2ListView.as_view()),
 ]
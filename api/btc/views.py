@@ -6,7 +6,7 @@ from datetime import datetime
 from django.utils import timezone
 from django.core.cache import cache
 from django.db import close_old_connections
-from django.db.models import Case, F, Value, When
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView, RetrieveAPIView
 from api.btc.constants import FALLBACK_VBTC_IMAGE_DATA
@@ -41,6 +41,7 @@ from rbx.models import (
     Price,
     VbtcToken,
     VbtcTokenAmountTransfer,
+    VbtcV2Balance,
     VbtcV2Token,
     VbtcV2TokenTransfer,
     VbtcV2WithdrawalRequest,
@@ -118,71 +119,101 @@ class VbtcDefaultImageView(GenericAPIView):
         return Response({"data": FALLBACK_VBTC_IMAGE_DATA})
 
 
-class VbtcListView(GenericAPIView):
+# Hidden from the V1 listings and detail page.
+HIDDEN_VBTC_TOKENS = (
+    "2442522a3fd34270b77a64b07eb34b7f:1736792655",
+    "320c5271fc04465cb24c4f1cd48affd4:1736625395",
+)
 
-    def get(self, request, *args, **kwargs):
-        vfx_address = self.kwargs["vfx_address"]
+# Query parameters that opt a token listing into pagination. Without them
+# the listings return every match under "results", as they always have.
+PAGINATION_PARAMS = ("page", "limit")
 
-        transfers = VbtcTokenAmountTransfer.objects.filter(address=vfx_address)
 
-        sc_identifiers = []
-        for transfer in transfers:
-            sc_identifiers.append(transfer.token.sc_identifier)
+def addresses_from_request(request):
+    """The addresses a bulk listing asks for: a JSON list, or an object
+    with an "addresses" list, capped at VBTC_BULK_MAX_ADDRESSES."""
 
-        for token in (
-            VbtcToken.objects.filter(owner_address=vfx_address)
-            .exclude(sc_identifier="2442522a3fd34270b77a64b07eb34b7f:1736792655")
-            .exclude(sc_identifier="320c5271fc04465cb24c4f1cd48affd4:1736625395")
-        ):
-            sc_identifiers.append(token.sc_identifier)
+    data = request.data
+    if isinstance(data, dict):
+        data = data.get("addresses")
+    if not isinstance(data, list) or not all(isinstance(a, str) for a in data):
+        return None
+    return list(dict.fromkeys(data))[: settings.VBTC_BULK_MAX_ADDRESSES]
 
-        tokens = (
-            VbtcToken.objects.filter(sc_identifier__in=sc_identifiers)
-            .exclude(sc_identifier="2442522a3fd34270b77a64b07eb34b7f:1736792655")
-            .exclude(sc_identifier="320c5271fc04465cb24c4f1cd48affd4:1736625395")
-            .order_by('-created_at')
-        )
 
-        results = VbtcTokenSerializer(tokens, many=True).data
+class VbtcTokenListMixin:
+    """Token listings: one filtered query, plus prefetches for whatever the
+    serializer reads per token."""
+
+    def list_response(self, queryset):
+        params = self.request.query_params
+        if any(param in params for param in PAGINATION_PARAMS):
+            page = self.paginate_queryset(queryset)
+            results = self.get_serializer(page, many=True).data
+            return self.get_paginated_response(results)
 
+        results = self.get_serializer(queryset, many=True).data
         return Response({"results": results}, status=200)
 
 
-class VbtcListAllView(GenericAPIView):
+class VbtcBulkListMixin:
+    """POST variant of an address listing, for wallets with many accounts:
+    the tokens held by any of the posted addresses, in one query."""
 
-    def get(self, request, *args, **kwargs):
-        tokens = (
-            VbtcToken.objects.all()
-            .exclude(sc_identifier="2442522a3fd34270b77a64b07eb34b7f:1736792655")
-            .exclude(sc_identifier="320c5271fc04465cb24c4f1cd48affd4:1736625395")
+    http_method_names = ["post", "options"]
+
+    def post(self, request, *args, **kwargs):
+        addresses = addresses_from_request(request)
+        if addresses is None:
+            return Response(
+                {"message": "addresses must be a list of VFX addresses"}, status=400
+            )
+        return self.list_response(self.tokens_for(addresses))
+
+
+class VbtcListView(VbtcTokenListMixin, GenericAPIView):
+    serializer_class = VbtcTokenSerializer
+
+    def tokens_for(self, addresses):
+        # VbtcTokenAmountTransfer.address and owner_address are both indexed.
+        held = VbtcTokenAmountTransfer.objects.filter(
+            token=OuterRef("pk"), address__in=addresses
+        )
+        return (
+            VbtcToken.objects.filter(Q(Exists(held)) | Q(owner_address__in=addresses))
+            .exclude(sc_identifier__in=HIDDEN_VBTC_TOKENS)
+            .select_related("nft")
+            .order_by("-created_at", "-pk")
         )
 
-        transfers = VbtcTokenAmountTransfer.objects.all()
-        sc_identifiers = []
-        for transfer in transfers:
-            sc_identifiers.append(transfer.token.sc_identifier)
+    def get(self, request, *args, **kwargs):
+        return self.list_response(self.tokens_for([self.kwargs["vfx_address"]]))
 
-        for token in (
-            VbtcToken.objects.all()
-            .exclude(sc_identifier="2442522a3fd34270b77a64b07eb34b7f:1736792655")
-            .exclude(sc_identifier="320c5271fc04465cb24c4f1cd48affd4:1736625395")
-        ):
-            sc_identifiers.append(token.sc_identifier)
 
-        tokens = VbtcToken.objects.filter(sc_identifier__in=sc_identifiers).order_by('-created_at')
+class VbtcBulkListView(VbtcBulkListMixin, VbtcListView):
+    pass
 
-        results = VbtcTokenSerializer(tokens, many=True).data
 
-        return Response({"results": results}, status=200)
+class VbtcListAllView(VbtcTokenListMixin, GenericAPIView):
+    serializer_class = VbtcTokenSerializer
+
+    def get(self, request, *args, **kwargs):
+        # Hidden tokens were only ever listed here if they had transfers.
+        transferred = VbtcTokenAmountTransfer.objects.filter(token=OuterRef("pk"))
+        tokens = (
+            VbtcToken.objects.filter(
+                ~Q(sc_identifier__in=HIDDEN_VBTC_TOKENS) | Q(Exists(transferred))
+            )
+            .select_related("nft")
+            .order_by("-created_at", "-pk")
+        )
+        return self.list_response(tokens)
 
 
 class VbtcDetailView(RetrieveAPIView):
     serializer_class = VbtcTokenSerializer
-    queryset = (
-        VbtcToken.objects.all()
-        .exclude(sc_identifier="2442522a3fd34270b77a64b07eb34b7f:1736792655")
-        .exclude(sc_identifier="320c5271fc04465cb24c4f1cd48affd4:1736625395")
-    )
+    queryset = VbtcToken.objects.exclude(sc_identifier__in=HIDDEN_VBTC_TOKENS)
 
     lookup_field = "sc_identifier"
 
@@ -190,36 +221,42 @@ class VbtcDetailView(RetrieveAPIView):
         return self.retrieve(request, *args, **kwargs)
 
 
-class VbtcV2ListAllView(GenericAPIView):
-
-    def get(self, request, *args, **kwargs):
-        tokens = VbtcV2Token.objects.all().order_by("-created_at")
-        results = VbtcV2TokenSerializer(tokens, many=True).data
-        return Response({"results": results}, status=200)
+def vbtc_v2_tokens():
+    return VbtcV2Token.objects.select_related("nft").prefetch_related(
+        "ledger",
+        "withdrawal_requests__request_transaction",
+        "withdrawal_requests__completion_transaction",
+    )
 
 
-class VbtcV2ListView(GenericAPIView):
+class VbtcV2ListAllView(VbtcTokenListMixin, GenericAPIView):
+    serializer_class = VbtcV2TokenSerializer
 
     def get(self, request, *args, **kwargs):
-        vfx_address = self.kwargs["vfx_address"]
+        return self.list_response(vbtc_v2_tokens().order_by("-created_at", "-pk"))
 
-        sc_identifiers = set()
 
-        transfers = VbtcV2TokenTransfer.objects.filter(
-            to_address=vfx_address
-        ) | VbtcV2TokenTransfer.objects.filter(from_address=vfx_address)
-        for transfer in transfers:
-            sc_identifiers.add(transfer.token.sc_identifier)
+class VbtcV2ListView(VbtcTokenListMixin, GenericAPIView):
+    serializer_class = VbtcV2TokenSerializer
 
-        for token in VbtcV2Token.objects.filter(owner_address=vfx_address):
-            sc_identifiers.add(token.sc_identifier)
+    def tokens_for(self, addresses):
+        # Every address a transfer or withdrawal touched has a VbtcV2Balance
+        # row, so the ledger's address index finds the tokens directly.
+        held = VbtcV2Balance.objects.filter(
+            token=OuterRef("pk"), address__in=addresses
+        )
+        return (
+            vbtc_v2_tokens()
+            .filter(Q(Exists(held)) | Q(owner_address__in=addresses))
+            .order_by("-created_at", "-pk")
+        )
 
-        tokens = VbtcV2Token.objects.filter(
-            sc_identifier__in=sc_identifiers
-        ).order_by("-created_at")
+    def get(self, request, *args, **kwargs):
+        return self.list_response(self.tokens_for([self.kwargs["vfx_address"]]))
 
-        results = VbtcV2TokenSerializer(tokens, many=True).data
-        return Response({"results": results}, status=200)
+
+class VbtcV2BulkListView(VbtcBulkListMixin, VbtcV2ListView):
+    pass
 
 
 class VbtcV2DetailView(RetrieveAPIView):
@@ -1,4 +1,4 @@
-from rbx.models import FungibleToken, TokenVoteTopic
+from rbx.models import FungibleToken, FungibleTokenBalance, TokenVoteTopic
 from rest_framework import serializers
 
 
@@ -30,6 +30,15 @@ class FungibleTokenSerializer(serializers.ModelSerializer):
         ]
 
 
+class FungibleTokenHolderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FungibleTokenBalance
+        fields = [
+            "address",
+            "balance",
+        ]
+
+
 class TokenVotingTopicSerializer(serializers.ModelSerializer):
 
     token = FungibleTokenSerializer()
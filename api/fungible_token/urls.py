@@ -1,5 +1,6 @@
 from django.urls import path
 from api.fungible_token.views import (
+    FungibleTokenHoldersListView,
     FungibleTokenListView,
     FungibleTokenRetrieveView,
     TokenVotingTopicListView,
@@ -13,5 +14,6 @@ urlpatterns = [
         TokenVotingTopicDetailView.as_view(),
     ),
     path("<str:sc_identifier>/", FungibleTokenRetrieveView.as_view()),
+    path("<str:sc_identifier>/holders/", FungibleTokenHoldersListView.as_view()),
     path("<str:sc_identifier>/voting-topics/", TokenVotingTopicListView.as_view()),
 ]
@@ -6,10 +6,16 @@ from rest_framework.response import Response
 
 from api import exceptions
 from api.fungible_token.serializers import (
+    FungibleTokenHolderSerializer,
     FungibleTokenSerializer,
     TokenVotingTopicSerializer,
 )
-from rbx.models import Address, FungibleToken, FungibleTokenTx, TokenVoteTopic
+from rbx.models import (
+    Address,
+    FungibleToken,
+    FungibleTokenBalance,
+    TokenVoteTopic,
+)
 from api.address.serializers import AddressSerializer
 from api.address.querysets import ALL_ADDRESSES_QUERYSET
 from decimal import Decimal
@@ -38,22 +44,15 @@ class FungibleTokenRetrieveView(FungibleTokenView, RetrieveModelMixin):
     def get(self, request, *args, **kwargs):
 
         token: FungibleToken = self.get_object()
-        unique_addresses = FungibleTokenTx.objects.filter(token=token).values_list(
-            "receiving_address", "sending_address"
-        )
 
-        unique_addresses = list(
-            address
-            for address_pair in unique_addresses
-            for address in address_pair
-            if address
+        # Every address that ever held or moved the token, plus the current
+        # owner, read from the maintained balances in one query.
+        holders = dict(
+            FungibleTokenBalance.objects.filter(token=token)
+            .order_by("-balance", "address")
+            .values_list("address", "balance")
         )
-
-        addresses = set(unique_addresses + [token.owner_address])
-
-        holders = {}
-        for address in addresses:
-            holders[address] = token.get_address_balance(address)
+        holders.setdefault(token.owner_address, Decimal(0))
 
         data = {
             "token": FungibleTokenSerializer(token).data,
@@ -63,6 +62,21 @@ class FungibleTokenRetrieveView(FungibleTokenView, RetrieveModelMixin):
         return Response(data, status=200)
 
 
+class FungibleTokenHoldersListView(GenericAPIView, ListModelMixin):
+    """Current holders of a token, largest balance first, paginated from the
+    (token, balance) index on FungibleTokenBalance."""
+
+    serializer_class = FungibleTokenHolderSerializer
+
+    def get_queryset(self):
+        return FungibleTokenBalance.objects.filter(
+            token__sc_identifier=self.kwargs["sc_identifier"], balance__gt=0
+        ).order_by("-balance", "address")
+
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+
 class TokenVotingTopicListView(GenericAPIView, ListModelMixin):
 
     serializer_class = TokenVotingTopicSerializer
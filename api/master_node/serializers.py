@@ -20,6 +20,16 @@ class MasterNodeSerializer(serializers.ModelSerializer):
         ]
 
 
+class MasterNodeDetailSerializer(MasterNodeSerializer):
+    production = serializers.SerializerMethodField()
+
+    class Meta(MasterNodeSerializer.Meta):
+        fields = MasterNodeSerializer.Meta.fields + ["production"]
+
+    def get_production(self, obj):
+        return obj.production()
+
+
 class MasterNodeListSerializer(serializers.ModelSerializer):
     class Meta:
         model = MasterNode
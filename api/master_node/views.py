@@ -1,5 +1,3 @@
-import requests
-import json
 from rest_framework import status, filters
 from rest_framework.generics import GenericAPIView
 from rest_framework.mixins import (
@@ -14,6 +12,7 @@ from django_filters.rest_framework import DjangoFilterBackend
 from api import exceptions
 from api.pagination import MasterNodePagination
 from api.master_node.serializers import (
+    MasterNodeDetailSerializer,
     MasterNodeListSerializer,
     MasterNodeSerializer,
     MasterNodeCompactListSerializer,
@@ -21,6 +20,7 @@ from api.master_node.serializers import (
 )
 from api.master_node.querysets import ALL_MASTER_NODES_QUERYSET
 from rbx.models import SentMasterNode
+from rbx.tasks import forward_master_nodes
 
 from django.conf import settings
 from django.utils.decorators import method_decorator
@@ -71,6 +71,7 @@ class MasterNodeMapView(ListModelMixin, MasterNodeView):
 @method_decorator(cache_request(settings.CACHE_TIMEOUT_DEFAULT), name="get")
 class MasterNodeDetailView(RetrieveModelMixin, MasterNodeView):
     lookup_field = "address"
+    serializer_class = MasterNodeDetailSerializer
 
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
@@ -79,7 +80,7 @@ class MasterNodeDetailView(RetrieveModelMixin, MasterNodeView):
 class MasterNodeNameLookupView(RetrieveModelMixin, MasterNodeView):
 
     lookup_field = "name"
-    serializer_class = MasterNodeSerializer
+    serializer_class = MasterNodeDetailSerializer
 
     def get(self, request, *args, **kwargs):
         return self.retrieve(request, *args, **kwargs)
@@ -104,49 +105,10 @@ class SendMasterNodesView(ListModelMixin, CreateModelMixin, GenericAPIView):
             if not data:
                 return Response({"success": False, "message": "No data"}, status=400)
 
-            for d in data:
-
-                try:
-                    mn = SentMasterNode.objects.get(address=d["Address"])
-                except SentMasterNode.DoesNotExist:
-                    mn = SentMasterNode(address=d["Address"])
-
-                mn.name = d["UniqueName"]
-                mn.ip_address = d["IpAddress"]
-                mn.wallet_version = d["WalletVersion"]
-                mn.date_connected = d["ConnectDate"]
-                mn.last_answer = d["LastAnswerSendDate"]
-                mn.save()
-
-                # mn, created = SentMasterNode.objects.get_or_create(
-                #     address=d["Address"],
-                #     defaults={
-                #         "name": d["UniqueName"],
-                #         "ip_address": d["IpAddress"],
-                #         "wallet_version": d["WalletVersion"],
-                #         "date_connected": d["ConnectDate"],
-                #         "last_answer": d["LastAnswerSendDate"],
-                #     },
-                # )
-                # if not created:
-                #     mn.name = d["UniqueName"]
-                #     mn.ip_address = d["IpAddress"]
-                #     mn.wallet_version = d["WalletVersion"]
-                #     mn.date_connected = d["ConnectDate"]
-                #     mn.last_answer = d["LastAnswerSendDate"]
-                #     mn.save()
+            SentMasterNode.upsert(data)
 
             if settings.RBX_FORWARD_SEND_MASTER_NODES:
-                payload = self.request.data
-
-                requests.post(
-                    settings.RBX_FORWARD_SEND_MASTER_NODES,
-                    headers={
-                        "Content-Type": "application/json",
-                        "Accept": "application/json",
-                    },
-                    data=json.dumps(payload),
-                )
+                forward_master_nodes(data)
 
             return Response({"success": True}, status=200)
         except Exception as e:
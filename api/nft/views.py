@@ -27,6 +27,7 @@ class NftView(GenericAPIView):
     filterset_class = NftFilter
 
     search_fields = ["name", "identifier"]
+    cursor_ordering = ["-minted_at", "-identifier"]
 
 
 class NftListView(ListModelMixin, NftView):
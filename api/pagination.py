@@ -1,15 +1,153 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
+from rbx.models import Block, ChainTotals, Transaction
+
+
+def is_unfiltered(queryset):
+    query = queryset.query
+    return (
+        not query.where
+        and not query.distinct
+        and not query.combinator
+        and not query.low_mark
+        and query.high_mark is None
+    )
+
+
+def maintained_count(queryset):
+    """Row counts block ingestion keeps in ChainTotals, once it covers the
+    whole chain."""
+
+    if queryset.model not in (Block, Transaction):
+        return None
+
+    # Not current_totals(): unbuilt totals fall back to aggregating the whole
+    # chain, which costs more than the count this saves.
+    totals = ChainTotals.load()
+    if not totals.rebuilt_at:
+        return None
+
+    if queryset.model is Block:
+        return totals.block_count
+    return totals.indexed_transaction_count
+
+
+def estimated_count(queryset):
+    """The planner's row estimate for the table, or None while the table is
+    small enough to count exactly (or has never been analysed)."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+
+    if not row or row[0] < settings.API_COUNT_ESTIMATE_THRESHOLD:
+        return None
+    return row[0]
+
+
+def cached_count(queryset):
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+
+    key = (
+        f"{settings.API_COUNT_CACHE_PREFIX}"
+        f"{hashlib.sha1(sql.encode('utf-8')).hexdigest()}"
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.API_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def queryset_count(queryset):
+    if not isinstance(queryset, QuerySet):
+        return len(queryset)
+
+    if is_unfiltered(queryset):
+        for strategy in (maintained_count, estimated_count):
+            count = strategy(queryset)
+            if count is not None:
+                return count
+
+    return cached_count(queryset)
+
+
+class CountingPaginator(Paginator):
+    """A Paginator whose count avoids exact COUNT(*)s over large tables:
+
+    - unfiltered blocks and transactions use the totals ingestion maintains;
+    - other unfiltered tables past API_COUNT_ESTIMATE_THRESHOLD rows use the
+      planner estimate;
+    - everything else is counted exactly and cached per query.
+
+    Counts can therefore lag the table by a little, which page numbers
+    tolerate; the rows on each page are always read live.
+    """
+
+    @cached_property
+    def count(self):
+        return queryset_count(self.object_list)
+
 
 class StandardPagination(PageNumberPagination):
+    django_paginator_class = CountingPaginator
     last_page_strings = ["last"]
     max_page_size = 500
     page_query_param = "page"
     page_size = 30
     page_size_query_param = "limit"
 
+    # Keyset pagination, opted into per request with ?cursor= (empty for the
+    # first page) on views that declare a cursor_ordering, e.g.
+    # ("-date_crafted", "-hash"). The ordering must end in a unique field.
+    # Each page is one indexed range query with no COUNT(*) and no OFFSET, so
+    # deep pages cost the same as the first. Cursors are opaque to clients.
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_page = None
+
+        ordering = getattr(view, "cursor_ordering", None)
+        if (
+            ordering
+            and self.cursor_query_param in request.query_params
+            and hasattr(queryset, "filter")
+        ):
+            return self.paginate_cursor(queryset, request, ordering)
+
+        return super().paginate_queryset(queryset, request, view)
+
     def get_paginated_response(self, data):
+        if self.cursor_page is not None:
+            return Response(
+                {
+                    "next": self.next_cursor,
+                    "previous": self.previous_cursor,
+                    "results": data,
+                }
+            )
+
         return Response(
             {
                 "count": self.page.paginator.count,
@@ -19,6 +157,90 @@ class StandardPagination(PageNumberPagination):
             }
         )
 
+    def paginate_cursor(self, queryset, request, ordering):
+        page_size = self.get_page_size(request)
+        fields = [queryset.model._meta.get_field(o.lstrip("-")) for o in ordering]
+
+        position, backwards = self.decode_cursor(
+            request.query_params[self.cursor_query_param], fields
+        )
+
+        if backwards:
+            ordering = [o[1:] if o.startswith("-") else f"-{o}" for o in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        rows = list(queryset[: page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if backwards:
+            rows.reverse()
+
+        has_next = has_more if not backwards else position is not None
+        has_previous = has_more if backwards else position is not None
+
+        self.next_cursor = (
+            self.encode_cursor(rows[-1], fields, backwards=False)
+            if rows and has_next
+            else None
+        )
+        self.previous_cursor = (
+            self.encode_cursor(rows[0], fields, backwards=True)
+            if rows and has_previous
+            else None
+        )
+
+        self.cursor_page = rows
+        return rows
+
+    def after(self, ordering, position):
+        """Rows strictly after `position` in `ordering`: for (a, b) that is
+        a > a0 OR (a = a0 AND b > b0), with > flipped on descending fields."""
+
+        condition = Q()
+        for i in reversed(range(len(ordering))):
+            name = ordering[i].lstrip("-")
+            lookup = "lt" if ordering[i].startswith("-") else "gt"
+            step = Q(**{f"{name}__{lookup}": position[i]})
+            if i < len(ordering) - 1:
+                step |= Q(**{name: position[i]}) & condition
+            condition = step
+        return condition
+
+    def encode_cursor(self, obj, fields, backwards):
+        payload = {
+            "p": [field.value_to_string(obj) for field in fields],
+            "b": backwards,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8"))
+        return encoded.decode("ascii")
+
+    def decode_cursor(self, cursor, fields):
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            values = payload["p"]
+            if len(values) != len(fields):
+                raise ValueError
+            position = [
+                field.to_python(value) for field, value in zip(fields, values)
+            ]
+            return position, bool(payload["b"])
+        except (
+            binascii.Error,
+            UnicodeError,
+            ValueError,
+            KeyError,
+            TypeError,
+            ValidationError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
 
 class MasterNodePagination(StandardPagination):
     page_size = 15000
@@ -1,3 +1,3 @@
 from rbx.models import Transaction
 
-ALL_TRANSACTIONS_QUERYSET = Transaction.objects.all()
+ALL_TRANSACTIONS_QUERYSET = Transaction.objects.select_related("nft")
@@ -1,3 +1,4 @@
+from django.db import models
 from rest_framework import serializers
 
 from rbx.models import Transaction, Nft
@@ -28,6 +29,14 @@ class SubTransactionSerializer(serializers.ModelSerializer):
         ]
 
 
+class TransactionListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        transactions = list(iterable)
+        Transaction.prefetch_details(transactions)
+        return super().to_representation(transactions)
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     nft = NftSerializer(many=False)
     callback_details = SubTransactionSerializer(many=False)
@@ -35,6 +44,7 @@ class TransactionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Transaction
+        list_serializer_class = TransactionListSerializer
         fields = [
             "hash",
             "height",
@@ -7,7 +7,6 @@ from rest_framework.response import Response
 from api import exceptions
 from api.transaction.serializers import TransactionSerializer
 from api.transaction.querysets import ALL_TRANSACTIONS_QUERYSET
-from rbx.models import Transaction
 from django.conf import settings
 from django.db.models import Q
 from django.utils.decorators import method_decorator
@@ -20,6 +19,7 @@ class TransactionView(GenericAPIView):
 
     ordering_fields = ["date_crafted"]
     ordering = ["-date_crafted"]
+    cursor_ordering = ["-date_crafted", "-hash"]
     search_fields = ["hash", "to_address", "from_address"]
 
 
@@ -36,7 +36,7 @@ class TransactionBlockListView(ListModelMixin, TransactionView):
         if not height:
             return []
 
-        return Transaction.objects.filter(height=height)
+        return ALL_TRANSACTIONS_QUERYSET.filter(height=height)
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
@@ -57,7 +57,7 @@ class TransactionQueryListView(ListModelMixin, TransactionView):
         if not address:
             return []
 
-        return Transaction.objects.filter(
+        return ALL_TRANSACTIONS_QUERYSET.filter(
             Q(to_address=address) | Q(from_address=address)
         )
 
@@ -74,7 +74,7 @@ class TransactionMultiAddressListView(ListModelMixin, TransactionView):
 
         address_list = addresses.split(",")
 
-        return Transaction.objects.filter(
+        return ALL_TRANSACTIONS_QUERYSET.filter(
             Q(to_address__in=address_list) | Q(from_address__in=address_list)
         )
 
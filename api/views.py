@@ -1,21 +1,13 @@
-import json
-import datetime
-from django.utils import timezone
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from rbx.models import Circulation, NetworkMetrics
-from rbx.tasks import sync_circulation, sync_network_metrics
+from rbx.snapshots import load_snapshot
 from django.conf import settings
 
 
 @api_view(("GET",))
 def circulation(request):
-    circulation = Circulation.load()
-    if not circulation:
-        sync_circulation()
-    elif circulation.updated_at < timezone.now() - datetime.timedelta(seconds=30):
-        sync_circulation()
+    circulation = load_snapshot("circulation")
 
     data = {
         "balance": circulation.balance,
@@ -34,11 +26,7 @@ def circulation(request):
 
 @api_view(("GET",))
 def network_metrics(request):
-    nm = NetworkMetrics.load()
-    if not nm:
-        sync_network_metrics()
-    elif nm.created_at < timezone.now() - datetime.timedelta(seconds=10):
-        sync_network_metrics()
+    nm = load_snapshot("network_metrics")
 
     data = {
         "block_difference_average": nm.block_difference_average,
@@ -52,10 +40,7 @@ def network_metrics(request):
 
 @api_view(("GET",))
 def circulation_balance(request):
-    circulation = Circulation.load()
-
-    if circulation.updated_at < timezone.now() - datetime.timedelta(seconds=30):
-        sync_circulation()
+    circulation = load_snapshot("circulation")
 
     return Response(
         circulation.balance, status=status.HTTP_200_OK, content_type="text/plain"
@@ -64,10 +49,7 @@ def circulation_balance(request):
 
 @api_view(("GET",))
 def lifetime_balance(request):
-    circulation = Circulation.load()
-
-    if circulation.updated_at < timezone.now() - datetime.timedelta(seconds=30):
-        sync_circulation()
+    circulation = load_snapshot("circulation")
 
     return Response(
         circulation.lifetime_supply,
@@ -1,5 +1,7 @@
 import logging
 from decimal import Decimal
+from functools import partial
+from time import sleep
 
 import requests
 from django.conf import settings
@@ -8,6 +10,9 @@ logger = logging.getLogger(__name__)
 
 _SATS = Decimal(100_000_000)
 
+MEMPOOL_API = "https://mempool.space/api"
+BLOCKSTREAM_API = "https://blockstream.info/api"
+
 
 class BtcClient:
     """
@@ -48,28 +53,53 @@ class BtcClient:
 
     # ------------------------------------------------------------- balance
 
-    def get_balance(self, address: str):
+    def balance_providers(self):
+        """The mainnet provider chain as `(name, fetch)` pairs, in order of
+        preference."""
+        providers = [
+            ("mempool.space", partial(self._balance_esplora, base_url=MEMPOOL_API)),
+            (
+                "blockstream.info",
+                partial(self._balance_esplora, base_url=BLOCKSTREAM_API),
+            ),
+            ("blockdaemon", self._balance_blockdaemon),
+            ("blockchain.info", self._balance_blockchain_info),
+        ]
+        if not settings.BLOCKDAEMON_API_KEY:
+            providers = [p for p in providers if p[0] != "blockdaemon"]
+        return providers
+
+    def get_balance(self, address: str, limiters=None):
         """Returns `{total_received, total_sent, balance, tx_count}` in BTC
         Decimals, or None if every provider failed.
 
         The Blockdaemon rung returns `{"balance": ..., "partial": True}` —
         its API has no total_received/total_sent/tx_count, so callers must
         only update the balance field from a partial result.
+
+        `limiters` maps provider names to btc.sweep.TokenBucket. With them,
+        each rung is only called when its bucket has a token, and a rung that
+        is out of tokens is passed over for the next one with capacity rather
+        than waited on — so concurrent callers spill from mempool.space onto
+        the other rungs instead of queueing behind it. Providers without a
+        limiter are never throttled.
         """
         if self.is_testnet:
-            return self._balance_blockbook(address)
+            return self._call_limited(
+                "blockbook", lambda: self._balance_blockbook(address), limiters
+            )
 
-        providers = [
-            ("mempool.space", self._balance_esplora, "https://mempool.space/api"),
-            ("blockstream.info", self._balance_esplora, "https://blockstream.info/api"),
-            ("blockdaemon", self._balance_blockdaemon, None),
-            ("blockchain.info", self._balance_blockchain_info, None),
-        ]
-        for name, fetch, base in providers:
-            if name == "blockdaemon" and not settings.BLOCKDAEMON_API_KEY:
+        pending = self.balance_providers()
+        while pending:
+            chosen = self._next_available(pending, limiters)
+            if chosen is None:
+                sleep(min(limiters[name].wait_time() for name, _ in pending))
                 continue
+
+            pending.remove(chosen)
+            name, fetch = chosen
             try:
-                result = fetch(address, base) if base else fetch(address)
+                result = fetch(address)
                 if result is not None:
                     return result
             except Exception as e:
@@ -79,6 +109,64 @@ class BtcClient:
         logger.error(f"BtcClient.get_balance(): all providers failed for {address}")
         return None
 
+    @staticmethod
+    def _next_available(providers, limiters):
+        for name, fetch in providers:
+            limiter = (limiters or {}).get(name)
+            if limiter is None or limiter.try_acquire():
+                return name, fetch
+        return None
+
+    @staticmethod
+    def _call_limited(name, call, limiters):
+        limiter = (limiters or {}).get(name)
+        if limiter is not None:
+            limiter.acquire()
+        return call()
+
+    def get_tip_hash(self, limiters=None):
+        """Hash of the chain tip, or None if it could not be fetched.
+
+        Confirmed balances only change when the tip does, so the balance sweep
+        uses this to skip addresses it has already read at the current tip.
+        """
+        if self.is_testnet:
+            try:
+                data = self._call_limited(
+                    "blockbook",
+                    lambda: self._get_json(self.base_url),
+                    limiters,
+                )
+                return data["backend"]["bestBlockHash"]
+            except Exception as e:
+                logger.warning(f"BtcClient.get_tip_hash() failed: {e}")
+                return None
+
+        for name, base_url in (
+            ("mempool.space", MEMPOOL_API),
+            ("blockstream.info", BLOCKSTREAM_API),
+        ):
+            try:
+                response = self._call_limited(
+                    name,
+                    lambda: requests.get(
+                        f"{base_url}/blocks/tip/hash",
+                        headers=self.headers,
+                        timeout=(5, 10),
+                    ),
+                    limiters,
+                )
+                response.raise_for_status()
+                return response.text.strip()
+            except Exception as e:
+                logger.warning(f"BtcClient.get_tip_hash() provider {name} failed: {e}")
+        return None
+
+    def _get_json(self, url):
+        response = requests.get(url, headers=self.headers, timeout=(5, 10))
+        response.raise_for_status()
+        return response.json()
+
     def _balance_esplora(self, address: str, base_url: str):
         """mempool.space / blockstream.info — identical Esplora response shape.
         chain_stats is confirmed-only, which matches the semantics of the
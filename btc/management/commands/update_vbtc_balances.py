@@ -1,40 +1,43 @@
-from time import sleep
 from django.core.management.base import BaseCommand
-from btc.btc_client import BtcClient
+from btc.sweep import sweep_balances
 from rbx.models import VbtcV2Token
 from tqdm import tqdm
 
 """
-python manage.py update_vbtc_balances
+python manage.py update_vbtc_balances [--workers 8] [--force]
 """
 
 
 class Command(BaseCommand):
+    help = "Refresh vBTC v2 deposit address balances from the BTC providers"
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent lookups (defaults to BTC_SWEEP_WORKERS)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Also re-read tokens already read at the current chain tip",
+        )
 
-        client = BtcClient()
+    def handle(self, *args, **options):
 
-        tokens = VbtcV2Token.objects.all()
-        with tqdm(desc="Updating vBTC v2 Balances", total=len(tokens)) as progress:
-            for token in tokens:
-                balance_info = client.get_balance(token.deposit_address)
-                if balance_info:
-                    # Targeted update — a full save() would clobber fields
-                    # written by the vbtc-worker between read and save.
-                    update_fields = {"global_balance": balance_info["balance"]}
-                    if not balance_info.get("partial"):
-                        # The Blockdaemon rung only knows the current balance —
-                        # never zero the historical fields from a partial result.
-                        update_fields.update(
-                            total_received=balance_info["total_received"],
-                            total_sent=balance_info["total_sent"],
-                            tx_count=balance_info["tx_count"],
-                        )
-                    VbtcV2Token.objects.filter(pk=token.pk).update(**update_fields)
+        # Pacing lives in the per-provider token buckets
+        # (BTC_PROVIDER_RATE_LIMITS), which keep each free provider under
+        # its limit however many tokens there are.
+        total = VbtcV2Token.objects.count()
+        with tqdm(desc="Updating vBTC v2 Balances", total=total) as progress:
+            result = sweep_balances(
+                workers=options["workers"],
+                force=options["force"],
+                progress=progress,
+            )
 
-                # 2s spacing keeps the sweep polite to the free providers —
-                # the provider chain makes a sweep resilient, but pacing is
-                # what keeps us off their ban lists in the first place.
-                sleep(2)
-                progress.update()
+        self.stdout.write(
+            f"Checked {result.checked}, skipped {result.skipped} at the current tip, "
+            f"updated {result.updated}, failed {result.failed}"
+        )
@@ -0,0 +1,167 @@
+"""Concurrent vBTC balance sweep.
+
+Balance lookups run on a thread pool and are paced per provider by token
+buckets, so the sweep is bounded by the providers' rate limits rather than a
+fixed sleep per token. Results are written back in batches from the calling
+thread; the workers only do HTTP.
+
+A token whose deposit address was last read at the current chain tip is
+skipped: confirmed balances cannot change until the next block. Providers can
+trail the tip by a few seconds, so a balance read just after a block may
+still miss it — the next block brings the token back into the sweep.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models import Q
+
+from btc.btc_client import BtcClient
+from rbx.models import VbtcV2Token
+
+logger = logging.getLogger(__name__)
+
+FULL_FIELDS = ["global_balance", "total_received", "total_sent", "tx_count"]
+PARTIAL_FIELDS = ["global_balance"]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` calls per second on average, with
+    bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = 1, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def try_acquire(self) -> bool:
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available."""
+        with self.lock:
+            self._refill()
+            return max(0.0, (1 - self.tokens) / self.rate)
+
+    def acquire(self) -> None:
+        while not self.try_acquire():
+            time.sleep(self.wait_time())
+
+
+def provider_limiters(rates: Optional[Dict[str, float]] = None) -> dict:
+    rates = settings.BTC_PROVIDER_RATE_LIMITS if rates is None else rates
+    return {
+        name: TokenBucket(rate, capacity=settings.BTC_PROVIDER_BURST)
+        for name, rate in rates.items()
+    }
+
+
+@dataclass
+class SweepResult:
+    checked: int = 0
+    skipped: int = 0
+    updated: int = 0
+    failed: int = 0
+
+
+def apply_balances(results) -> None:
+    """Write `(token, balance_info, tip)` results back in bulk.
+
+    Only the balance columns and balance_tip are written, so fields the
+    vbtc-worker updates concurrently are never clobbered. Partial (Blockdaemon)
+    results only carry the current balance and leave the historical totals
+    alone.
+    """
+
+    full, partial = [], []
+    for token, info, tip in results:
+        token.global_balance = info["balance"]
+        token.balance_tip = tip
+        if info.get("partial"):
+            partial.append(token)
+        else:
+            token.total_received = info["total_received"]
+            token.total_sent = info["total_sent"]
+            token.tx_count = info["tx_count"]
+            full.append(token)
+
+    if full:
+        VbtcV2Token.objects.bulk_update(full, FULL_FIELDS + ["balance_tip"])
+    if partial:
+        VbtcV2Token.objects.bulk_update(partial, PARTIAL_FIELDS + ["balance_tip"])
+
+
+def sweep_balances(
+    client: Optional[BtcClient] = None,
+    limiters: Optional[dict] = None,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    force: bool = False,
+    progress=None,
+) -> SweepResult:
+    """Refresh the balance of every vBTC v2 token not yet read at the tip."""
+
+    client = client or BtcClient()
+    limiters = provider_limiters() if limiters is None else limiters
+    workers = workers or settings.BTC_SWEEP_WORKERS
+    batch_size = batch_size or settings.BTC_SWEEP_BATCH_SIZE
+
+    tokens = VbtcV2Token.objects.only("pk", "deposit_address", "balance_tip")
+    total = tokens.count()
+
+    tip = client.get_tip_hash(limiters)
+    if tip and not force:
+        tokens = tokens.filter(~Q(balance_tip=tip))
+    tokens = list(tokens.order_by("pk"))
+
+    result = SweepResult(checked=len(tokens), skipped=total - len(tokens))
+    if progress:
+        progress.update(result.skipped)
+
+    def fetch(token):
+        try:
+            return client.get_balance(token.deposit_address, limiters)
+        except Exception as e:
+            logger.error(f"Balance sweep failed for {token.deposit_address}: {e}")
+            return None
+
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for token, info in zip(tokens, pool.map(fetch, tokens)):
+            if info:
+                pending.append((token, info, tip or ""))
+            else:
+                result.failed += 1
+
+            if len(pending) >= batch_size:
+                apply_balances(pending)
+                result.updated += len(pending)
+                pending = []
+
+            if progress:
+                progress.update()
+
+    apply_balances(pending)
+    result.updated += len(pending)
+
+    return result
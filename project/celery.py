@@ -36,6 +36,7 @@ def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(
         10 * 60, expire_stale_withdrawals.s(), name="Expire Stale Withdrawals"
     )
+    sender.add_periodic_task(60, sweep_address_locks.s(), name="Sweep Address Locks")
 
     if settings.HEALTH_CHECK_ENABLED:
         sender.add_periodic_task(3 * 60, health_check.s(), name="Health Check")
@@ -119,6 +120,13 @@ def expire_stale_withdrawals():
     management.call_command("expire_stale_withdrawals")
 
 
+@app.task
+def sweep_address_locks():
+    from django.core import management
+
+    management.call_command("sweep_address_locks")
+
+
 @app.task(queue="vbtc_queue")
 def update_vbtc_balances():
     from django.core import management
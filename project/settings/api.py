@@ -5,6 +5,13 @@ API_DEFAULT_LIMIT = ENV.int("API_DEFAULT_LIMIT", default=10)
 API_MAX_LIMIT = ENV.int("API_MAX_LIMIT", default=100)
 API_THROTTLE_ENABLED = ENV.bool("API_THROTTLE_ENABLED", default=True)
 API_AUTH_REQUIRED = ENV.bool("API_AUTH_REQUIRED", default=True)
+
+# Paginated list counts (api.pagination.CountingPaginator). Filtered counts
+# are cached per query for API_COUNT_CACHE_TIMEOUT seconds; unfiltered tables
+# with more rows than API_COUNT_ESTIMATE_THRESHOLD report the planner estimate.
+API_COUNT_CACHE_TIMEOUT = ENV.int("API_COUNT_CACHE_TIMEOUT", default=60)
+API_COUNT_CACHE_PREFIX = ENV.str("API_COUNT_CACHE_PREFIX", default="count_")
+API_COUNT_ESTIMATE_THRESHOLD = ENV.int("API_COUNT_ESTIMATE_THRESHOLD", default=100000)
 # Django REST Framework
 # https://www.django-rest-framework.org
 
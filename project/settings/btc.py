@@ -7,3 +7,20 @@ CRYPTO_API_KEY = ENV.str("CRYPTO_API_KEY")
 BLOCKDAEMON_API_KEY = ENV.str("BLOCKDAEMON_API_KEY", default="")
 
 SATOSHI_TO_BTC_MULTIPLIER = 0.00000001
+
+# vBTC balance sweep (update_vbtc_balances). Lookups run concurrently and are
+# paced per provider in requests per second; a provider that is out of budget
+# is passed over for the next rung of the chain.
+BTC_SWEEP_WORKERS = ENV.int("BTC_SWEEP_WORKERS", default=8)
+BTC_SWEEP_BATCH_SIZE = ENV.int("BTC_SWEEP_BATCH_SIZE", default=100)
+BTC_PROVIDER_BURST = ENV.int("BTC_PROVIDER_BURST", default=2)
+BTC_PROVIDER_RATE_LIMITS = {
+    "mempool.space": ENV.float("BTC_RATE_MEMPOOL", default=1.0),
+    "blockstream.info": ENV.float("BTC_RATE_BLOCKSTREAM", default=1.0),
+    "blockdaemon": ENV.float("BTC_RATE_BLOCKDAEMON", default=2.0),
+    "blockchain.info": ENV.float("BTC_RATE_BLOCKCHAIN_INFO", default=0.1),
+    "blockbook": ENV.float("BTC_RATE_BLOCKBOOK", default=0.5),
+}
+
+# Most addresses one bulk vBTC listing request may ask about.
+VBTC_BULK_MAX_ADDRESSES = ENV.int("VBTC_BULK_MAX_ADDRESSES", default=100)
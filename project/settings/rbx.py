@@ -13,6 +13,29 @@ RBX_IP_LOCATION_CACHE_PREFIX = ENV.str("RBX_IP_LOCATION_CACHE_PREFIX", default="
 
 RBX_WALLET_ADDRESS = ENV.str("RBX_WALLET_ADDRESS")
 
+# Pooled HTTP session for wallet CLI calls (rbx.http). Timeouts are the default
+# for calls that do not set their own; only GETs are retried.
+RBX_HTTP_POOL_SIZE = ENV.int("RBX_HTTP_POOL_SIZE", default=16)
+RBX_HTTP_CONNECT_TIMEOUT = ENV.float("RBX_HTTP_CONNECT_TIMEOUT", default=5)
+RBX_HTTP_READ_TIMEOUT = ENV.float("RBX_HTTP_READ_TIMEOUT", default=60)
+RBX_HTTP_RETRIES = ENV.int("RBX_HTTP_RETRIES", default=2)
+RBX_HTTP_BACKOFF = ENV.float("RBX_HTTP_BACKOFF", default=0.5)
+RBX_HTTP_SLOW_CALL = ENV.float("RBX_HTTP_SLOW_CALL", default=10)
+
+# Batched block ingestion (sync_blocks --batch). A window is fetched
+# concurrently and committed in one database transaction.
+RBX_SYNC_WINDOW = ENV.int("RBX_SYNC_WINDOW", default=100)
+RBX_SYNC_WORKERS = ENV.int("RBX_SYNC_WORKERS", default=8)
+
+# Serve address balances from AddressLedger. The ledger is always maintained
+# during ingestion; enable reads once rebuild_address_ledger has been run.
+RBX_ADDRESS_LEDGER = ENV.bool("RBX_ADDRESS_LEDGER", default=False)
+
+# Stale-while-revalidate singletons (rbx.snapshots). The lock timeout bounds
+# how long a lost refresh task can block the next one.
+RBX_SNAPSHOT_LOCK_PREFIX = ENV.str("RBX_SNAPSHOT_LOCK_PREFIX", default="snapshot_")
+RBX_SNAPSHOT_LOCK_TIMEOUT = ENV.int("RBX_SNAPSHOT_LOCK_TIMEOUT", default=120)
+
 
 # SHOP WALLET
 RBX_SHOP_WALLET_IP = ENV.str("RBX_SHOP_WALLET_IP")
@@ -21,6 +44,21 @@ RBX_SHOP_WALLET_USERNAME = ENV.str("RBX_SHOP_WALLET_USERNAME", default="root")
 RBX_SHOP_KEYPAIR_ADDRESS = ENV.str("RBX_SHOP_KEYPAIR_ADDRESS")
 RBX_SHOP_CRAWLER_ADDRESS = ENV.str("RBX_SHOP_CRAWLER_ADDRESS")
 RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS = ENV.str("RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS")
+# Liveness checks (shop.crawler): how many shops are checked at once, how
+# long one shop may take before it counts as offline, and how often a
+# pending ping is polled.
+RBX_SHOP_CHECK_WORKERS = ENV.int("RBX_SHOP_CHECK_WORKERS", default=16)
+RBX_SHOP_CHECK_DEADLINE = ENV.float("RBX_SHOP_CHECK_DEADLINE", default=15)
+RBX_SHOP_PING_INTERVAL = ENV.float("RBX_SHOP_PING_INTERVAL", default=0.5)
+# Shop data fetch (rbx.client.get_shop_data): GetDecShopData is polled from
+# RBX_SHOP_DATA_POLL_MIN seconds apart, doubling up to RBX_SHOP_DATA_POLL_MAX,
+# until the shop's listings have arrived or RBX_SHOP_DATA_TIMEOUT passes, and
+# then until its auctions have and the data has not changed for
+# RBX_SHOP_DATA_POLL_MAX seconds, or RBX_SHOP_AUCTION_DATA_TIMEOUT passes.
+RBX_SHOP_DATA_POLL_MIN = ENV.float("RBX_SHOP_DATA_POLL_MIN", default=0.25)
+RBX_SHOP_DATA_POLL_MAX = ENV.float("RBX_SHOP_DATA_POLL_MAX", default=2)
+RBX_SHOP_DATA_TIMEOUT = ENV.float("RBX_SHOP_DATA_TIMEOUT", default=30)
+RBX_SHOP_AUCTION_DATA_TIMEOUT = ENV.float("RBX_SHOP_AUCTION_DATA_TIMEOUT", default=10)
 
 RBX_WALLET_TEMP_PATH = ENV.str("RBX_WALLET_ASSET_PATH", default="/tmp")
 RBX_SHOP_ASSETS_FOLDER_PATH = ENV.str(
@@ -29,8 +67,29 @@ RBX_SHOP_ASSETS_FOLDER_PATH = ENV.str(
 
 RBX_WALLET_SSH_KEY_FILENAME = ENV.str("RBX_WALLET_SSH_KEY_FILENAME", default="id_rsa")
 RBX_WALLET_SSH_KEY_PATH = os.path.join(RBX_TEMP_PATH, RBX_WALLET_SSH_KEY_FILENAME)
+RBX_WALLET_SSH_PORT = ENV.int("RBX_WALLET_SSH_PORT", default=22)
+# Pooled SSH connections for shop media transfers (shop.sftp): connections
+# kept per host, seconds before an idle one is closed, and files pulled at
+# once from a remote folder.
+RBX_SFTP_POOL_SIZE = ENV.int("RBX_SFTP_POOL_SIZE", default=4)
+RBX_SFTP_IDLE_TIMEOUT = ENV.int("RBX_SFTP_IDLE_TIMEOUT", default=60)
+RBX_SFTP_TRANSFER_WORKERS = ENV.int("RBX_SFTP_TRANSFER_WORKERS", default=4)
+# Listing thumbnail previews (shop.thumbnails): preview width in pixels, the
+# largest asset that is downloaded to render one (the upload limit), and how
+# long a preview is remembered by content hash (None keeps it indefinitely).
+RBX_THUMBNAIL_WIDTH = ENV.int("RBX_THUMBNAIL_WIDTH", default=512)
+RBX_THUMBNAIL_MAX_DOWNLOAD = ENV.int("RBX_THUMBNAIL_MAX_DOWNLOAD", default=157286400)
+RBX_THUMBNAIL_CACHE_PREFIX = ENV.str(
+    "RBX_THUMBNAIL_CACHE_PREFIX", default="thumbnail_preview_"
+)
+RBX_THUMBNAIL_CACHE_TIMEOUT = ENV.int("RBX_THUMBNAIL_CACHE_TIMEOUT", default=None)
 
 RBX_FORWARD_SEND_MASTER_NODES = ENV.str("RBX_FORWARD_SEND_MASTER_NODES", default=None)
+# Forwarding is queued: the newest payload waits under this key for the
+# send_forwarded_master_nodes task, which retries with backoff.
+RBX_FORWARD_PAYLOAD_KEY = "forward_master_nodes_payload"
+RBX_FORWARD_PENDING_KEY = "forward_master_nodes_pending"
+RBX_FORWARD_PAYLOAD_TIMEOUT = ENV.int("RBX_FORWARD_PAYLOAD_TIMEOUT", default=3600)
 
 LOCAL_ASSETS_PATH = ENV.str("LOCAL_ASSETS_PATH", None)
 
@@ -3,3 +3,14 @@ from project.settings.environment import ENV
 
 SOCKET_BASE_URL = ENV.str("SOCKET_BASE_URL", None)
 SOCKET_TOKEN = ENV.str("SOCKET_TOKEN", None)
+
+# New-block notifications are queued in a Redis list and flushed by one task
+# per burst (rbx.notifications). A flush of several heights sends a single
+# "new_blocks" batch of compact summaries plus "new_block" for the tip.
+SOCKET_OUTBOX_KEY = "socket_block_outbox"
+SOCKET_OUTBOX_PENDING_KEY = "socket_block_outbox_pending"
+SOCKET_OUTBOX_TIMEOUT = ENV.int("SOCKET_OUTBOX_TIMEOUT", default=300)
+SOCKET_NOTIFY_DELAY = ENV.float("SOCKET_NOTIFY_DELAY", default=1)
+SOCKET_BATCH_MAX = ENV.int("SOCKET_BATCH_MAX", default=100)
+# Send compact summaries instead of the full serialized block for "new_block".
+SOCKET_COMPACT_BLOCKS = ENV.bool("SOCKET_COMPACT_BLOCKS", default=False)
@@ -26,6 +26,7 @@ from rbx.models import (
     VbtcTokenAmountTransfer,
     VbtcV2Token,
     VbtcV2TokenTransfer,
+    SmartContractSnapshot,
     UnindexedMint,
     VbtcV2WithdrawalRequest,
 )
@@ -480,6 +481,12 @@ class UnindexedMintAdmin(RbxModelAdmin):
     autocomplete_fields = ["transaction"]
 
 
+@admin.register(SmartContractSnapshot)
+class SmartContractSnapshotAdmin(RbxModelAdmin):
+    search_fields = ["sc_identifier", "state"]
+    list_display = ["sc_identifier", "state", "fetched_at"]
+
+
 @admin.register(VbtcV2WithdrawalRequest)
 class VbtcV2WithdrawalRequestAdmin(RbxModelAdmin):
     search_fields = ["requestor_address", "btc_address", "btc_transaction_hash"]
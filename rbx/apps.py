@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RBXConfig(AppConfig):
     name = "rbx"
+
+    def ready(self):
+        import rbx.ledger  # noqa
+        import rbx.vbtc_ledger  # noqa
@@ -2,7 +2,7 @@ import json
 import string
 import time
 from decimal import Decimal
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 
 import requests
 from django.conf import settings
@@ -10,7 +10,8 @@ from django.utils import timezone
 
 from project.utils.url import join_url
 from rbx.exceptions import RBXException
-from rbx.models import Nft
+from rbx.http import cli
+from rbx.models import Nft, SmartContractSnapshot
 from shop.models import Bid
 import logging
 from shop.media import scp_up_url
@@ -38,7 +39,7 @@ def _fix_amount(amount):
 
 def get_status() -> str:
     url = join_url(BASE_URL, "api/V1/CheckStatus")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -48,7 +49,7 @@ def get_status() -> str:
 
 def get_info() -> Optional[dict]:
     url = join_url(BASE_URL, "api/V1/GetWalletInfo")
-    response = requests.get(url, timeout=15)
+    response = cli.get(url, timeout=15)
 
     if response.status_code != 200:
         raise RBXException
@@ -61,7 +62,7 @@ def get_info() -> Optional[dict]:
 
 def get_master_nodes() -> List[dict]:
     url = join_url(BASE_URL, "api/V1/GetMasternodesSent")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -74,7 +75,7 @@ def get_master_nodes() -> List[dict]:
 
 def get_block(height: int) -> Optional[dict]:
     url = join_url(BASE_URL, f"api/V1/SendBlock/{height}")
-    response = requests.get(url, timeout=15)
+    response = cli.get(url, timeout=15)
 
     if response.status_code != 200:
         raise RBXException
@@ -88,7 +89,7 @@ def get_block(height: int) -> Optional[dict]:
 def tx_get_fee(transaction: dict, *args) -> Tuple[dict, int]:
     url = join_url(BASE_URL, "txapi/txV1/GetRawTxFee")
 
-    response = requests.post(url, json=transaction)
+    response = cli.post(url, json=transaction)
     if response.status_code != 200:
         raise RBXException
 
@@ -103,7 +104,7 @@ def tx_get_hash(transaction: dict) -> Tuple[dict, int]:
     data = transaction
     data["Amount"] = _fix_amount(data["Amount"])
 
-    response = requests.post(url, json=data)
+    response = cli.post(url, json=data)
     if response.status_code != 200:
         raise RBXException
 
@@ -119,7 +120,7 @@ def tx_verify(transaction: dict) -> Tuple[dict, int]:
     data = transaction
     data["Amount"] = _fix_amount(data["Amount"])
 
-    response = requests.post(url, json=data)
+    response = cli.post(url, json=data)
     if response.status_code != 200:
         raise RBXException
 
@@ -135,7 +136,7 @@ def tx_send(transaction: dict) -> Tuple[dict, int]:
     data = transaction
     data["Amount"] = _fix_amount(data["Amount"])
 
-    response = requests.post(url, json=data)
+    response = cli.post(url, json=data)
 
     if response.status_code != 200:
         raise RBXException
@@ -148,7 +149,7 @@ def tx_send(transaction: dict) -> Tuple[dict, int]:
 
 def get_smart_contract(identifier: str) -> Optional[dict]:
     url = join_url(SHOP_BASE_URL, f"/scapi/scv1/GetSmartContractData/{identifier}")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -207,7 +208,7 @@ def nft_data(payload: dict, *args) -> Optional[dict]:
 
             feature_i += 1
 
-    response = requests.post(url, json=payload)
+    response = cli.post(url, json=payload)
 
     logger.debug(f"NFT data response: {response.text}")
 
@@ -242,7 +243,7 @@ def nft_data(payload: dict, *args) -> Optional[dict]:
 def compile_smart_contract(payload: dict) -> Optional[dict]:
 
     url = join_url(SHOP_BASE_URL, "scapi/scv1/CreateSmartContract")
-    response = requests.post(url, json=payload)
+    response = cli.post(url, json=payload)
     if response.status_code != 200:
         raise RBXException
     try:
@@ -253,7 +254,7 @@ def compile_smart_contract(payload: dict) -> Optional[dict]:
 
 def mint_smart_contract(id: str, *args) -> Tuple[dict, int]:
     url = join_url(SHOP_BASE_URL, f"scapi/scv1/MintSmartContract/{id}")
-    response = requests.post(url)
+    response = cli.post(url)
     if response.status_code != 200:
         raise RBXException
     try:
@@ -269,7 +270,7 @@ def nft_transfer_data(id: str, address: str, locator: str, *args):
         f"txapi/txV1/GetNftTransferData/{id}/{address}/{locator}",
     )
 
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -286,7 +287,7 @@ def nft_evolve_data(id: str, address: str, next_state: str, *args):
         f"txapi/txV1/GetNFTEvolveData/{id}/{address}/{next_state}",
     )
 
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -299,7 +300,7 @@ def nft_evolve_data(id: str, address: str, next_state: str, *args):
 def nft_burn_data(id: str, address: str, *args) -> Tuple[dict, int]:
 
     url = join_url(SHOP_BASE_URL, f"txapi/txV1/GetNFTBurnData/{id}/{address}/")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -311,7 +312,7 @@ def nft_burn_data(id: str, address: str, *args) -> Tuple[dict, int]:
 
 def get_locators(id: str, *args) -> Tuple[dict, int]:
     url = join_url(SHOP_BASE_URL, f"scapi/scV1/GetLastKnownLocators/{id}")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -331,7 +332,7 @@ def get_beacon_assets(
     )
     logger.debug(f"Beacon assets URL: {url}")
 
-    response = requests.get(url)
+    response = cli.get(url)
 
     logger.debug(f"Beacon assets response: {response.text}")
 
@@ -351,7 +352,7 @@ def beacon_upload_request(
     )
 
     try:
-        response = requests.get(url)
+        response = cli.get(url)
     except requests.RequestException as e:
         logger.error(f"Beacon upload request failed: {e}")
         return None
@@ -377,7 +378,7 @@ def beacon_upload_request(
 
 def get_timestamp() -> Optional[int]:
     url = join_url(BASE_URL, "/txapi/txV1/GetTimestamp")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -392,7 +393,7 @@ def get_timestamp() -> Optional[int]:
 def get_address_nonce(address: str) -> Optional[Decimal]:
     logger = logging.getLogger(__name__)
     url = join_url(BASE_URL, f"/txapi/txV1/GetAddressNonce/{address}")
-    response = requests.get(url)
+    response = cli.get(url)
 
     logger.debug(f"Address nonce response: {response.json()}")
 
@@ -408,7 +409,7 @@ def get_address_nonce(address: str) -> Optional[Decimal]:
 
 def get_raw_tx_fee(tx: dict) -> Optional[Decimal]:
     url = join_url(BASE_URL, "/txapi/txV1/GetRawTxFee")
-    response = requests.post(url, data=tx)
+    response = cli.post(url, data=tx)
 
     if response.status_code != 200:
         raise RBXException
@@ -422,7 +423,7 @@ def get_raw_tx_fee(tx: dict) -> Optional[Decimal]:
 
 def get_tx_hash(tx: dict) -> Optional[str]:
     url = join_url(BASE_URL, "/txapi/txV1/GetTxHash")
-    response = requests.post(url, data=tx)
+    response = cli.post(url, data=tx)
 
     if response.status_code != 200:
         raise RBXException
@@ -438,7 +439,7 @@ def validate_signature(message: str, address: str, signature: str) -> bool:
     url = join_url(
         BASE_URL, f"/txapi/txV1/ValidateSignature/{message}/{address}/{signature}/"
     )
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -453,7 +454,7 @@ def validate_signature(message: str, address: str, signature: str) -> bool:
 def handle_raw_transaction(tx: dict, execute: bool = False) -> bool:
     path = "SendRawTransaction" if execute else "VerifyRawTransaction"
     url = join_url(BASE_URL, f"/txapi/txV1/{path}")
-    response = requests.post(url, data=tx)
+    response = cli.post(url, data=tx)
 
     if response.status_code != 200:
         raise RBXException
@@ -469,7 +470,29 @@ def handle_raw_transaction(tx: dict, execute: bool = False) -> bool:
 
 
 # region Nfts
-def get_nft(id: str, attempt=0) -> Tuple[dict, int]:
+def get_nft(
+    id: str, attempt=0, state: Optional[str] = None, refresh: bool = False
+) -> Tuple[dict, int]:
+    """GetSmartContractData for a contract.
+
+    With `state` (the hash of the transaction being processed) the response
+    is served from, and saved to, SmartContractSnapshot, so replaying a
+    transaction does not fetch the contract from the CLI again. With
+    `refresh` as well, the CLI is asked anyway and its answer replaces the
+    snapshot, for repairs of transactions whose snapshot is bad.
+    """
+    if state is not None:
+        data = None if refresh else SmartContractSnapshot.lookup(id, state)
+        if data is None:
+            data = get_nft(id, attempt)
+            if data:
+                if refresh:
+                    SmartContractSnapshot.objects.filter(
+                        sc_identifier=id, state=state
+                    ).delete()
+                SmartContractSnapshot.store(id, state, data)
+        return data
+
     logger = logging.getLogger(__name__)
     attempt += 1
 
@@ -480,7 +503,7 @@ def get_nft(id: str, attempt=0) -> Tuple[dict, int]:
     url = join_url(BASE_URL, f"/scapi/scv1/GetSmartContractData/{id}/")
 
     try:
-        response = requests.get(url, timeout=NFT_TIMEOUT)
+        response = cli.get(url, timeout=NFT_TIMEOUT)
     except Exception as e:
         logger.error(f"NFT get data exception: {e}")
         time.sleep(5)
@@ -509,7 +532,7 @@ def verify_nft_ownership(sig: str) -> bool:
     logger = logging.getLogger(__name__)
     url = join_url(SHOP_BASE_URL, f"/scapi/scv1/VerifyOwnership/{sig}")
 
-    response = requests.get(url)
+    response = cli.get(url)
 
     logger.debug(f"Verify NFT ownership URL: {url}")
     logger.debug(f"Verify NFT ownership response: {response.text}")
@@ -529,7 +552,7 @@ def verify_nft_ownership(sig: str) -> bool:
 # region Voting
 def get_topics() -> Optional[dict]:
     url = join_url(BASE_URL, f"voapi/VOV1/GetAllTopics")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -542,7 +565,7 @@ def get_topics() -> Optional[dict]:
 
 def get_network_metrics() -> Optional[dict]:
     url = join_url(BASE_URL, "api/V1/NetworkMetrics")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -562,7 +585,7 @@ def validate_signature(message, address, signature):
     url = join_url(
         BASE_URL, f"txapi/TXV1/ValidateSignature/{message}/{address}/{signature}"
     )
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -582,7 +605,7 @@ def validate_signature(message, address, signature):
 def get_all_shops() -> Optional[list[dict]]:
 
     url = join_url(SHOP_CRAWLER_BASE_URL, "dstapi/DSTV1/GetDecShopStateTreiList")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -600,7 +623,7 @@ def get_shop(shop_url: str) -> Optional[dict]:
     url = join_url(
         SHOP_CRAWLER_BASE_URL, f"dstapi/DSTV1/GetNetworkDecShopInfo/{shop_url}"
     )
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         raise RBXException
@@ -613,7 +636,7 @@ def get_shop(shop_url: str) -> Optional[dict]:
 
 def get_active_connections() -> list[dict]:
     url = join_url(SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/GetConnections")
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.status_code != 200:
         return False
@@ -643,7 +666,7 @@ def is_already_connected_to_shop(shop_url: str) -> bool:
 
 def clear_pings():
     url = join_url(SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/ClearPingRequest")
-    requests.get(url)
+    cli.get(url)
 
 
 def ping_check(shop_url: str, ping_id: str = None, attempt: int = 1) -> bool:
@@ -654,7 +677,7 @@ def ping_check(shop_url: str, ping_id: str = None, attempt: int = 1) -> bool:
     url = join_url(
         SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/PingShop/{ping_id}/{shop_url}"
     )
-    response = requests.get(url)
+    response = cli.get(url)
 
     data = response.json()
 
@@ -670,7 +693,7 @@ def ping_check(shop_url: str, ping_id: str = None, attempt: int = 1) -> bool:
     check_url = join_url(
         SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/CheckPingShop/{ping_id}"
     )
-    check_response = requests.get(check_url)
+    check_response = cli.get(check_url)
 
     check_data = check_response.json()
     if "Success" not in check_data or check_data["Success"] != True:
@@ -713,7 +736,7 @@ def connect_to_shop(
     url = join_url(
         SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/ConnectToDecShop/{address}/{shop_url}"
     )
-    response = requests.get(url)
+    response = cli.get(url)
 
     if response.text == "true":
         success = ping_check(shop_url)
@@ -734,6 +757,38 @@ def connect_to_shop(
     return False, True
 
 
+def request_shop_connection(shop_url: str, timeout: float) -> bool:
+    """One ConnectToDecShop call, for the concurrent crawler (shop.crawler)."""
+
+    address = settings.RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS
+    url = join_url(
+        SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/ConnectToDecShop/{address}/{shop_url}"
+    )
+    return cli.get(url, timeout=timeout).text == "true"
+
+
+def request_shop_ping(shop_url: str, ping_id: str, timeout: float) -> bool:
+    """Ask the crawler wallet to ping a shop. The answer is collected with
+    check_shop_ping."""
+
+    url = join_url(
+        SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/PingShop/{ping_id}/{shop_url}"
+    )
+    data = cli.get(url, timeout=timeout).json()
+    return data.get("Success") == True
+
+
+def check_shop_ping(ping_id: str, timeout: float) -> Optional[bool]:
+    """True once the shop answered the ping, False while it has not, None if
+    the wallet does not know the ping."""
+
+    url = join_url(SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/CheckPingShop/{ping_id}")
+    data = cli.get(url, timeout=timeout).json()
+    if data.get("Success") != True:
+        return None
+    return data["Ping"]["Item1"] == True
+
+
 # def _get_shop_info(attempt=1, max_attempts=10) -> bool:
 
 #     url = join_url(SHOP_BASE_URL, f"dstapi/DSTV1/GetShopInfo")
@@ -754,24 +809,26 @@ def connect_to_shop(
 #     return False
 
 
-def _request_auction_data(listing_id: int, shop_url: str):
-    logging.info(f"Requesting auction data for listing {listing_id}")
+def _request_auction_data(listing_ids: List[int], shop_url: str):
+    """Ask the shop for the auction and bids of every listing at once. The
+    answers arrive in GetDecShopData as the shop sends them."""
 
-    requests.get(
-        join_url(
-            SHOP_CRAWLER_BASE_URL,
-            f"wsapi/WebShopV1/GetShopSpecificAuction/{listing_id}/{settings.RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS}/{shop_url}",
-        )
-    )
+    logging.info(f"Requesting auction data for {len(listing_ids)} listings")
 
-    time.sleep(0.25)
-    requests.get(
-        join_url(
-            SHOP_CRAWLER_BASE_URL,
-            f"wsapi/WebShopV1/GetShopListingBids/{listing_id}/{settings.RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS}/{shop_url}",
+    address = settings.RBX_SHOP_CRAWLER_KEYPAIR_ADDRESS
+    for listing_id in listing_ids:
+        cli.get(
+            join_url(
+                SHOP_CRAWLER_BASE_URL,
+                f"wsapi/WebShopV1/GetShopSpecificAuction/{listing_id}/{address}/{shop_url}",
+            )
+        )
+        cli.get(
+            join_url(
+                SHOP_CRAWLER_BASE_URL,
+                f"wsapi/WebShopV1/GetShopListingBids/{listing_id}/{address}/{shop_url}",
+            )
         )
-    )
-    time.sleep(0.25)
 
 
 # def request_nft_media(sc_uid: str):
@@ -781,22 +838,18 @@ def _request_auction_data(listing_id: int, shop_url: str):
 
 def get_shop_data(shop_url: str) -> Optional[dict]:
 
-    connected, new_connection = connect_to_shop(shop_url)
+    connected, _ = connect_to_shop(shop_url)
 
     if not connected:
         return None
 
-    time.sleep(1)
-    if new_connection:
-        logging.info("Waiting 10 seconds before requesting shop data")
-        time.sleep(9)
-
     return _finalize_data(shop_url)
 
 
-def _finalize_data(shop_url: str, attempt=1):
-    logging.info("Getting data")
-    response = requests.get(
+def _fetch_shop_data(shop_url: str) -> Optional[dict]:
+    """The shop's entry in GetDecShopData, or None if it has not arrived."""
+
+    response = cli.get(
         join_url(SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/GetDecShopData")
     )
 
@@ -804,53 +857,107 @@ def _finalize_data(shop_url: str, attempt=1):
         raise RBXException
 
     try:
-        logging.info("Data retrieved")
         data = response.json()
+    except (json.JSONDecodeError, IndexError):
+        return None
 
-        # print(json.dumps(data))
+    if "Success" not in data or data["Success"] != True:
+        logging.info(f"Success was not true. Message: {data.get('Message')}")
+        return None
 
-        if "Success" not in data or data["Success"] != True:
-            logging.error(f"Success was not true. Message: {data['Message']}")
-            return
+    d = (data.get("MultiDecShopData") or {}).get(shop_url)
+    if not d or "DecShop" not in d:
+        return None
 
-        if "MultiDecShopData" not in data:
-            logging.error("Key 'MultiDecShopData' not in data")
-            return
+    return d
 
-        shop_dict = data["MultiDecShopData"]
-        if shop_url not in shop_dict:
-            logging.error(f"Could not find key {shop_url} in MultiDecShopData")
-            return
 
-        if "DecShop" not in shop_dict[shop_url]:
-            logging.error(
-                f"Could not find key DecShop in MultiDecShopData['{shop_url}']"
-            )
-            return
+def _has_all_items(d: dict) -> bool:
+    """Whether every collection and listing the shop advertises arrived."""
 
-        d = shop_dict[shop_url]
+    shop = d["DecShop"]
+    collections = len(d.get("Collections") or [])
+    listings = len(d.get("Listings") or [])
 
-        if "Listings" in d and d["Listings"] != None:
-            for l in d["Listings"]:
-                _request_auction_data(l["Id"], shop_url)
+    return collections >= (shop.get("CollectionCount") or 0) and listings >= (
+        shop.get("ListingCount") or 0
+    )
 
-        time.sleep(1)
 
-        try:
-            updated_response = requests.get(
-                join_url(SHOP_CRAWLER_BASE_URL, f"wsapi/WebShopV1/GetDecShopData")
-            )
-            data = updated_response.json()
-            updated_data = data["MultiDecShopData"][shop_url]
-            d = updated_data
-        except Exception as e:
-            logging.error(e)
-            pass
+def _has_auction_data(d: dict) -> bool:
+    """Whether every auction listing has its auction. Bids have no advertised
+    count, so the caller also waits for the data to stop changing."""
+
+    listings = d.get("Listings") or []
+    auction_listings = {l["Id"] for l in listings if l.get("FloorPrice")}
+    auctions = {a["ListingId"] for a in d.get("Auctions") or []}
+
+    return auction_listings <= auctions
+
+
+def _poll_shop_data(
+    shop_url: str, ready: Callable[[dict], bool], timeout: float, quiet: float = 0
+) -> Optional[dict]:
+    """Poll GetDecShopData with exponential backoff until ready(data) holds
+    and the data has not changed for `quiet` seconds. At the timeout, return
+    the last data that arrived, which is what the fixed sleeps this replaces
+    would have returned."""
+
+    deadline = time.monotonic() + timeout
+    delay = settings.RBX_SHOP_DATA_POLL_MIN
+    previous = None
+    # Counted in time slept rather than wall time, so slow fetches never
+    # shorten the quiet window.
+    unchanged_for = 0.0
+
+    while True:
+        wait = delay
+        d = _fetch_shop_data(shop_url)
+        if d is not None:
+            if d != previous:
+                unchanged_for = 0.0
+                previous = d
+            if ready(d):
+                if unchanged_for >= quiet:
+                    return d
+                wait = min(wait, quiet - unchanged_for)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            logging.warning(f"Shop data for {shop_url} not complete after {timeout}s")
+            return previous
+
+        wait = min(wait, remaining)
+        time.sleep(wait)
+        unchanged_for += wait
+        delay = min(delay * 2, settings.RBX_SHOP_DATA_POLL_MAX)
+
+
+def _finalize_data(shop_url: str) -> Optional[dict]:
+    logging.info("Getting data")
+
+    d = _poll_shop_data(shop_url, _has_all_items, settings.RBX_SHOP_DATA_TIMEOUT)
+    if d is None:
+        logging.error(f"Could not find key {shop_url} in MultiDecShopData")
+        return None
 
+    listing_ids = [l["Id"] for l in d.get("Listings") or []]
+    if not listing_ids:
         return d
 
-    except (json.JSONDecodeError, IndexError):
-        return None
+    _request_auction_data(listing_ids, shop_url)
+
+    # Bids can keep arriving after every auction has, so only a full
+    # RBX_SHOP_DATA_POLL_MAX without changes counts as done.
+    return (
+        _poll_shop_data(
+            shop_url,
+            _has_auction_data,
+            settings.RBX_SHOP_AUCTION_DATA_TIMEOUT,
+            quiet=settings.RBX_SHOP_DATA_POLL_MAX,
+        )
+        or d
+    )
 
 
 # endregion
@@ -921,7 +1028,7 @@ def send_raw_bid(bid: Bid) -> bool:
 
     logging.info(f"Posting bid payload to {url}")
 
-    response = requests.post(
+    response = cli.post(
         url,
         headers=headers,
         json=json_payload,
@@ -962,7 +1069,7 @@ def _check_if_bid_is_received(bid: Bid, attempt: int = 0):
 
     logging.info(f"Checking status of bid {bid.bid_id}")
 
-    response = requests.get(url)
+    response = cli.get(url)
     try:
         data = response.json()
         success = data["Success"] == True
@@ -1011,7 +1118,7 @@ def _check_if_bid_is_received(bid: Bid, attempt: int = 0):
 def get_vbtc_compile_data(rbx_address: str):
 
     url = join_url(BASE_URL, f"btcapi/BTCV2/GetTokenizationDetails/{rbx_address}")
-    response = requests.get(url)
+    response = cli.get(url)
     data = response.json()
     if "Success" in data and data["Success"] == True:
         return {
@@ -1025,7 +1132,7 @@ def get_vbtc_compile_data(rbx_address: str):
 
 def get_default_vbtc_base64_image_data():
     url = join_url(BASE_URL, f"btcapi/BTCV2/GetDefaultImageBase")
-    response = requests.get(url)
+    response = cli.get(url)
     data = response.json()
     if "Success" in data and data["Success"] == True:
         return data["ImageBase"]
@@ -1047,7 +1154,8 @@ def send_testnet_funds(from_address: str, to_address: str, amount: Decimal):
         url = join_url(
             BASE_URL, f"api/V1/SendTransaction/{from_address}/{to_address}/{amount_str}"
         )
-        response = requests.get(url)
+        # Sends funds, so a gateway error must not replay it.
+        response = cli.get(url, idempotent=False)
 
         text = response.text
 
@@ -1075,7 +1183,7 @@ def withdraw_btc(payload: dict):
     url = join_url(BASE_URL, f"btcapi/btcv2/WithdrawalCoinRawTX")
     logger.info(f"URL: {url}")
 
-    response = requests.post(url, json=payload)
+    response = cli.post(url, json=payload)
 
     data = response.json()
     logger.info(f"RESPONSE: {json.dumps(data)}")
@@ -1092,9 +1200,9 @@ def _vbtc_v2_request(method, path, payload=None, timeout=30):
     logger.info(f"VBTC_V2: {method.upper()} {url}")
     try:
         if method == "get":
-            response = requests.get(url, timeout=timeout)
+            response = cli.get(url, timeout=timeout)
         else:
-            response = requests.post(url, json=payload, timeout=timeout)
+            response = cli.post(url, json=payload, timeout=timeout)
         result = response.json()
     except Exception as e:
         logger.error(f"Error in vBTC V2 request {path}: {e}")
@@ -1258,7 +1366,7 @@ def vbtc_v2_beacon_upload(sc_uid: str, to_address: str, signature: str):
         f"txapi/txV1/CreateBeaconUploadRequest/{sc_uid}/{to_address}/{signature}",
     )
     try:
-        response = requests.get(url, timeout=15)
+        response = cli.get(url, timeout=15)
         data = response.json()
         if data.get("Success"):
             return {"success": True, "locator": data.get("Locator")}
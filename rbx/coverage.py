@@ -0,0 +1,147 @@
+"""Chain coverage: which block heights are indexed, as a compact range set.
+
+BlockRange holds the maximal runs of indexed heights. record_heights merges
+newly written heights into it inside the block transaction, so "what is
+missing between A and B" is answered from a handful of rows instead of one
+query per height or a scan of the Block table. rebuild_coverage recomputes
+the ranges with one gaps-and-islands pass over the height index.
+"""
+
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from django.db import connection
+from django.db.transaction import atomic as atomic_transaction
+
+from rbx.models import Block, BlockRange
+
+# pg_advisory_xact_lock key serialising range merges across sync workers.
+COVERAGE_LOCK = 7_315_001
+
+Range = Tuple[int, int]
+
+
+def runs(heights: Iterable[int]) -> List[Range]:
+    """Collapse heights into inclusive (start, end) runs."""
+
+    result = []
+    for height in sorted(set(heights)):
+        if result and height == result[-1][1] + 1:
+            result[-1] = (result[-1][0], height)
+        else:
+            result.append((height, height))
+    return result
+
+
+def record_heights(heights: Iterable[int]) -> None:
+    """Merge newly indexed heights into the range set. Call it inside the
+    transaction that writes the blocks."""
+
+    new_runs = runs(heights)
+    if not new_runs:
+        return
+
+    with atomic_transaction():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [COVERAGE_LOCK])
+
+        for start, end in new_runs:
+            touching = list(
+                BlockRange.objects.filter(start__lte=end + 1, end__gte=start - 1)
+            )
+            if len(touching) == 1 and touching[0].start <= start:
+                # The common case at the tip: extend the one range in place.
+                if end > touching[0].end:
+                    BlockRange.objects.filter(pk=touching[0].pk).update(end=end)
+                continue
+
+            merged_start = min([start] + [r.start for r in touching])
+            merged_end = max([end] + [r.end for r in touching])
+            BlockRange.objects.filter(pk__in=[r.pk for r in touching]).delete()
+            BlockRange.objects.create(start=merged_start, end=merged_end)
+
+
+def covered_ranges(start: int, end: int) -> List[Range]:
+    """Indexed runs overlapping start..end, clipped to it."""
+
+    ranges = BlockRange.objects.filter(start__lte=end, end__gte=start).order_by(
+        "start"
+    )
+    return [(max(r.start, start), min(r.end, end)) for r in ranges]
+
+
+def missing_ranges(start: int, end: int) -> List[Range]:
+    """Heights in start..end that are not indexed, as inclusive runs."""
+
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered_ranges(start, end):
+        if covered_start > cursor:
+            missing.append((cursor, covered_start - 1))
+        cursor = covered_end + 1
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+# Consecutive heights share height - row_number(), so each group is a run.
+ISLANDS_SQL = f"""
+    SELECT MIN(height), MAX(height) FROM (
+        SELECT height, height - ROW_NUMBER() OVER (ORDER BY height) AS island
+        FROM {Block._meta.db_table}
+    ) heights
+    GROUP BY island
+"""
+
+
+def rebuild_coverage() -> int:
+    """Recompute BlockRange from the Block table. Returns the number of
+    ranges."""
+
+    with atomic_transaction(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [COVERAGE_LOCK])
+        BlockRange.objects.all().delete()
+        cursor.execute(
+            f"INSERT INTO {BlockRange._meta.db_table} (start, \"end\") {ISLANDS_SQL}"
+        )
+        return cursor.rowcount
+
+
+def resync_ranges(
+    ranges: Iterable[Range], window: Optional[int] = None, workers: Optional[int] = None
+) -> int:
+    """Re-sync missing heights through the concurrent batched ingester, in
+    ascending order. Returns the number of blocks created."""
+
+    from rbx.ingest import ingest_blocks
+
+    return sum(
+        ingest_blocks(start, end, window=window, workers=workers)
+        for start, end in sorted(ranges)
+    )
+
+
+def chain_breaks(
+    start: int = 0, end: Optional[int] = None, chunk_size: int = 5000
+) -> Iterator[Tuple[int, str, str]]:
+    """Stream the blocks in height order and yield (height, previous_hash,
+    expected) wherever a block does not point at the hash of the block
+    below it. Only consecutive heights are compared; gaps are
+    missing_ranges' business."""
+
+    blocks = Block.objects.filter(height__gte=start)
+    if end is not None:
+        blocks = blocks.filter(height__lte=end)
+
+    previous = None
+    for height, block_hash, previous_hash in (
+        blocks.order_by("height")
+        .values_list("height", "hash", "previous_hash")
+        .iterator(chunk_size=chunk_size)
+    ):
+        if (
+            previous is not None
+            and previous[0] == height - 1
+            and previous[1] != previous_hash
+        ):
+            yield height, previous_hash, previous[1]
+        previous = (height, block_hash)
@@ -0,0 +1,162 @@
+"""Pooled HTTP session for the wallet CLI.
+
+Block sync makes at least one CLI call per height, more with get_nft, and
+bare requests.get opens a new TCP connection each time. During catch-up that
+setup was a measurable share of the time spent per block, and it ran the host
+out of ephemeral ports. Every rbx.client call goes through one keep-alive
+session per process instead.
+
+Retries: only GETs are retried, and only when the connection could not be
+made or the CLI answered 502/503/504, with exponential backoff. POSTs are
+never retried: a send whose response was lost may still have been accepted,
+and replaying it would broadcast the transaction twice. A GET that sends
+funds is made with idempotent=False, which retries it only when the
+connection could not be made, for the same reason. Read timeouts are never
+retried either, because a slow answer is usually a busy CLI.
+
+Latency is recorded per endpoint (the route without its path parameters),
+per process. Calls slower than RBX_HTTP_SLOW_CALL are logged as they happen.
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EndpointStats:
+    calls: int = 0
+    errors: int = 0
+    total: float = 0.0
+    slowest: float = 0.0
+
+    @property
+    def average(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+def endpoint_name(url: str) -> str:
+    """The CLI route for a URL, e.g. "api/V1/SendBlock" for
+    .../api/V1/SendBlock/1234. Routes are always controller/version/action
+    followed by path parameters."""
+
+    return "/".join(urlsplit(url).path.strip("/").split("/")[:3])
+
+
+class CliSession:
+    """requests-compatible get/post over a pooled session.
+
+    The underlying requests.Session is created per process, so Celery's
+    prefork children never share sockets inherited from the parent.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[bool, requests.Session] = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self.stats: Dict[str, EndpointStats] = {}
+
+    @property
+    def session(self) -> requests.Session:
+        return self.session_for(idempotent=True)
+
+    def session_for(self, idempotent: bool) -> requests.Session:
+        pid = os.getpid()
+        session = self._sessions.get(idempotent) if self._pid == pid else None
+        if session is None:
+            with self._lock:
+                if self._pid != pid:
+                    self._sessions = {}
+                    self._pid = pid
+                    self.stats = {}
+                session = self._sessions.get(idempotent)
+                if session is None:
+                    session = self.build_session(idempotent)
+                    self._sessions[idempotent] = session
+        return session
+
+    def build_session(self, idempotent: bool = True) -> requests.Session:
+        # Without idempotent, a 5xx may come after the CLI acted on the
+        # request, so only connection failures are retried.
+        retry = Retry(
+            total=settings.RBX_HTTP_RETRIES,
+            connect=settings.RBX_HTTP_RETRIES,
+            read=0,
+            status=settings.RBX_HTTP_RETRIES,
+            status_forcelist=(502, 503, 504) if idempotent else (),
+            allowed_methods=frozenset(["GET"]),
+            backoff_factor=settings.RBX_HTTP_BACKOFF,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=settings.RBX_HTTP_POOL_SIZE,
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(
+        self, method: str, url: str, idempotent: bool = True, **kwargs
+    ) -> requests.Response:
+        kwargs.setdefault(
+            "timeout",
+            (settings.RBX_HTTP_CONNECT_TIMEOUT, settings.RBX_HTTP_READ_TIMEOUT),
+        )
+
+        session = self.session_for(idempotent)
+        name = endpoint_name(url)
+        started = time.monotonic()
+        failed = True
+        try:
+            response = session.request(method, url, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            self.record(name, time.monotonic() - started, failed)
+
+    def get(self, url: str, idempotent: bool = True, **kwargs) -> requests.Response:
+        return self.request("GET", url, idempotent=idempotent, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def record(self, name: str, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            stats = self.stats.setdefault(name, EndpointStats())
+            stats.calls += 1
+            stats.errors += int(failed)
+            stats.total += elapsed
+            stats.slowest = max(stats.slowest, elapsed)
+
+        if elapsed >= settings.RBX_HTTP_SLOW_CALL:
+            logger.warning(f"Slow CLI call {name}: {elapsed:.2f}s")
+
+    def summary(self) -> str:
+        """One line per endpoint, busiest first."""
+
+        with self._lock:
+            stats = sorted(self.stats.items(), key=lambda item: -item[1].total)
+
+        return "\n".join(
+            f"{name}: {s.calls} calls, {s.errors} errors, "
+            f"avg {s.average * 1000:.0f}ms, max {s.slowest * 1000:.0f}ms"
+            for name, s in stats
+        )
+
+
+cli = CliSession()
@@ -0,0 +1,347 @@
+"""Incremental maintenance of AddressLedger.
+
+settled and locked mirror the terms of Address.compute_balance. If
+compute_balance changes, ledger_deltas, the Callback/Recovery deltas and the
+SETTLED_SQL below have to change with it, and the ledger must be rebuilt.
+
+received and sent are the plain gross totals of every transaction to and from
+the address, which the top holders leaderboard ranks by.
+"""
+
+import json
+import logging
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save
+from django.db.transaction import atomic as atomic_transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from psycopg2.extras import execute_values
+
+from rbx.models import AddressLedger, Callback, Recovery, Transaction
+
+
+class LedgerDelta(NamedTuple):
+    address: str
+    settled: Decimal = Decimal(0)
+    locked: Decimal = Decimal(0)
+    received: Decimal = Decimal(0)
+    sent: Decimal = Decimal(0)
+
+
+
+def adnr_charge(height: int) -> Decimal:
+    """What compute_balance charges the recipient of an ADDRESS transaction."""
+
+    if height > 832000:
+        return Decimal(5)
+    if settings.ENVIRONMENT == "testnet":
+        return Decimal(0)
+    return Decimal(1)
+
+
+def sale_deltas(tx: Transaction) -> List[LedgerDelta]:
+    """Sale_Complete() proceeds, counted only for the addresses on the sale
+    transaction itself, as compute_balance only looks at those."""
+
+    try:
+        parsed = json.loads(tx.data)
+    except (TypeError, ValueError):
+        logging.warning(f"Unparseable NFT sale data on {tx.hash}")
+        return []
+
+    if not isinstance(parsed, dict) or parsed.get("Function") != "Sale_Complete()":
+        return []
+
+    deltas = []
+    for address in {tx.to_address, tx.from_address}:
+        for sub in parsed.get("Transactions") or []:
+            if sub["ToAddress"] == address:
+                deltas.append(LedgerDelta(address, settled=Decimal(sub["Amount"])))
+            if sub["FromAddress"] == address:
+                amount = Decimal(sub["Amount"]) + Decimal(sub["Fee"])
+                deltas.append(LedgerDelta(address, settled=-amount))
+
+    return deltas
+
+
+def ledger_deltas(tx: Transaction, now=None) -> List[LedgerDelta]:
+    """The ledger changes from indexing one transaction."""
+
+    sent = tx.total_amount + tx.total_fee
+    gross = [
+        LedgerDelta(tx.to_address, received=tx.total_amount),
+        LedgerDelta(tx.from_address, sent=sent),
+    ]
+
+    if tx.type == Transaction.Type.NFT_SALE:
+        return gross + sale_deltas(tx)
+
+    received = tx.total_amount
+    if tx.type == Transaction.Type.ADDRESS:
+        received -= adnr_charge(tx.height)
+
+    locked = Decimal(0)
+    now = now or timezone.now()
+    if tx.unlock_time and tx.unlock_time > now and not tx.voided_from_callback:
+        locked = tx.total_amount
+
+    return gross + [
+        LedgerDelta(tx.to_address, settled=received, locked=locked),
+        LedgerDelta(tx.from_address, settled=-sent, locked=locked),
+    ]
+
+
+def callback_deltas(callback: Callback, now=None) -> List[LedgerDelta]:
+    """A callback returns the amount to from_address and voids the original
+    transaction, which releases any lock it still held."""
+
+    deltas = [
+        LedgerDelta(callback.from_address, settled=callback.amount),
+        LedgerDelta(callback.to_address, settled=-callback.amount),
+    ]
+
+    original = callback.original_transaction
+    now = now or timezone.now()
+    if (
+        original.type != Transaction.Type.NFT_SALE
+        and original.unlock_time
+        and original.unlock_time > now
+        and not original.voided_from_callback
+    ):
+        deltas += [
+            LedgerDelta(original.to_address, locked=-original.total_amount),
+            LedgerDelta(original.from_address, locked=-original.total_amount),
+        ]
+
+    return deltas
+
+
+def recovery_deltas(recovery: Recovery) -> List[LedgerDelta]:
+    return [
+        LedgerDelta(recovery.new_address, settled=recovery.amount),
+        LedgerDelta(recovery.original_address, settled=-recovery.amount),
+    ]
+
+
+COLUMNS = (
+    "address",
+    "settled",
+    "locked",
+    "received",
+    "sent",
+    "holdings",
+    "updated_at",
+)
+
+
+def sum_deltas(deltas: Iterable[LedgerDelta]) -> dict:
+    """Net the deltas per address."""
+
+    totals = {}
+    for delta in deltas:
+        current = totals.get(delta.address)
+        if current is None:
+            totals[delta.address] = delta
+        else:
+            totals[delta.address] = LedgerDelta(
+                delta.address,
+                *(a + b for a, b in zip(current[1:], delta[1:])),
+            )
+    return totals
+
+
+def rows(totals: dict, now) -> list:
+    return [
+        (a, d.settled, d.locked, d.received, d.sent, d.received - d.sent, now)
+        for a, d in sorted(totals.items())
+    ]
+
+
+def apply_ledger_deltas(deltas: Iterable[LedgerDelta]) -> None:
+    """Add the deltas to AddressLedger in one upsert."""
+
+    totals = sum_deltas(deltas)
+    if not totals:
+        return
+
+    table = AddressLedger._meta.db_table
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table} ({", ".join(COLUMNS)}) VALUES %s
+            ON CONFLICT (address) DO UPDATE SET
+                settled = {table}.settled + EXCLUDED.settled,
+                locked = {table}.locked + EXCLUDED.locked,
+                received = {table}.received + EXCLUDED.received,
+                sent = {table}.sent + EXCLUDED.sent,
+                holdings = {table}.holdings + EXCLUDED.holdings,
+                updated_at = EXCLUDED.updated_at
+            """,
+            rows(totals, timezone.now()),
+        )
+
+
+# Still-locked amounts per address, counted once as recipient and once as
+# sender like compute_balance's inbound_locked + outbound_locked.
+LOCKED_SQL = """
+    SELECT address, SUM(amount) AS amount FROM (
+        SELECT to_address AS address, total_amount AS amount
+        FROM rbx_transaction
+        WHERE unlock_time > %(now)s AND NOT voided_from_callback
+            AND type <> %(nft_sale)s
+        UNION ALL
+        SELECT from_address AS address, total_amount AS amount
+        FROM rbx_transaction
+        WHERE unlock_time > %(now)s AND NOT voided_from_callback
+            AND type <> %(nft_sale)s
+    ) locks
+    GROUP BY address
+"""
+
+
+def sweep_locks(addresses: Optional[List[str]] = None) -> int:
+    """Recompute AddressLedger.locked from the still-locked transactions.
+
+    Both queries are driven by the unlock_time index, so the cost tracks the
+    number of open locks rather than the size of the chain. Only existing
+    ledger rows are touched. Returns the number of rows whose lock changed.
+    """
+
+    table = AddressLedger._meta.db_table
+    params = {
+        "now": timezone.now(),
+        "nft_sale": Transaction.Type.NFT_SALE,
+        "addresses": addresses,
+    }
+    scope = "" if addresses is None else "AND l.address = ANY(%(addresses)s)"
+
+    with atomic_transaction(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH locks AS ({LOCKED_SQL})
+            UPDATE {table} l SET locked = locks.amount, updated_at = %(now)s
+            FROM locks
+            WHERE l.address = locks.address AND l.locked <> locks.amount {scope}
+            """,
+            params,
+        )
+        changed = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            WITH locks AS ({LOCKED_SQL})
+            UPDATE {table} l SET locked = 0, updated_at = %(now)s
+            WHERE l.locked <> 0 {scope}
+                AND NOT EXISTS (SELECT 1 FROM locks WHERE locks.address = l.address)
+            """,
+            params,
+        )
+        changed += cursor.rowcount
+
+    return changed
+
+
+# Settled balance per address from transfers, fees and ADNR charges, plus
+# gross received and sent over every transaction type.
+SETTLED_SQL = """
+    SELECT address, SUM(settled), SUM(received), SUM(sent) FROM (
+        SELECT to_address AS address,
+            CASE WHEN type = %(nft_sale)s THEN 0 ELSE total_amount - CASE
+                WHEN type <> %(adnr)s THEN 0
+                WHEN height > 832000 THEN 5
+                WHEN %(testnet)s THEN 0
+                ELSE 1
+            END END AS settled,
+            total_amount AS received,
+            0 AS sent
+        FROM rbx_transaction
+        UNION ALL
+        SELECT from_address,
+            CASE WHEN type = %(nft_sale)s THEN 0
+                ELSE -(total_amount + total_fee) END,
+            0,
+            total_amount + total_fee
+        FROM rbx_transaction
+        UNION ALL
+        SELECT from_address, amount, 0, 0 FROM rbx_callback
+        UNION ALL
+        SELECT to_address, -amount, 0, 0 FROM rbx_callback
+        UNION ALL
+        SELECT new_address, amount, 0, 0 FROM rbx_recovery
+        UNION ALL
+        SELECT original_address, -amount, 0, 0 FROM rbx_recovery
+    ) entries
+    GROUP BY address
+"""
+
+
+def rebuild_ledger() -> int:
+    """Recompute every AddressLedger row from scratch.
+
+    Runs in one transaction, so readers see the old ledger until the new one
+    is complete. Block ingestion should be paused while it runs: a block
+    committed during the rebuild may be counted twice. Returns the number of
+    rows written.
+    """
+
+    now = timezone.now()
+    deltas = []
+
+    with atomic_transaction():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                SETTLED_SQL,
+                {
+                    "adnr": Transaction.Type.ADDRESS,
+                    "nft_sale": Transaction.Type.NFT_SALE,
+                    "testnet": settings.ENVIRONMENT == "testnet",
+                },
+            )
+            for address, settled, received, sent in cursor.fetchall():
+                deltas.append(
+                    LedgerDelta(address, settled=settled, received=received, sent=sent)
+                )
+
+            cursor.execute(
+                LOCKED_SQL, {"now": now, "nft_sale": Transaction.Type.NFT_SALE}
+            )
+            for address, amount in cursor.fetchall():
+                deltas.append(LedgerDelta(address, locked=amount))
+
+        sales = Transaction.objects.filter(type=Transaction.Type.NFT_SALE).only(
+            "hash", "to_address", "from_address", "data"
+        )
+        for tx in sales.iterator():
+            deltas += sale_deltas(tx)
+
+        totals = sum_deltas(deltas)
+
+        AddressLedger.objects.all().delete()
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {AddressLedger._meta.db_table} ({", ".join(COLUMNS)})
+                VALUES %s
+                """,
+                rows(totals, now),
+            )
+
+    return len(totals)
+
+
+@receiver(post_save, sender=Callback)
+def apply_callback(sender, instance=None, created=False, **kwargs):
+    if created:
+        apply_ledger_deltas(callback_deltas(instance))
+
+
+@receiver(post_save, sender=Recovery)
+def apply_recovery(sender, instance=None, created=False, **kwargs):
+    if created:
+        apply_ledger_deltas(recovery_deltas(instance))
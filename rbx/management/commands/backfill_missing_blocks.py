@@ -1,16 +1,15 @@
 from django.core.management.base import BaseCommand
-from django.db import connection
 
+from rbx.coverage import missing_ranges, resync_ranges, runs
 from rbx.models import Block
-from rbx.tasks import sync_block
 
 """
-python manage.py backfill_missing_blocks [--heights 1,2,3] [--dry-run]
+python manage.py backfill_missing_blocks [--heights 1,2,3] [--dry-run] [--workers 8]
 
-Finds height gaps in the local block table and re-syncs each missing
-block from the node. Gaps exist because sync_block returns silently
-when the node serves unparseable/null data and the sync cursor
-(max height + 1) never looks back.
+Finds height gaps in the block range index and re-syncs the missing
+blocks from the node through the concurrent batched ingester. Gaps exist
+because sync_block returns silently when the node serves unparseable/null
+data and the sync cursor (max height + 1) never looks back.
 
 Blocks are processed in ascending order so cross-transaction lookups
 (e.g. withdrawal completes referencing request hashes) resolve. A
@@ -26,38 +25,30 @@ class Command(BaseCommand):
             help="Comma-separated heights to sync (skips gap detection)",
         )
         parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent CLI fetches (default RBX_SYNC_WORKERS).",
+        )
 
     def find_gaps(self):
-        # Index-driven self-join; avoids generate_series over the full
-        # 0..max range. Returns the first height of each gap plus length.
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT b.height + 1 AS gap_start,
-                       (SELECT min(height) FROM rbx_block n WHERE n.height > b.height) - b.height - 1 AS gap_len
-                FROM rbx_block b
-                WHERE NOT EXISTS (
-                    SELECT 1 FROM rbx_block n WHERE n.height = b.height + 1
-                )
-                AND b.height < (SELECT max(height) FROM rbx_block)
-                ORDER BY gap_start
-                """
-            )
-            gaps = cursor.fetchall()
-
-        heights = []
-        for gap_start, gap_len in gaps:
-            heights.extend(range(gap_start, gap_start + gap_len))
-        return heights
+        # Read off the block range index; no scan of the Block table.
+        top = Block.objects.order_by("-height").values_list("height", flat=True).first()
+        if top is None:
+            return []
+        return missing_ranges(0, top)
 
     def handle(self, *args, **options):
         dry_run = options["dry_run"]
 
         if options["heights"]:
-            heights = sorted(int(h) for h in options["heights"].split(","))
+            gaps = runs(int(h) for h in options["heights"].split(","))
         else:
             self.stdout.write("Scanning for height gaps...")
-            heights = self.find_gaps()
+            gaps = self.find_gaps()
+
+        heights = [h for start, end in gaps for h in range(start, end + 1)]
 
         if not heights:
             self.stdout.write("No missing blocks found.")
@@ -67,16 +58,15 @@ class Command(BaseCommand):
         if dry_run:
             return
 
-        synced, failed = 0, []
-        for height in heights:
-            sync_block(height)
-            if Block.objects.filter(height=height).exists():
-                self.stdout.write(f"{height}: synced")
-                synced += 1
-            else:
-                # sync_block returns silently when the node has no data.
-                self.stderr.write(f"{height}: STILL MISSING (node returned no data)")
-                failed.append(height)
+        synced = resync_ranges(gaps, workers=options["workers"])
+
+        # The ingester skips heights the node has no data for.
+        failed = [
+            h
+            for start, end in gaps
+            for gap_start, gap_end in missing_ranges(start, end)
+            for h in range(gap_start, gap_end + 1)
+        ]
 
         self.stdout.write(f"Done. {synced} synced, {len(failed)} still missing.")
         if failed:
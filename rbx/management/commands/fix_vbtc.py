@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from django.utils.timezone import now
 from rbx.models import Transaction, VbtcToken
 from rbx.tasks import handle_token_icon_upload, handle_vbtc_icon_upload
+from rbx.tokens import record_deploy
 
 
 class Command(BaseCommand):
@@ -27,7 +28,7 @@ class Command(BaseCommand):
             function = parsed["Function"]
             minter_address = tx.from_address
 
-            data = get_nft(identifier)
+            data = get_nft(identifier, state=tx.hash, refresh=True)
 
             smart_contract_data = data
 
@@ -92,6 +93,7 @@ class Command(BaseCommand):
                                 )
                             except FungibleToken.DoesNotExist:
                                 token = FungibleToken(sc_identifier=identifier)
+                            deployed = token.pk is None
 
                             token.smart_contract = nft
                             token.create_transaction = tx
@@ -108,6 +110,8 @@ class Command(BaseCommand):
                             token.original_owner_address = tx.from_address
 
                             token.save()
+                            if deployed:
+                                record_deploy(token)
 
                             nft.is_fungible_token = True
                             nft.save()
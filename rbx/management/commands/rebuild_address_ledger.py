@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from rbx.ledger import rebuild_ledger
+
+"""
+python manage.py rebuild_address_ledger
+
+Pause block syncing while this runs. Set RBX_ADDRESS_LEDGER=True afterwards
+to serve balances from the ledger.
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute AddressLedger from the indexed transactions."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding address ledger...")
+        rows = rebuild_ledger()
+        self.stdout.write(f"Done. Addresses: {rows}")
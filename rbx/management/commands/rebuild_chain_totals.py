@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from rbx.totals import rebuild_totals
+
+"""
+python manage.py rebuild_chain_totals
+
+Pause block syncing while this runs.
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute the ChainTotals running totals from the indexed chain."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding chain totals...")
+        totals = rebuild_totals()
+        self.stdout.write(
+            f"Done. Blocks: {totals.block_count}, "
+            f"transactions: {totals.transaction_count}, "
+            f"burned: {totals.total_burned}"
+        )
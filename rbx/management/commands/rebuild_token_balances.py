@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from rbx.tokens import rebuild_token_balances
+
+"""
+python manage.py rebuild_token_balances
+
+Pause block syncing while this runs.
+"""
+
+
+class Command(BaseCommand):
+    help = "Recompute FungibleTokenBalance and token supplies from the indexed token transactions."
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding token balances...")
+        rows = rebuild_token_balances()
+        self.stdout.write(f"Done. Holdings: {rows}")
@@ -2,7 +2,16 @@ from django.core.management.base import BaseCommand
 from rbx.tasks import resync_balances
 
 
+"""
+python manage.py resync_balances [--async]
+
+Block sync waits for the rebuild to finish rather than being paused for it.
+"""
+
+
 class Command(BaseCommand):
+    help = "Recompute every Address balance from the indexed transactions"
+
     def add_arguments(self, parser):
         parser.add_argument("--async", action="store_true")
 
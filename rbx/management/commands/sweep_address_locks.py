@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from rbx.ledger import sweep_locks
+
+"""
+python manage.py sweep_address_locks
+"""
+
+
+class Command(BaseCommand):
+    help = "Release AddressLedger locks whose unlock time has passed."
+
+    def handle(self, *args, **options):
+        changed = sweep_locks()
+        self.stdout.write(f"Done. Ledger rows updated: {changed}")
@@ -1,8 +1,19 @@
 from django.core.management.base import BaseCommand
 
+from rbx.http import cli
+from rbx.ingest import ingest_blocks
+from rbx.production import reset_production
 from rbx.tasks import sync_block, sync_master_nodes
 from rbx.utils import get_local_max_height, get_remote_max_height
-from rbx.models import Block, Nft, Callback, Recovery
+from rbx.models import (
+    AddressLedger,
+    Block,
+    BlockRange,
+    ChainTotals,
+    Nft,
+    Callback,
+    Recovery,
+)
 
 
 class Command(BaseCommand):
@@ -10,11 +21,29 @@ class Command(BaseCommand):
         parser.add_argument("--all", action="store_true")
         parser.add_argument("--async", action="store_true")
         parser.add_argument("--wipe", action="store_true")
+        parser.add_argument(
+            "--batch",
+            action="store_true",
+            help="Fetch blocks concurrently and commit them a window at a time.",
+        )
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=None,
+            help="Blocks per window with --batch (default RBX_SYNC_WINDOW).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Concurrent CLI fetches with --batch (default RBX_SYNC_WORKERS).",
+        )
 
     def handle(self, *args, **options):
         sync_all = "all" in options and options["all"] is True
         apply_async = "async" in options and options["async"] is True
         apply_wipe = "wipe" in options and options["wipe"] is True
+        apply_batch = "batch" in options and options["batch"] is True
 
         if apply_wipe:
             print("Wiping blocks...")
@@ -25,6 +54,14 @@ class Command(BaseCommand):
             Callback.objects.all().delete()
             print("Wiping recoveries...")
             Recovery.objects.all().delete()
+            print("Wiping address ledger...")
+            AddressLedger.objects.all().delete()
+            print("Wiping chain totals...")
+            ChainTotals.objects.all().delete()
+            print("Wiping validator production...")
+            reset_production()
+            print("Wiping block ranges...")
+            BlockRange.objects.all().delete()
 
         local_max_height = get_local_max_height()
         remote_max_height = get_remote_max_height()
@@ -32,6 +69,17 @@ class Command(BaseCommand):
         start_height = 0 if sync_all or not local_max_height else local_max_height + 1
         end_height = remote_max_height
 
+        if apply_batch:
+            created = ingest_blocks(
+                start_height,
+                end_height,
+                window=options["window"],
+                workers=options["workers"],
+            )
+            print(f"Synchronized {created} blocks")
+            print(cli.summary())
+            return
+
         for height in range(start_height, end_height + 1):
             if apply_async:
                 sync_block.apply_async(args=[height])
@@ -1,45 +1,67 @@
 from tqdm import tqdm
-from django.db.models import Q, Sum
 from django.core.management.base import BaseCommand
-from rbx.models import Block
-from rbx.tasks import sync_block
+from rbx.coverage import (
+    chain_breaks,
+    missing_ranges,
+    rebuild_coverage,
+    resync_ranges,
+)
 
 """
-python manage.py validate_blocks --height 357364
+python manage.py validate_blocks --height 357364 [--start 0] [--sync_missing] [--check_chain] [--rebuild]
 """
 
 
 class Command(BaseCommand):
+    help = "Report missing heights and broken hash links in the indexed blocks"
+
     def add_arguments(self, parser):
         parser.add_argument("--height", type=int)
         parser.add_argument("--start", type=int, default=0)
         parser.add_argument("--sync_missing", action="store_true")
+        parser.add_argument(
+            "--check_chain",
+            action="store_true",
+            help="Also check that every block's previous_hash matches the block below it",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute the block range index from the Block table first",
+        )
+        parser.add_argument("--workers", type=int, default=None)
 
     def handle(self, *args, **options):
 
-        if not "height" in options:
+        if options["height"] is None:
             print("--height is required")
             return
 
         height = options["height"]
         start = options["start"]
-        sync_missing = options["sync_missing"]
 
-        missing = []
+        if options["rebuild"]:
+            self.stdout.write(f"Rebuilt {rebuild_coverage()} block ranges")
 
-        with tqdm(total=height + 1 - start, desc="Processing Block") as progress:
-            for i in range(start, height + 1):
-                try:
-                    Block.objects.get(height=i)
-                except Block.DoesNotExist:
-                    missing.append(i)
-                progress.update()
+        missing = missing_ranges(start, height)
+        total = sum(end - begin + 1 for begin, end in missing)
 
-        print(f"Total Missing Blocks: {len(missing)}")
-        print(missing)
+        print(f"Total Missing Blocks: {total}")
+        for begin, end in missing:
+            print(begin if begin == end else f"{begin}-{end}")
 
-        if sync_missing:
+        if options["check_chain"]:
+            breaks = 0
+            for block_height, previous_hash, expected in tqdm(
+                chain_breaks(start, height), desc="Hash Chain Breaks"
+            ):
+                breaks += 1
+                self.stderr.write(
+                    f"{block_height}: previous_hash {previous_hash} "
+                    f"does not match {expected}"
+                )
+            print(f"Total Hash Chain Breaks: {breaks}")
 
-            for h in missing:
-                print(f"Syncing {h}")
-                sync_block(h)
+        if options["sync_missing"] and missing:
+            created = resync_ranges(missing, workers=options["workers"])
+            print(f"Synchronized {created} of {total} missing blocks")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from rbx.vbtc_ledger import verify_ledger
+
+"""
+python manage.py verify_vbtc_ledger [--fix]
+
+Compares every vBTC V2 token's VbtcV2Balance rows with a replay of its
+transfers and completed withdrawals. With --fix, tokens that disagree are
+rewritten from the replay; pause block syncing first.
+"""
+
+
+class Command(BaseCommand):
+    help = "Check the vBTC V2 per-address ledger against the transfer history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true")
+
+    def handle(self, *args, **options):
+        broken = 0
+        for token, mismatches in verify_ledger(fix=options["fix"]):
+            broken += 1
+            for address, stored, replayed in mismatches:
+                self.stderr.write(
+                    f"{token.sc_identifier} {address}: ledger {stored}, "
+                    f"history {replayed}"
+                )
+
+        action = "Rewrote" if options["fix"] else "Found"
+        self.stdout.write(f"{action} {broken} tokens with ledger mismatches")
@@ -0,0 +1,32 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0066_alter_transaction_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressLedger',
+            fields=[
+                ('address', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('settled', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('locked', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Address Ledger',
+                'verbose_name_plural': 'Address Ledgers',
+            },
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='unlock_time',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Unlock Time'),
+        ),
+    ]
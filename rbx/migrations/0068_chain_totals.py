@@ -0,0 +1,31 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0067_address_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainTotals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_count', models.BigIntegerField(default=0)),
+                ('transaction_count', models.BigIntegerField(default=0)),
+                ('fees_burned', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('adnr_burned', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('dst_burned', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('vault_activations', models.BigIntegerField(default=0)),
+                ('recent_block_times', models.JSONField(default=list)),
+                ('rebuilt_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0068_chain_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='addressledger',
+            name='holdings',
+            field=models.DecimalField(db_index=True, decimal_places=16, default=0, max_digits=32),
+        ),
+        migrations.AddField(
+            model_name='addressledger',
+            name='received',
+            field=models.DecimalField(decimal_places=16, default=0, max_digits=32),
+        ),
+        migrations.AddField(
+            model_name='addressledger',
+            name='sent',
+            field=models.DecimalField(decimal_places=16, default=0, max_digits=32),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0069_address_ledger_holdings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chaintotals',
+            name='indexed_transaction_count',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
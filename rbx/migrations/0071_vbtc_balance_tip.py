@@ -0,0 +1,18 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0070_chain_totals_indexed_transactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vbtcv2token',
+            name='balance_tip',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
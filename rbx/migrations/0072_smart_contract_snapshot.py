@@ -0,0 +1,26 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0071_vbtc_balance_tip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartContractSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sc_identifier', models.CharField(max_length=64)),
+                ('state', models.CharField(max_length=255)),
+                ('data', models.TextField()),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('sc_identifier', 'state')},
+            },
+        ),
+    ]
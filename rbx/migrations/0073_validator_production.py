@@ -0,0 +1,27 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0072_smart_contract_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidatorProduction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('validator_address', models.CharField(max_length=255)),
+                ('day', models.DateField(db_index=True)),
+                ('blocks', models.IntegerField(default=0)),
+                ('first_height', models.IntegerField()),
+                ('last_height', models.IntegerField()),
+            ],
+            options={
+                'unique_together': {('validator_address', 'day')},
+            },
+        ),
+    ]
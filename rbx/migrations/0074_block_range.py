@@ -0,0 +1,33 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0073_validator_production'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockRange',
+            fields=[
+                ('start', models.IntegerField(primary_key=True, serialize=False)),
+                ('end', models.IntegerField()),
+            ],
+        ),
+        # Seed the ranges from the blocks already indexed: one
+        # gaps-and-islands pass over the height index.
+        migrations.RunSQL(
+            """
+            INSERT INTO rbx_blockrange (start, "end")
+            SELECT MIN(height), MAX(height) FROM (
+                SELECT height, height - ROW_NUMBER() OVER (ORDER BY height) AS island
+                FROM rbx_block
+            ) heights
+            GROUP BY island
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0074_block_range'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fungibletoken',
+            name='supply',
+            field=models.DecimalField(decimal_places=16, default=0, max_digits=32),
+        ),
+        migrations.CreateModel(
+            name='FungibleTokenBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(db_index=True, max_length=64)),
+                ('balance', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='rbx.fungibletoken')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='fungibletokenbalance',
+            index=models.Index(fields=['token', '-balance', 'address'], name='rbx_ft_balance_holders_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='fungibletokenbalance',
+            unique_together={('token', 'address')},
+        ),
+        # Seed balances and supply from the token transactions already
+        # indexed, with the same terms as rbx.tokens.rebuild_token_balances.
+        migrations.RunSQL(
+            """
+            INSERT INTO rbx_fungibletokenbalance (token_id, address, balance)
+            SELECT token_id, address, SUM(amount) FROM (
+                SELECT id AS token_id, original_owner_address AS address,
+                    GREATEST(initial_supply, 0) AS amount
+                FROM rbx_fungibletoken
+                UNION ALL
+                SELECT token_id, receiving_address, CASE
+                    WHEN type = 'burn' THEN -amount ELSE amount END
+                FROM rbx_fungibletokentx
+                UNION ALL
+                SELECT token_id, sending_address, -amount
+                FROM rbx_fungibletokentx
+                WHERE type = 'transfer'
+            ) entries
+            WHERE address IS NOT NULL AND address <> ''
+            GROUP BY token_id, address
+            """,
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE rbx_fungibletoken t
+            SET supply = t.initial_supply + COALESCE((
+                SELECT SUM(CASE WHEN x.type = 'burn' THEN -x.amount ELSE x.amount END)
+                FROM rbx_fungibletokentx x
+                WHERE x.token_id = t.id AND x.type IN ('mint', 'burn')
+            ), 0)
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
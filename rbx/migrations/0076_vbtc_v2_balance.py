@@ -0,0 +1,46 @@
+# Generated by Django 4.0.5 on 2026-10-18 10:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rbx', '0075_fungible_token_balance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VbtcV2Balance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(db_index=True, max_length=64)),
+                ('balance', models.DecimalField(decimal_places=16, default=0, max_digits=32)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='rbx.vbtcv2token')),
+            ],
+            options={
+                'unique_together': {('token', 'address')},
+            },
+        ),
+        # Seed the ledger from the transfers and completed withdrawals
+        # already indexed, as VbtcV2Token.replay_ledger_entries computes it.
+        migrations.RunSQL(
+            """
+            INSERT INTO rbx_vbtcv2balance (token_id, address, balance)
+            SELECT token_id, address, SUM(amount) FROM (
+                SELECT token_id, to_address AS address, amount
+                FROM rbx_vbtcv2tokentransfer
+                UNION ALL
+                SELECT token_id, from_address, -amount
+                FROM rbx_vbtcv2tokentransfer
+                UNION ALL
+                SELECT token_id, requestor_address, -amount
+                FROM rbx_vbtcv2withdrawalrequest
+                WHERE status = 'completed'
+            ) entries
+            GROUP BY token_id, address
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,9 +1,11 @@
 import base64
 import gzip
 import logging
-from django.db import models
+from django.db import connection, models
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Count, Max, Sum
+from django.db.models.functions import Coalesce
+from datetime import timedelta
 from decimal import Decimal
 from django.conf import settings
 from shop.models import Listing
@@ -13,6 +15,7 @@ import json
 import uuid
 from phonenumber_field.modelfields import PhoneNumberField
 from django.contrib.postgres.fields import ArrayField
+from psycopg2.extras import execute_values
 
 # class MasterNodeManager(models.Manager):
 #     def get_queryset(self):
@@ -49,6 +52,21 @@ class MasterNode(models.Model):
     def __str__(self):
         return str(self.address)
 
+    def production(self) -> dict:
+        """Blocks produced today and over the last 7 days (UTC), and the
+        height of the newest one."""
+
+        today = timezone.now().date()
+        return ValidatorProduction.objects.filter(
+            validator_address=self.address
+        ).aggregate(
+            blocks_today=Coalesce(Sum("blocks", filter=Q(day=today)), 0),
+            blocks_last_week=Coalesce(
+                Sum("blocks", filter=Q(day__gt=today - timedelta(days=7))), 0
+            ),
+            last_block_height=Max("last_height"),
+        )
+
     # @property
     # def block_count(self):
     #     return Block.objects.filter(validator_address=self.address).count()
@@ -88,7 +106,12 @@ class BlockManager(models.Manager):
             super()
             .get_queryset()
             .select_related("master_node")
-            .prefetch_related("transactions")
+            .prefetch_related(
+                models.Prefetch(
+                    "transactions",
+                    queryset=Transaction.objects.select_related("nft"),
+                )
+            )
         )
 
 
@@ -219,12 +242,17 @@ class Transaction(models.Model):
     date_crafted = models.DateTimeField(_("Date Crafted"), db_index=True)
     nft = models.ForeignKey("Nft", blank=True, null=True, on_delete=models.SET_NULL)
 
-    unlock_time = models.DateTimeField(_("Unlock Time"), blank=True, null=True)
+    unlock_time = models.DateTimeField(
+        _("Unlock Time"), blank=True, null=True, db_index=True
+    )
 
     voided_from_callback = models.BooleanField(default=False)
 
     @property
     def callback_details(self):
+        if hasattr(self, "_callback_details"):
+            return self._callback_details
+
         if self.type != Transaction.Type.RESERVE:
             return None
 
@@ -238,6 +266,9 @@ class Transaction(models.Model):
 
     @property
     def recovery_details(self):
+        if hasattr(self, "_recovery_details"):
+            return self._recovery_details
+
         if self.type != Transaction.Type.RESERVE:
             return None
 
@@ -248,6 +279,67 @@ class Transaction(models.Model):
 
         return Recovery.objects.filter(transaction=self).first()
 
+    @classmethod
+    def prefetch_details(cls, transactions):
+        """Resolve callback_details, recovery_details and the is_listed flag of
+        every NFT they render for a list of transactions in a fixed number of
+        queries, instead of a few per RESERVE row.
+
+        The transactions should already have their nft select_related.
+        """
+
+        callback_hashes = {}
+        recover_txs = []
+        for tx in transactions:
+            tx._callback_details = None
+            tx._recovery_details = None
+
+            if tx.type != Transaction.Type.RESERVE:
+                continue
+
+            parsed = json.loads(tx.data)
+            func = parsed["Function"]
+            if func == "CallBack()":
+                callback_hashes[tx.hash] = parsed["Hash"]
+            elif func == "Recover()":
+                recover_txs.append(tx)
+
+        originals = {}
+        if callback_hashes:
+            originals = Transaction.objects.select_related("nft").in_bulk(
+                set(callback_hashes.values())
+            )
+
+        recoveries = {}
+        if recover_txs:
+            for recovery in (
+                Recovery.objects.filter(transaction__in=recover_txs)
+                .prefetch_related(
+                    models.Prefetch(
+                        "outstanding_transactions",
+                        queryset=Transaction.objects.select_related("nft"),
+                    )
+                )
+                .order_by("-pk")
+            ):
+                recoveries[recovery.transaction_id] = recovery
+
+        nfts = []
+        for tx in transactions:
+            if tx.hash in callback_hashes:
+                tx._callback_details = originals.get(callback_hashes[tx.hash])
+            tx._recovery_details = recoveries.get(tx.hash)
+
+            nfts.append(tx.nft)
+            if tx._callback_details:
+                nfts.append(tx._callback_details.nft)
+            if tx._recovery_details:
+                nfts += [
+                    t.nft for t in tx._recovery_details.outstanding_transactions.all()
+                ]
+
+        Nft.prefetch_is_listed([nft for nft in nfts if nft])
+
     def __str__(self):
         return str(self.hash)
 
@@ -440,8 +532,26 @@ class Nft(models.Model):
 
     @property
     def is_listed(self):
+        if hasattr(self, "_is_listed"):
+            return self._is_listed
+
         return Listing.objects.filter(nft=self, is_deleted=False).exists()
 
+    @classmethod
+    def prefetch_is_listed(cls, nfts):
+        """Resolve is_listed for many NFTs with one Listing query."""
+
+        if not nfts:
+            return
+
+        listed = set(
+            Listing.objects.filter(
+                nft__in={nft.pk for nft in nfts}, is_deleted=False
+            ).values_list("nft_id", flat=True)
+        )
+        for nft in nfts:
+            nft._is_listed = nft.pk in listed
+
     class Meta:
         verbose_name = _("NFT")
         verbose_name_plural = _("NFTs")
@@ -487,22 +597,41 @@ class Address(models.Model):
         return tokens
 
     def get_fungible_token_balances(self, serialize_token=False):
+        """Every token this address holds, has moved or owns, with its
+        balance, from FungibleTokenBalance in one query per kind."""
 
-        tokens = self.get_fungible_tokens()
+        holdings = FungibleTokenBalance.objects.filter(
+            address=self.address
+        ).select_related("token")
 
-        token_balances = []
-        for token in tokens:
+        token_balances = [
+            {"token": holding.token, "balance": holding.balance}
+            for holding in holdings
+        ]
 
-            token_balances.append(
-                {
-                    "token": token,
-                    "balance": token.get_address_balance(self.address),
-                }
-            )
+        held = {holding.token_id for holding in holdings}
+        for token in FungibleToken.objects.filter(owner_address=self.address).exclude(
+            pk__in=held
+        ):
+            token_balances.append({"token": token, "balance": Decimal(0)})
 
         return token_balances
 
     def get_balance(self):
+        """[available, locked, total] for this address.
+
+        Reads the address's AddressLedger row when RBX_ADDRESS_LEDGER is on
+        and falls back to aggregating the Transaction table otherwise.
+        """
+
+        if settings.RBX_ADDRESS_LEDGER:
+            ledger = AddressLedger.objects.filter(address=self.address).first()
+            if ledger:
+                return ledger.get_balance()
+
+        return self.compute_balance()
+
+    def compute_balance(self):
         address = self.address
 
         inbound_locked = (
@@ -655,6 +784,53 @@ class Address(models.Model):
         verbose_name_plural = _("Addresses")
 
 
+class AddressLedger(models.Model):
+    """Address.compute_balance, maintained incrementally.
+
+    settled is everything compute_balance adds up except time locks: transfers
+    and fees, ADNR charges, NFT sale proceeds, callbacks and recoveries. It is
+    updated as each transaction, Callback and Recovery is indexed (rbx.ledger).
+    locked is the sum of still-locked transfers touching the address. It is
+    raised when a locked transaction is indexed and recomputed by the
+    sweep_address_locks task once unlock times pass, so it can overstate the
+    lock by up to one sweep interval.
+    """
+
+    address = models.CharField(max_length=255, primary_key=True)
+    settled = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    locked = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+
+    # Gross totals over every transaction type, and received - sent, which is
+    # what the top holders leaderboard ranks by.
+    received = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    sent = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    holdings = models.DecimalField(
+        decimal_places=16, max_digits=32, default=0, db_index=True
+    )
+
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.address
+
+    @property
+    def available(self):
+        if self.address.startswith("xRBX"):
+            return self.settled
+        return self.settled - self.locked
+
+    @property
+    def total(self):
+        return self.available + self.locked
+
+    def get_balance(self):
+        return [self.available, self.locked, self.total]
+
+    class Meta:
+        verbose_name = _("Address Ledger")
+        verbose_name_plural = _("Address Ledgers")
+
+
 class TempAddress(models.Model):
     address = models.CharField(max_length=36, primary_key=True)
     balance = models.DecimalField(default=0, decimal_places=18, max_digits=32)
@@ -703,6 +879,87 @@ class Circulation(SingletonModel):
         return "Circulation"
 
 
+class ChainTotals(SingletonModel):
+    """Running totals behind NetworkMetricsView and sync_circulation, kept up
+    to date by block ingestion (rbx.totals) so neither has to aggregate the
+    Transaction table. rebuilt_at is set once the totals cover the whole
+    chain, either by rebuild_chain_totals or by syncing from genesis; until
+    then readers fall back to the aggregates."""
+
+    block_count = models.BigIntegerField(default=0)
+    # Transactions excluding block rewards, as the metrics report them.
+    transaction_count = models.BigIntegerField(default=0)
+    # Every indexed Transaction row, for list pagination counts.
+    indexed_transaction_count = models.BigIntegerField(default=0)
+    fees_burned = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    adnr_burned = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    dst_burned = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+    vault_activations = models.BigIntegerField(default=0)
+
+    # Crafted-at timestamps (epoch seconds, ascending) of the blocks within
+    # BLOCK_TIME_WINDOW of the newest one.
+    recent_block_times = models.JSONField(default=list)
+
+    rebuilt_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    VAULT_ACTIVATION_BURN = Decimal(4)
+
+    @property
+    def total_burned(self):
+        return (
+            self.fees_burned
+            + self.adnr_burned
+            + self.dst_burned
+            + self.vault_activations * self.VAULT_ACTIVATION_BURN
+        )
+
+    def average_block_time(self, since):
+        """Mean gap between the blocks crafted at or after `since`."""
+
+        cutoff = since.timestamp()
+        times = [t for t in self.recent_block_times if t >= cutoff]
+        if len(times) < 2:
+            return None
+        return (times[-1] - times[0]) / (len(times) - 1)
+
+    def __str__(self):
+        return "Chain Totals"
+
+
+class BlockRange(models.Model):
+    """A maximal run of indexed block heights, start to end inclusive.
+
+    The ranges are disjoint and never adjacent, so a fully synced chain is a
+    single row and every gap is the space between two rows. Maintained with
+    each block batch by rbx.coverage.
+    """
+
+    start = models.IntegerField(primary_key=True)
+    end = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.start}-{self.end}"
+
+
+class ValidatorProduction(models.Model):
+    """Blocks a validator produced per UTC day, maintained with each block
+    batch by rbx.production. Weekly figures and the last produced height
+    are read off these rows rather than the Block table."""
+
+    validator_address = models.CharField(max_length=255)
+    day = models.DateField(db_index=True)
+    blocks = models.IntegerField(default=0)
+    first_height = models.IntegerField()
+    last_height = models.IntegerField()
+
+    class Meta:
+        unique_together = ("validator_address", "day")
+
+    def __str__(self):
+        return f"{self.validator_address} {self.day} [{self.blocks}]"
+
+
 class SentMasterNode(models.Model):
     address = models.CharField(
         _("Address"), max_length=255, primary_key=True, db_index=True
@@ -735,6 +992,49 @@ class SentMasterNode(models.Model):
             last_answer=data["LastAnswerSendDate"],
         )
 
+    @classmethod
+    def upsert(cls, entries) -> int:
+        """Insert or update SentMasterNodes from CLI JSON in one statement.
+
+        Later entries for the same address win, as they did when each entry
+        was saved in turn. Returns the number of distinct addresses.
+        """
+
+        rows = {}
+        for data in entries:
+            node = cls.from_json(data)
+            rows[node.address] = (
+                node.address,
+                node.name,
+                node.ip_address,
+                node.wallet_version,
+                node.date_connected,
+                node.last_answer,
+            )
+
+        if not rows:
+            return 0
+
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                f"""
+                INSERT INTO {cls._meta.db_table} (address, name, ip_address,
+                    wallet_version, date_connected, last_answer)
+                VALUES %s
+                ON CONFLICT (address) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    ip_address = EXCLUDED.ip_address,
+                    wallet_version = EXCLUDED.wallet_version,
+                    date_connected = EXCLUDED.date_connected,
+                    last_answer = EXCLUDED.last_answer
+                """,
+                list(rows.values()),
+                page_size=1000,
+            )
+
+        return len(rows)
+
     def to_json(self):
         return {
             "Address": self.address,
@@ -929,7 +1229,17 @@ class FungibleToken(models.Model):
 
     nsfw = models.BooleanField(default=False)
 
+    # initial_supply + minted - burned, kept current by rbx.tokens as mints
+    # and burns are indexed.
+    supply = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+
     def get_address_balance(self, address):
+        holding = FungibleTokenBalance.objects.filter(
+            token=self, address=address
+        ).first()
+        return holding.balance if holding else Decimal(0)
+
+    def compute_address_balance(self, address):
 
         initial_supply_owned = Decimal(0)
         if self.initial_supply > Decimal(0) and address == self.original_owner_address:
@@ -989,6 +1299,11 @@ class FungibleToken(models.Model):
 
     @property
     def circulating_supply(self):
+        if not self.can_mint and not self.can_burn:
+            return self.initial_supply
+        return self.supply
+
+    def compute_circulating_supply(self):
         if not self.can_mint and not self.can_burn:
             return self.initial_supply
 
@@ -1025,6 +1340,34 @@ class FungibleTokenTx(models.Model):
         return f"{self.type} ({self.token})"
 
 
+class FungibleTokenBalance(models.Model):
+    """FungibleToken.compute_address_balance per holder, maintained by
+    rbx.tokens as token transactions are indexed.
+
+    A row exists for every address that ever held or moved the token, so
+    holders that sent everything away keep a zero balance, as they did when
+    the holder list was built from FungibleTokenTx.
+    """
+
+    token = models.ForeignKey(
+        FungibleToken, on_delete=models.CASCADE, related_name="balances"
+    )
+    address = models.CharField(max_length=64, db_index=True)
+    balance = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+
+    class Meta:
+        unique_together = ("token", "address")
+        indexes = [
+            models.Index(
+                fields=["token", "-balance", "address"],
+                name="rbx_ft_balance_holders_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.address} ({self.token_id}): {self.balance}"
+
+
 class TokenVoteTopic(models.Model):
 
     sc_identifier = models.CharField(max_length=64)
@@ -1115,22 +1458,19 @@ class VbtcToken(models.Model):
 
     @property
     def addresses(self):
-        owner_address = self.owner_address
-        transfers = VbtcTokenAmountTransfer.objects.filter(token=self).order_by(
-            "created_at"
-        )
-        entries = {owner_address: self.global_balance}
-        for t in transfers:
-
-            if t.transaction.to_address in entries:
-                entries[t.transaction.to_address] += t.amount
-            else:
-                entries[t.transaction.to_address] = t.amount
-
-            if t.transaction.from_address in entries:
-                entries[t.transaction.from_address] -= t.amount
-            else:
-                entries[t.transaction.from_address] = -t.amount
+        transfers = VbtcTokenAmountTransfer.objects.filter(token=self)
+        entries = {self.owner_address: self.global_balance}
+
+        # Two grouped sums instead of walking every transfer and its
+        # transaction; the result does not depend on transfer order.
+        for field, sign in (
+            ("transaction__to_address", 1),
+            ("transaction__from_address", -1),
+        ):
+            for address, amount in transfers.values_list(field).annotate(
+                total=Sum("amount")
+            ):
+                entries[address] = entries.get(address, Decimal(0)) + sign * amount
 
         return entries
 
@@ -1173,6 +1513,10 @@ class VbtcV2Token(models.Model):
     total_received = models.DecimalField(decimal_places=16, max_digits=32, default=0)
     total_sent = models.DecimalField(decimal_places=16, max_digits=32, default=0)
     tx_count = models.IntegerField(default=0)
+    # BTC chain tip the balance fields were last read at by the balance sweep.
+    # Confirmed balances cannot change until the tip moves, so the sweep
+    # skips tokens already read at the current tip.
+    balance_tip = models.CharField(max_length=64, blank=True, default="")
     is_pending_withdrawal = models.BooleanField(default=False)
     created_at = models.DateTimeField()
 
@@ -1222,8 +1566,18 @@ class VbtcV2Token(models.Model):
         """Per-address ledger from transfers and completed withdrawals,
         WITHOUT the owner anchor (global_balance + withdrawn add-back).
 
-        Settlement rows created at ownership transfer are ordinary
-        VbtcV2TokenTransfer rows, so they flow through here unchanged.
+        Read from VbtcV2Balance, which rbx.vbtc_ledger updates as transfer
+        and withdrawal rows are written. Settlement rows created at ownership
+        transfer are ordinary VbtcV2TokenTransfer rows, so they are counted
+        like any other transfer.
+        """
+        # .all() rather than values_list so prefetch_related("ledger") on a
+        # list of tokens is used.
+        return {entry.address: entry.balance for entry in self.ledger.all()}
+
+    def replay_ledger_entries(self):
+        """ledger_entries recomputed by replaying every transfer and completed
+        withdrawal. O(history); rbx.vbtc_ledger uses it to verify the ledger.
         """
         transfers = VbtcV2TokenTransfer.objects.filter(token=self).order_by(
             "created_at"
@@ -1258,7 +1612,8 @@ class VbtcV2Token(models.Model):
             status__in=VbtcV2WithdrawalRequest.ACTIVE_STATUSES,
             requestor_address=address,
         ).aggregate(total=Sum("amount"))["total"] or Decimal(0)
-        return self.ledger_entries().get(address, Decimal(0)) - pending
+        entry = self.ledger.filter(address=address).first()
+        return (entry.balance if entry else Decimal(0)) - pending
 
     @property
     def addresses(self):
@@ -1267,9 +1622,21 @@ class VbtcV2Token(models.Model):
         # global_balance already reflects BTC that left the deposit address,
         # so add total_withdrawn back to the owner to compensate (the
         # per-requestor debits live in ledger_entries).
-        total_withdrawn = VbtcV2WithdrawalRequest.objects.filter(
-            token=self, status=VbtcV2WithdrawalRequest.Status.COMPLETED
-        ).aggregate(total=Sum("amount"))["total"] or Decimal(0)
+        # Listings prefetch the withdrawals; anything else aggregates rather
+        # than loading every row.
+        if "withdrawal_requests" in getattr(self, "_prefetched_objects_cache", {}):
+            total_withdrawn = sum(
+                (
+                    w.amount
+                    for w in self.withdrawal_requests.all()
+                    if w.status == VbtcV2WithdrawalRequest.Status.COMPLETED
+                ),
+                Decimal(0),
+            )
+        else:
+            total_withdrawn = self.withdrawal_requests.filter(
+                status=VbtcV2WithdrawalRequest.Status.COMPLETED
+            ).aggregate(total=Sum("amount"))["total"] or Decimal(0)
 
         # Owner anchor = global_balance (actual BTC on deposit) + total_withdrawn
         entries[self.owner_address] = (
@@ -1380,6 +1747,25 @@ class VbtcV2WithdrawalRequest(models.Model):
         return f"{self.token.sc_identifier} withdrawal [{self.status}]"
 
 
+class VbtcV2Balance(models.Model):
+    """VbtcV2Token.ledger_entries for one address, maintained by
+    rbx.vbtc_ledger in the transaction that writes each transfer or
+    completes each withdrawal. verify_vbtc_ledger checks it against a replay
+    of the history."""
+
+    token = models.ForeignKey(
+        VbtcV2Token, on_delete=models.CASCADE, related_name="ledger"
+    )
+    address = models.CharField(max_length=64, db_index=True)
+    balance = models.DecimalField(decimal_places=16, max_digits=32, default=0)
+
+    class Meta:
+        unique_together = ("token", "address")
+
+    def __str__(self):
+        return f"{self.address} ({self.token_id}): {self.balance}"
+
+
 class UnindexedMint(models.Model):
     """A mint whose smart-contract data the CLI would not hand over.
 
@@ -1413,3 +1799,43 @@ class UnindexedMint(models.Model):
     class Meta:
         unique_together = ("sc_identifier", "transaction")
         ordering = ["-first_seen_at"]
+
+
+class SmartContractSnapshot(models.Model):
+    """GetSmartContractData as the CLI served it for one contract state.
+
+    A contract's data only changes through its own transactions (mint,
+    evolve/devolve, burn), so `state` is the hash of the transaction that
+    produced it. A state-changing transaction therefore never reads an
+    earlier snapshot, while replaying a transaction (reprocess commands,
+    retry_unindexed_mints) reuses the one it fetched the first time instead
+    of asking the CLI again. The raw JSON text is kept so callers get back
+    exactly what the CLI returned.
+    """
+
+    sc_identifier = models.CharField(max_length=64)
+    state = models.CharField(max_length=255)
+    data = models.TextField()
+    fetched_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sc_identifier} @ {self.state}"
+
+    class Meta:
+        unique_together = ("sc_identifier", "state")
+
+    @classmethod
+    def lookup(cls, sc_identifier: str, state: str):
+        data = (
+            cls.objects.filter(sc_identifier=sc_identifier, state=state)
+            .values_list("data", flat=True)
+            .first()
+        )
+        return None if data is None else json.loads(data)
+
+    @classmethod
+    def store(cls, sc_identifier: str, state: str, data) -> None:
+        cls.objects.bulk_create(
+            [cls(sc_identifier=sc_identifier, state=state, data=json.dumps(data))],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,146 @@
+"""New-block notifications for the socket service, through a Redis outbox.
+
+Ingestion only pushes the new height onto a Redis list. The first push in a
+burst also queues one flush_block_notifications task, which runs
+SOCKET_NOTIFY_DELAY seconds later and drains everything pushed since.
+
+A flush with one height sends the usual "new_block" event. A flush with many
+heights, which happens during catch-up, sends one "new_blocks" event with
+compact summaries of up to SOCKET_BATCH_MAX of the newest heights, followed by
+"new_block" for the tip only. Subscribers still see the tip without receiving
+thousands of events, and ingestion never waits on the socket service.
+"""
+
+import json
+import logging
+from typing import Iterable, List
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.transaction import on_commit
+from django_redis import get_redis_connection
+
+from project.utils.encoders import DecimalEncoder
+from rbx.models import Block
+
+logger = logging.getLogger(__name__)
+
+COMPACT_FIELDS = (
+    "height",
+    "hash",
+    "validator_address",
+    "date_crafted",
+    "total_amount",
+    "total_reward",
+)
+
+
+def outbox_key() -> str:
+    return cache.make_key(settings.SOCKET_OUTBOX_KEY)
+
+
+def notify_new_blocks(heights: Iterable[int]) -> None:
+    """Queue new-block notifications once the current transaction commits."""
+
+    heights = list(heights)
+    if not settings.SOCKET_BASE_URL or not heights:
+        return
+
+    on_commit(lambda: push(heights))
+
+
+def push(heights: List[int]) -> None:
+    from rbx.tasks import flush_block_notifications
+
+    get_redis_connection("default").rpush(outbox_key(), *heights)
+
+    if cache.add(settings.SOCKET_OUTBOX_PENDING_KEY, 1, settings.SOCKET_OUTBOX_TIMEOUT):
+        flush_block_notifications.apply_async(countdown=settings.SOCKET_NOTIFY_DELAY)
+
+
+def drain() -> List[int]:
+    """Pop every queued height, deduplicated and ascending."""
+
+    # Clear the flag first, so heights pushed while this runs queue a new
+    # flush instead of waiting for the next burst.
+    cache.delete(settings.SOCKET_OUTBOX_PENDING_KEY)
+
+    pipe = get_redis_connection("default").pipeline()
+    pipe.lrange(outbox_key(), 0, -1)
+    pipe.delete(outbox_key())
+    queued, _ = pipe.execute()
+
+    return sorted({int(height) for height in queued})
+
+
+def compact_blocks(heights: List[int]) -> List[dict]:
+    return list(
+        Block.objects.select_related(None)
+        .prefetch_related(None)
+        .filter(height__in=heights)
+        .annotate(transaction_count=Count("transactions"))
+        .order_by("height")
+        .values(*COMPACT_FIELDS, "transaction_count")
+    )
+
+
+def block_events(heights: List[int]) -> List[dict]:
+    """The socket events for a drained batch of heights."""
+
+    if not heights:
+        return []
+
+    events = []
+    if len(heights) > 1:
+        summaries = compact_blocks(heights[-settings.SOCKET_BATCH_MAX :])
+        events.append(
+            {
+                "type": "new_blocks",
+                "data": summaries,
+                "message": f"blocks {heights[0]}-{heights[-1]}",
+            }
+        )
+
+    tip = heights[-1]
+    if settings.SOCKET_COMPACT_BLOCKS:
+        data = next(iter(compact_blocks([tip])), None)
+    else:
+        from api.block.serializers import BlockSerializer
+
+        block = Block.objects.filter(height=tip).first()
+        data = BlockSerializer(block).data if block else None
+
+    if data:
+        events.append({"type": "new_block", "data": data, "message": f"block {tip}"})
+
+    return events
+
+
+def send_event(event: dict) -> None:
+    requests.post(
+        f"{settings.SOCKET_BASE_URL}/event/",
+        data=json.dumps({**event, "api_key": settings.SOCKET_TOKEN}, cls=DecimalEncoder),
+        headers={
+            "Content-Type": "application/json",
+        },
+        timeout=(5, 15),
+    )
+
+
+def flush() -> int:
+    """Send the queued notifications. Returns the number of events sent.
+
+    Notifications are best effort: an event the socket service does not take
+    is logged and dropped, because the next block supersedes it.
+    """
+
+    sent = 0
+    for event in block_events(drain()):
+        try:
+            send_event(event)
+            sent += 1
+        except requests.RequestException as e:
+            logger.warning(f"Socket notification {event['message']} failed: {e}")
+    return sent
@@ -0,0 +1,116 @@
+"""Validator block production counters.
+
+MasterNode.block_count and the per-day ValidatorProduction rollup are only
+ever changed by additive upserts, so concurrent sync_block workers cannot
+lose each other's increments. record_production belongs in the transaction
+that writes the blocks; rebuild_production recomputes both from the Block
+table with one grouped aggregate each.
+"""
+
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+from typing import Iterable
+
+from django.db import connection
+from django.db.transaction import atomic as atomic_transaction
+from psycopg2.extras import execute_values
+
+from rbx.models import Block, MasterNode, ValidatorProduction
+
+
+def production_rows(blocks: Iterable[Block]) -> list:
+    """(validator, day, blocks, first_height, last_height) per validator and
+    UTC day."""
+
+    days = defaultdict(list)
+    for block in blocks:
+        day = block.date_crafted.astimezone(dt_timezone.utc).date()
+        days[(block.validator_address, day)].append(block.height)
+
+    return [
+        (validator, day, len(heights), min(heights), max(heights))
+        for (validator, day), heights in sorted(days.items())
+    ]
+
+
+def record_production(blocks: Iterable[Block]) -> None:
+    """Count newly indexed blocks towards their validators."""
+
+    rows = production_rows(blocks)
+    if not rows:
+        return
+
+    table = ValidatorProduction._meta.db_table
+    produced = defaultdict(int)
+    for validator, _, count, _, _ in rows:
+        produced[validator] += count
+
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table}
+                (validator_address, day, blocks, first_height, last_height)
+            VALUES %s
+            ON CONFLICT (validator_address, day) DO UPDATE SET
+                blocks = {table}.blocks + EXCLUDED.blocks,
+                first_height = LEAST({table}.first_height, EXCLUDED.first_height),
+                last_height = GREATEST({table}.last_height, EXCLUDED.last_height)
+            """,
+            rows,
+        )
+
+        execute_values(
+            cursor,
+            f"""
+            UPDATE {MasterNode._meta.db_table} m
+            SET block_count = m.block_count + v.blocks
+            FROM (VALUES %s) AS v (address, blocks)
+            WHERE m.address = v.address
+            """,
+            sorted(produced.items()),
+        )
+
+
+def reset_production() -> None:
+    """Forget all production, for a sync from genesis."""
+
+    ValidatorProduction.objects.all().delete()
+    MasterNode.objects.exclude(block_count=0).update(block_count=0)
+
+
+def rebuild_production() -> int:
+    """Recompute ValidatorProduction and MasterNode.block_count from the
+    indexed blocks. Returns the number of rollup rows written."""
+
+    blocks = Block._meta.db_table
+
+    with atomic_transaction(), connection.cursor() as cursor:
+        reset_production()
+
+        cursor.execute(
+            f"""
+            INSERT INTO {ValidatorProduction._meta.db_table}
+                (validator_address, day, blocks, first_height, last_height)
+            SELECT validator_address, (date_crafted AT TIME ZONE 'UTC')::date,
+                COUNT(*), MIN(height), MAX(height)
+            FROM {blocks}
+            GROUP BY 1, 2
+            """
+        )
+        written = cursor.rowcount
+
+        cursor.execute(
+            f"""
+            UPDATE {MasterNode._meta.db_table} m
+            SET block_count = produced.blocks
+            FROM (
+                SELECT validator_address AS address, COUNT(*) AS blocks
+                FROM {blocks}
+                GROUP BY 1
+            ) produced
+            WHERE m.address = produced.address
+            """
+        )
+
+    return written
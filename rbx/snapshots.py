@@ -0,0 +1,87 @@
+"""Stale-while-revalidate reads of computed SingletonModel snapshots.
+
+Endpoints such as circulation and network metrics used to recompute their
+singleton inside the request once it was older than a few seconds. Every
+request that landed in that window ran the same aggregates (or the same CLI
+call) in parallel, so aggregator polling turned each stale window into a
+burst of database load.
+
+load_snapshot always returns the stored row straight away. When the row is
+stale, the first request to notice takes a lock in the shared cache and
+queues one refresh_snapshot task. The task holds the lock for max_age after
+it finishes, so a source that keeps its timestamp (NetworkMetrics.created_at
+comes from the CLI) is still refreshed at most once per window.
+
+To add a snapshot, define its refresh function and call register_snapshot
+next to it.
+"""
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Dict, Type
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from rbx.models import SingletonModel
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    name: str
+    model: Type[SingletonModel]
+    refresh: Callable[[], None]
+    max_age: timedelta
+    timestamp_field: str = "updated_at"
+
+    @property
+    def lock_key(self) -> str:
+        return f"{settings.RBX_SNAPSHOT_LOCK_PREFIX}{self.name}"
+
+    def is_stale(self, obj) -> bool:
+        stamp = getattr(obj, self.timestamp_field)
+        return stamp is None or stamp < timezone.now() - self.max_age
+
+
+SNAPSHOTS: Dict[str, Snapshot] = {}
+
+
+def register_snapshot(
+    name, model, refresh, max_age, timestamp_field="updated_at"
+) -> Snapshot:
+    snapshot = Snapshot(name, model, refresh, max_age, timestamp_field)
+    SNAPSHOTS[name] = snapshot
+    return snapshot
+
+
+def load_snapshot(name: str):
+    """The stored snapshot, queueing a single background refresh if it is
+    stale."""
+
+    # Importing the task also registers the snapshots defined in rbx.tasks.
+    from rbx.tasks import refresh_snapshot
+
+    snapshot = SNAPSHOTS[name]
+    obj = snapshot.model.load()
+
+    if snapshot.is_stale(obj) and cache.add(
+        snapshot.lock_key, 1, timeout=settings.RBX_SNAPSHOT_LOCK_TIMEOUT
+    ):
+        try:
+            refresh_snapshot.apply_async(args=[name])
+        except Exception:
+            cache.delete(snapshot.lock_key)
+            raise
+
+    return obj
+
+
+def run_refresh(name: str) -> None:
+    """Body of refresh_snapshot: refresh, then hold the lock for a window."""
+
+    snapshot = SNAPSHOTS[name]
+    try:
+        snapshot.refresh()
+    finally:
+        cache.set(snapshot.lock_key, 1, timeout=snapshot.max_age.total_seconds())
@@ -3,22 +3,34 @@ import logging
 import time
 import json
 import requests
-from tqdm import tqdm
 import base64
 import gzip
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
-import pytz
-from django.db.models import Q, Sum, F, Max
-from django.db.transaction import atomic as atomic_transaction
+from typing import Optional
+from django.db.models import Q, F, Max
+from django.db.transaction import atomic as atomic_transaction, on_commit
+from django.core.cache import cache
 from django.utils import timezone
-from api.block.serializers import BlockSerializer
 from project.celery import app
-from project.utils.encoders import DecimalEncoder
 from rbx.chain_contract import smart_contract_from_chain
 from rbx.client import get_master_nodes, get_block, get_nft, get_topics
 from shop.media import scp_down_folder, upload_to_s3
 from rbx.exceptions import RBXException
+from rbx.coverage import record_heights
+from rbx.notifications import flush as flush_notifications, notify_new_blocks
+from rbx.ledger import apply_ledger_deltas, ledger_deltas
+from rbx.production import rebuild_production, record_production, reset_production
+from rbx.tokens import record_deploy, record_token_tx
+from rbx.snapshots import register_snapshot, run_refresh
+from rbx.totals import current_totals, record_blocks
+from rbx.ingest import (
+    apply_balance_deltas,
+    balance_deltas,
+    block_from_json,
+    rebuild_balances,
+    transactions_from_json,
+)
 from rbx.models import (
     FungibleToken,
     FungibleTokenTx,
@@ -28,6 +40,7 @@ from rbx.models import (
     TokenVoteTopicVote,
     Transaction,
     Address,
+    AddressLedger,
     Nft,
     Circulation,
     Topic,
@@ -42,7 +55,7 @@ from rbx.models import (
     VbtcV2WithdrawalRequest,
     UnindexedMint,
 )
-from rbx.utils import get_ip_location, network_metrics
+from rbx.utils import get_ip_locations, network_metrics
 from dateutil import parser
 from django.conf import settings
 from connect.email.tasks import send_sale_started_email
@@ -50,99 +63,149 @@ from shop.tasks import handle_auction_sale_complete_tx
 from shop.models import Listing
 
 
+MASTER_NODE_SYNC_FIELDS = [
+    "name",
+    "is_active",
+    "connection_id",
+    "ip_address",
+    "wallet_version",
+    "date_connected",
+    "city",
+    "region",
+    "country",
+    "time_zone",
+    "latitude",
+    "longitude",
+]
+
+
+def is_answering(last_answer: Optional[str]) -> bool:
+    """Whether a sent master node answered within the last 15 minutes."""
+
+    if not last_answer:
+        return False
+
+    d = parser.parse(f"{last_answer.replace('Z', '')}+00:00")
+    minutes = (timezone.now() - d).total_seconds() / 60
+    return minutes <= 15
+
+
 @app.task(autoretry_for=[RBXException])
 def sync_master_nodes(update_blocks: bool = False) -> None:
+    """Reconcile MasterNode with the CLI's sent master nodes as sets.
+
+    The active set is diffed in memory and written with one UPDATE for the
+    nodes that dropped out plus bulk_create/bulk_update for the rest, rather
+    than a query and a save per node. block_count is left alone; ingestion
+    maintains it.
+    """
+
     start = time.time()
     logging.info("Synchronizing Master Nodes")
 
-    active_nodes = []
     logging.info("Querying Master Nodes...")
+    sent = [
+        m.to_json()
+        for m in SentMasterNode.objects.all()
+        if is_answering(m.last_answer)
+    ]
+    locations = get_ip_locations(data["IpAddress"] for data in sent)
+
+    active_nodes = {}
+    for data in sent:
+        location = locations.get(data["IpAddress"])
+        active_nodes[data["Address"]] = MasterNode(
+            address=data["Address"],
+            name=data["UniqueName"],
+            is_active=True,
+            connection_id="",
+            ip_address=data["IpAddress"],
+            wallet_version=data["WalletVersion"],
+            date_connected=data["ConnectDate"],
+            city=location["city"] if location else None,
+            region=location["region"] if location else None,
+            country=location["country_name"] if location else None,
+            time_zone=location["time_zone"] if location else None,
+            latitude=(location["latitude"] if location else None) or Decimal(0),
+            longitude=(location["longitude"] if location else None) or Decimal(0),
+        )
 
-    masternodes = SentMasterNode.objects.all()
+    with atomic_transaction():
+        MasterNode.objects.filter(is_active=True).exclude(
+            address__in=list(active_nodes)
+        ).update(is_active=False)
 
-    for m in masternodes:
-        data = m.to_json()
-        ip_address = data["IpAddress"]
-        try:
-            location = get_ip_location(ip_address)
-        except:
-            location = None
+        existing = set(
+            MasterNode.objects.filter(address__in=list(active_nodes)).values_list(
+                "address", flat=True
+            )
+        )
+        MasterNode.objects.bulk_create(
+            [n for a, n in active_nodes.items() if a not in existing], batch_size=500
+        )
+        MasterNode.objects.bulk_update(
+            [n for a, n in active_nodes.items() if a in existing],
+            MASTER_NODE_SYNC_FIELDS,
+            batch_size=500,
+        )
 
-        last_answer = data["LastAnswerSendDate"]
-        make_active = True
-        if last_answer:
-            d = parser.parse(f"{last_answer.replace('Z', '')}+00:00")
+    if update_blocks:
+        logging.info("Updating Blocks...")
+        # One joined UPDATE instead of one per master node.
+        Block.objects.filter(
+            master_node__isnull=True,
+            validator_address__in=MasterNode.objects.values("address"),
+        ).update(master_node_id=F("validator_address"))
+
+    end = time.time()
+    logging.info(f"Synchronized Master Nodes [elapsed: {end - start}]")
 
-            delta = timezone.now() - d
-            # d = parser.parse(last_answer).replace(tzinfo=None)
-            # delta = datetime.now() - d
-            minutes = delta.total_seconds() / 60
 
-            if minutes > 15:
-                make_active = False
-        else:
-            make_active = False
-
-        if make_active:
-            mn = MasterNode(
-                address=data["Address"],
-                name=data["UniqueName"],
-                is_active=True,
-                connection_id="",
-                ip_address=ip_address,
-                wallet_version=data["WalletVersion"],
-                date_connected=data["ConnectDate"],
-                city=location["city"] if location else None,
-                region=location["region"] if location else None,
-                country=location["country_name"] if location else None,
-                time_zone=location["time_zone"] if location else None,
-                latitude=location["latitude"] if location else Decimal(0),
-                longitude=location["longitude"] if location else Decimal(0),
-            )
+def forward_master_nodes(payload: list) -> None:
+    """Queue the sent master nodes for RBX_FORWARD_SEND_MASTER_NODES.
 
-            active_nodes.append(mn)
+    The latest payload is parked in the cache and one forward task is queued
+    per batch of submissions. A slow or unreachable target therefore never
+    holds up the CLI's request, and a backlog of submissions collapses into
+    a single forward of the newest list.
+    """
 
-    active_addresses = []
-    for node in active_nodes:
-        active_addresses.append(node.address)
+    cache.set(
+        settings.RBX_FORWARD_PAYLOAD_KEY,
+        payload,
+        settings.RBX_FORWARD_PAYLOAD_TIMEOUT,
+    )
+    if cache.add(
+        settings.RBX_FORWARD_PENDING_KEY, 1, settings.RBX_FORWARD_PAYLOAD_TIMEOUT
+    ):
+        send_forwarded_master_nodes.apply_async()
 
-    current_nodes = MasterNode.objects.all()
-    for node in current_nodes:
-        if node.address not in active_addresses:
-            node.is_active = False
-            node.save()
 
-    for node in active_nodes:
-        try:
-            n = MasterNode.objects.get(address=node.address)
-        except MasterNode.DoesNotExist:
-            n = MasterNode()
-
-        n.name = node.name
-        n.address = node.address
-        n.is_active = True
-        n.connection_id = node.connection_id
-        n.ip_address = node.ip_address
-        n.wallet_version = node.wallet_version
-        n.date_connected = node.date_connected
-        n.city = node.city
-        n.region = node.region
-        n.country = node.country
-        n.time_zone = node.time_zone
-        n.latitude = node.latitude or Decimal(0)
-        n.longitude = node.longitude or Decimal(0)
-        n.save()
+@app.task(
+    autoretry_for=[requests.RequestException],
+    retry_backoff=True,
+    retry_jitter=True,
+    max_retries=5,
+)
+def send_forwarded_master_nodes() -> None:
+    # Clear the flag before reading, so a submission that lands while this
+    # runs queues a fresh forward rather than being dropped.
+    cache.delete(settings.RBX_FORWARD_PENDING_KEY)
 
-    if update_blocks:
-        logging.info("Updating Blocks...")
-        nodes = MasterNode.objects.all()
-        for node in nodes:
-            blocks = Block.objects.filter(
-                master_node__isnull=True, validator_address=node.address
-            ).update(master_node=node)
+    payload = cache.get(settings.RBX_FORWARD_PAYLOAD_KEY)
+    if not payload or not settings.RBX_FORWARD_SEND_MASTER_NODES:
+        return
 
-    end = time.time()
-    logging.info(f"Synchronized Master Nodes [elapsed: {end - start}]")
+    response = requests.post(
+        settings.RBX_FORWARD_SEND_MASTER_NODES,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        },
+        data=json.dumps(payload),
+        timeout=(5, 30),
+    )
+    response.raise_for_status()
 
 
 @app.task(autoretry_for=[RBXException])
@@ -155,34 +218,19 @@ def sync_block(height: int) -> None:
 
     if height == 0:
         Address.objects.all().delete()
+        AddressLedger.objects.all().delete()
+        reset_production()
 
-    validator_address = data["Validator"]
-    try:
-        master_node = MasterNode.objects.get(address=validator_address)
-        master_node.block_count = master_node.block_count + 1
-        master_node.save()
-    except MasterNode.DoesNotExist:
-        master_node = None
+    master_node = MasterNode.objects.filter(address=data["Validator"]).first()
 
+    parsed = block_from_json({**data, "Height": height})
+    parsed.master_node = master_node
     block, block_created = Block.objects.get_or_create(
         height=height,
         defaults={
-            "master_node": master_node,
-            "hash": data["Hash"],
-            "previous_hash": data["PrevHash"],
-            "validator_address": validator_address,
-            "validator_signature": data["ValidatorSignature"],
-            "validator_answer": data["ValidatorAnswer"],
-            "chain_ref_id": data["ChainRefId"],
-            "merkle_root": data["MerkleRoot"],
-            "state_root": data["StateRoot"],
-            "total_reward": data["TotalReward"],
-            "total_amount": data["TotalAmount"],
-            "total_validators": data["TotalValidators"],
-            "version": data["Version"],
-            "size": data["Size"],
-            "craft_time": data["BCraftTime"],
-            "date_crafted": datetime.fromtimestamp(data["Timestamp"], pytz.UTC),
+            field.attname: getattr(parsed, field.attname)
+            for field in Block._meta.concrete_fields
+            if field.attname != "height"
         },
     )
 
@@ -190,106 +238,43 @@ def sync_block(height: int) -> None:
         block.master_node = master_node
         block.save()
 
-    for transaction in data["Transactions"]:
-        if transaction.get("TransactionStatus") == 999:
-            continue
-
-        unlock_time = None
-        if "UnlockTime" in transaction and transaction["UnlockTime"]:
-            unlock_time = timezone.make_aware(
-                datetime.fromtimestamp(transaction["UnlockTime"])
-            )
-
-        tx = Transaction.objects.create(
-            hash=transaction["Hash"],
-            block=block,
-            height=block.height,
-            type=transaction["TransactionType"],
-            to_address=transaction["ToAddress"],
-            from_address=transaction["FromAddress"],
-            total_amount=Decimal(transaction["Amount"]),
-            total_fee=Decimal(transaction["Fee"]),
-            data=transaction["Data"],
-            signature=transaction["Signature"],
-            date_crafted=datetime.fromtimestamp(data["Timestamp"], pytz.UTC),
-            unlock_time=unlock_time,
-        )
-
-        process_transaction(tx)
+    transactions = transactions_from_json(block, data)
+    for tx in transactions:
+        # A transaction and its balance delta commit together, so
+        # rebuild_balances never counts one without the other.
+        with atomic_transaction():
+            tx.save(force_insert=True)
 
-        # Balances
-        to_address, _ = Address.objects.get_or_create(address=tx.to_address)
-        b = to_address.balance + tx.total_amount
+            process_transaction(tx)
 
-        # ADNR Transfer In
-        if tx.type == Transaction.Type.ADDRESS and to_address != "Adnr_Base":
-            if block.height > 832000 or settings.ENVIRONMENT == "testnet":
-                b -= Decimal(5.0)
-            else:
-                b -= Decimal(1.0)
+            # Balances
+            apply_balance_deltas(balance_deltas(tx))
+            apply_ledger_deltas(ledger_deltas(tx))
 
-        to_address.balance = b
+    if block_created:
+        record_blocks([(block, transactions)])
+        record_production([block])
+        record_heights([block.height])
+        notify_new_block(block.height)
 
-        to_address.save()
+    end = time.time()
+    logging.info(f"Synchronized Block {height} [elapsed: {end - start}]")
 
-        if (
-            tx.from_address != "Coinbase_TrxFees"
-            and tx.from_address != "Coinbase_BlkRwd"
-        ):
-            from_address, _ = Address.objects.get_or_create(address=tx.from_address)
-            from_address.balance = from_address.balance - (
-                tx.total_amount + tx.total_fee
-            )
-            from_address.save()
 
-    if block_created:
-        b = None
-        try:
-            b = Block.objects.get(height=block.height)
-        except Block.DoesNotExist:
-            pass
-        if b:
-
-            socket_payload = json.dumps(
-                {
-                    "type": "new_block",
-                    "data": BlockSerializer(b).data,
-                    "message": f"block {b.height}",
-                    "api_key": settings.SOCKET_TOKEN,
-                },
-                cls=DecimalEncoder,
-            )
+def notify_new_block(height: int) -> None:
+    notify_new_blocks([height])
 
-            notify_socket_service(socket_payload)
 
-    end = time.time()
-    logging.info(f"Synchronized Block {height} [elapsed: {end - start}]")
+@app.task
+def flush_block_notifications() -> None:
+    flush_notifications()
 
 
 @app.task(autoretry_for=[RBXException])
 def resync_balances() -> None:
-    print("Deleting Addresses")
-    Address.objects.all().delete()
-    print("Deleted.")
-
-    transactions = Transaction.objects.all()
-    with tqdm(total=len(transactions), desc="Processing Tx") as progress:
-        for tx in transactions:
-            to_address, _ = Address.objects.get_or_create(address=tx.to_address)
-            to_address.balance = to_address.balance + tx.total_amount
-            to_address.save()
-
-            if (
-                tx.from_address != "Coinbase_TrxFees"
-                and tx.from_address != "Coinbase_BlkRwd"
-            ):
-                from_address, _ = Address.objects.get_or_create(address=tx.from_address)
-                from_address.balance = from_address.balance - (
-                    tx.total_amount + tx.total_fee
-                )
-                from_address.save()
-
-            progress.update()
+    print("Rebuilding Address balances")
+    changed = rebuild_balances()
+    print(f"Updated {changed} balances")
 
 
 # @app.task(autoretry_for=[RBXException])
@@ -444,7 +429,7 @@ def process_transaction(tx: Transaction):
 
         function = parsed["Function"]
 
-        data = get_nft(identifier)
+        data = get_nft(identifier, state=tx.hash)
 
         if not data:
             # The CLI can refuse a contract indefinitely, but a V2 mint carries
@@ -521,6 +506,7 @@ def process_transaction(tx: Transaction):
                             token = FungibleToken.objects.get(sc_identifier=identifier)
                         except FungibleToken.DoesNotExist:
                             token = FungibleToken(sc_identifier=identifier)
+                        deployed = token.pk is None
 
                         token.smart_contract = nft
                         token.create_transaction = tx
@@ -537,11 +523,15 @@ def process_transaction(tx: Transaction):
                         token.original_owner_address = tx.from_address
 
                         token.save()
+                        if deployed:
+                            record_deploy(token)
 
                         nft.is_fungible_token = True
                         nft.save()
 
-                        handle_token_icon_upload.apply_async(args=[identifier])
+                        on_commit(
+                            lambda: handle_token_icon_upload.apply_async(args=[identifier])
+                        )
 
         if function == "Mint()":
 
@@ -571,7 +561,9 @@ def process_transaction(tx: Transaction):
                         nft.is_vbtc = True
                         nft.save()
 
-                        handle_vbtc_icon_upload.apply_async(args=[identifier])
+                        on_commit(
+                            lambda: handle_vbtc_icon_upload.apply_async(args=[identifier])
+                        )
 
                     if feature["FeatureName"] == 14:
                         v2_info = feature["FeatureFeatures"]
@@ -601,7 +593,9 @@ def process_transaction(tx: Transaction):
                         nft.is_vbtc = True
                         nft.save()
 
-                        handle_vbtc_v2_icon_upload.apply_async(args=[identifier])
+                        on_commit(
+                            lambda: handle_vbtc_v2_icon_upload.apply_async(args=[identifier])
+                        )
 
         resolve_unindexed_mint(identifier)
 
@@ -628,7 +622,7 @@ def process_transaction(tx: Transaction):
         elif func in ["ChangeEvolveStateSpecific()", "Evolve()", "Devolve()"]:
             nft.misc_transactions.add(tx)
 
-            updated_data = get_nft(nft.identifier)
+            updated_data = get_nft(nft.identifier, state=tx.hash)
             if updated_data:
                 nft.smart_contract_data = json.dumps(updated_data)
 
@@ -644,11 +638,15 @@ def process_transaction(tx: Transaction):
         if func == "Sale_Start()":
             can_complete = handle_auction_sale_complete_tx(tx.hash, True)
             if can_complete:
-                handle_auction_sale_complete_tx.apply_async(
-                    args=[tx.hash, False], countdown=60
+                on_commit(
+                    lambda: handle_auction_sale_complete_tx.apply_async(
+                        args=[tx.hash, False], countdown=60
+                    )
                 )
             else:
-                send_sale_started_email.apply_async(args=[tx.hash])
+                on_commit(
+                    lambda: send_sale_started_email.apply_async(args=[tx.hash])
+                )
 
         if func == "Sale_Complete()":
             sub_transactions = parsed["Transactions"]
@@ -847,6 +845,7 @@ def process_transaction(tx: Transaction):
             )
 
             ftt.save()
+            record_token_tx(ftt)
 
         elif func == "TokenTransfer()":
             from_address = parsed["FromAddress"]
@@ -862,6 +861,7 @@ def process_transaction(tx: Transaction):
                 amount=amount,
             )
             ftt.save()
+            record_token_tx(ftt)
 
         elif func == "TokenContractOwnerChange()":
             from_address = parsed["FromAddress"]
@@ -1398,44 +1398,9 @@ def process_shop(tx):
 
 @app.task(autoretry_for=[RBXException])
 def sync_circulation():
-    total = Decimal(0)
-
     circulation = Circulation.load()
 
-    # Block zero balance
-    query = Transaction.objects.filter(height=0).aggregate(Sum("total_amount"))
-    amount = query["total_amount__sum"]
-    total = amount
-
-    rewards = Transaction.objects.filter(from_address="Coinbase_BlkRwd").aggregate(
-        Sum("total_amount")
-    )
-
-    total = total + Decimal(rewards["total_amount__sum"])
-
-    # burn fees
-    query = Transaction.objects.all().aggregate(Sum("total_fee"))
-    fees = query["total_fee__sum"]
-
-    # adnr
-    query = Transaction.objects.filter(type=Transaction.Type.ADDRESS).aggregate(
-        Sum("total_amount")
-    )
-    adnr_burned_sum = Decimal(query["total_amount__sum"])
-
-    # decshop
-    query = Transaction.objects.filter(
-        type=Transaction.Type.DST_REGISTRATION
-    ).aggregate(Sum("total_amount"))
-    dst_burned_sum = Decimal(query["total_amount__sum"])
-
-    # vault activations
-    vault_burned_sum = Transaction.objects.filter(
-        type=Transaction.Type.RESERVE,
-        to_address="Reserve_Base",
-    ).count() * Decimal(4.0)
-
-    # total = total - fees - adnr_burned_sum - dst_burned_sum - vault_burned_sum
+    totals = current_totals()
 
     active_master_nodes = MasterNode.objects.filter(is_active=True).count()
     total_master_nodes = MasterNode.objects.all().count()
@@ -1443,14 +1408,12 @@ def sync_circulation():
     stake = active_master_nodes * 5000
     total_addresses = Address.objects.all().count()
 
-    total_burned = fees + adnr_burned_sum + dst_burned_sum + vault_burned_sum
+    total_burned = totals.total_burned
 
     circulating_supply = Decimal(200000000) - total_burned
     lifetime_supply = Decimal(200000000) - total_burned
 
-    total_transactions = (
-        Transaction.objects.all().exclude(from_address="Coinbase_BlkRwd").count()
-    )
+    total_transactions = totals.transaction_count
 
     circulation.balance = circulating_supply
     circulation.lifetime_supply = lifetime_supply
@@ -1465,23 +1428,14 @@ def sync_circulation():
     circulation.save()
 
 
+register_snapshot("circulation", Circulation, sync_circulation, timedelta(seconds=30))
+
+
 @app.task(autoretry_for=[RBXException])
 def sync_block_count():
-    print("Wiping block count on master nodes...")
-    MasterNode.objects.all().update(block_count=0)
-    print("Done.")
-    print("Fetching blocks with prefetch...")
-    blocks = Block.objects.all().prefetch_related("master_node")
-    print("Done.")
-    with tqdm(total=len(blocks), desc="Processing Blocks") as progress:
-        for block in blocks:
-            if block.master_node:
-                MasterNode.objects.filter(address=block.master_node.address).update(
-                    block_count=F("block_count") + 1
-                )
-            progress.update()
-
-    print("Completed!")
+    print("Rebuilding validator block counts...")
+    rows = rebuild_production()
+    print(f"Completed! ({rows} validator days)")
 
 
 @app.task(autoretry_for=[RBXException])
@@ -1554,6 +1508,20 @@ def sync_network_metrics():
         nm.save()
 
 
+register_snapshot(
+    "network_metrics",
+    NetworkMetrics,
+    sync_network_metrics,
+    timedelta(seconds=10),
+    timestamp_field="created_at",
+)
+
+
+@app.task
+def refresh_snapshot(name: str) -> None:
+    run_refresh(name)
+
+
 @app.task(autoretry_for=[RBXException])
 def migrate_nft_assets(sc_id: str):
     try:
@@ -1630,8 +1598,10 @@ def handle_token_icon_upload(sc_identifier: str):
             bucket=settings.AWS_BUCKET_NFT_ASSETS,
         )
 
+        # Only the URL: a full save would write back the supply loaded before
+        # the upload over any mint or burn recorded since.
         ft.image_base64_url = url
-        ft.save()
+        ft.save(update_fields=["image_base64_url"])
 
 
 @app.task(autoretry_for=[RBXException])
@@ -1691,16 +1661,3 @@ def handle_vbtc_v2_icon_upload(sc_identifier: str):
 
         v2_token.image_base64_url = url
         v2_token.save()
-
-
-def notify_socket_service(payload: dict):
-
-    if settings.SOCKET_BASE_URL:
-
-        requests.post(
-            f"{settings.SOCKET_BASE_URL}/event/",
-            data=payload,
-            headers={
-                "Content-Type": "application/json",
-            },
-        )
@@ -1,18 +1,44 @@
 import base64
 import gzip
 import json
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from decimal import Decimal
 
-from django.test import TestCase
+import pytz
+import requests
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from unittest.mock import patch
 
 from rbx.models import (
+    Address,
+    AddressLedger,
     Block,
+    BlockRange,
+    ChainTotals,
+    Circulation,
+    FungibleToken,
+    FungibleTokenBalance,
+    MasterNode,
+    NetworkMetrics,
     Nft,
+    Recovery,
+    SentMasterNode,
+    SmartContractSnapshot,
     Transaction,
     UnindexedMint,
+    ValidatorProduction,
+    VbtcV2Balance,
     VbtcV2Token,
     VbtcV2TokenTransfer,
     VbtcV2WithdrawalRequest,
@@ -20,16 +46,57 @@ from rbx.models import (
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from access.models import User
+from btc.btc_client import BtcClient
+from btc.sweep import TokenBucket, sweep_balances
 from api.btc.serializers import VbtcV2WithdrawalRequestSerializer
+from api.address.views import AddressTopHolderRankView, AddressTopHoldersListView
+from api.fungible_token.views import (
+    FungibleTokenHoldersListView,
+    FungibleTokenRetrieveView,
+)
+from api.master_node.views import SendMasterNodesView
+from api.pagination import queryset_count
+from api.transaction.serializers import TransactionSerializer
+from api.transaction.views import TransactionListView
 from api.btc.views import (
+    VbtcV2BulkListView,
+    VbtcV2ListView,
     VbtcV2WithdrawCompleteExecuteView,
     _mark_withdrawal_signed,
 )
+from rbx import client as rbx_client
 from rbx.chain_contract import smart_contract_from_chain
+from rbx.coverage import (
+    chain_breaks,
+    missing_ranges,
+    rebuild_coverage,
+    record_heights,
+    resync_ranges,
+)
+from rbx.http import CliSession, endpoint_name
+from rbx.ingest import ingest_blocks, rebuild_balances
+from rbx.ledger import rebuild_ledger, sweep_locks
+from rbx.notifications import flush as flush_notifications, notify_new_blocks
+from rbx.production import rebuild_production, record_production
+from rbx.snapshots import load_snapshot
+from rbx.tokens import rebuild_token_balances, record_deploy
+from rbx.vbtc_ledger import ledger_mismatches, verify_ledger
+from rbx.utils import get_ip_locations
+from rbx.totals import (
+    COUNTERS,
+    aggregate_totals,
+    current_totals,
+    rebuild_totals,
+)
 from rbx.tasks import (
     expire_stale_withdrawals,
+    handle_token_icon_upload,
     process_transaction,
+    refresh_snapshot,
+    send_forwarded_master_nodes,
     retry_unindexed_mints,
+    sync_block,
+    sync_master_nodes,
 )
 
 
@@ -1159,3 +1226,1382 @@ class WithdrawalStatusRaceTests(TestCase):
         self.assertIsNotNone(self.withdrawal.signed_at)
         self.token.refresh_from_db()
         self.assertFalse(self.token.is_pending_withdrawal)
+
+
+def block_payload(height, transactions=()):
+    return {
+        "Height": height,
+        "Hash": f"block-{height}",
+        "PrevHash": f"block-{height - 1}",
+        "Validator": "VAL",
+        "ValidatorSignature": "",
+        "ValidatorAnswer": "",
+        "ChainRefId": "",
+        "MerkleRoot": "",
+        "StateRoot": "",
+        "TotalReward": 32,
+        "TotalAmount": 0,
+        "TotalValidators": 1,
+        "Version": 1,
+        "Size": 0,
+        "BCraftTime": 0,
+        "Timestamp": 1700000000 + height,
+        "Transactions": list(transactions),
+    }
+
+
+def tx_payload(tx_hash, from_address, to_address, amount, fee="0", **extra):
+    return {
+        "Hash": tx_hash,
+        "TransactionType": Transaction.Type.TX,
+        "FromAddress": from_address,
+        "ToAddress": to_address,
+        "Amount": amount,
+        "Fee": fee,
+        "Data": None,
+        "Signature": "",
+        **extra,
+    }
+
+
+class BatchedIngestionTests(TestCase):
+    """sync_blocks --batch must leave the database exactly as the per-height
+    sync_block loop would: same blocks and transactions, same balances, same
+    master node block counts."""
+
+    CHAIN = {
+        0: block_payload(0, [tx_payload("t0", "Coinbase_BlkRwd", "A", "100")]),
+        1: block_payload(
+            1,
+            [
+                tx_payload("t1", "A", "B", "10", fee="0.5"),
+                tx_payload("t2", "A", "A", "1", fee="0.5"),
+                tx_payload("t3", "B", "C", "1", TransactionStatus=999),
+            ],
+        ),
+        2: block_payload(
+            2,
+            [
+                tx_payload("t4", "B", "C", "4", fee="0.1"),
+                tx_payload(
+                    "t5", "C", "Adnr_Base", "0", fee="0.1",
+                    TransactionType=Transaction.Type.ADDRESS,
+                    Data=json.dumps({"Function": "AdnrCreate()", "Name": "c"}),
+                ),
+            ],
+        ),
+        3: None,
+        4: block_payload(4, [tx_payload("t6", "Coinbase_TrxFees", "VAL", "1.2")]),
+    }
+
+    def setUp(self):
+        MasterNode.objects.create(address="VAL", date_connected=timezone.now())
+        self.patches = [
+            patch("rbx.ingest.get_block", side_effect=self.CHAIN.get),
+            patch("rbx.tasks.get_block", side_effect=self.CHAIN.get),
+            patch("rbx.notifications.push"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def snapshot(self):
+        return (
+            list(Block.objects.order_by("height").values_list("height", "hash")),
+            list(
+                Transaction.objects.order_by("hash").values_list(
+                    "hash", "height", "total_amount"
+                )
+            ),
+            list(
+                Address.objects.order_by("address").values_list(
+                    "address", "balance", "adnr__domain"
+                )
+            ),
+            MasterNode.objects.get(address="VAL").block_count,
+        )
+
+    def sequential(self):
+        for height in sorted(self.CHAIN):
+            sync_block(height)
+        return self.snapshot()
+
+    def test_batch_matches_sequential_sync(self):
+        expected = self.sequential()
+
+        Block.objects.all().delete()
+        Address.objects.all().delete()
+        MasterNode.objects.filter(address="VAL").update(block_count=0)
+
+        created = ingest_blocks(0, max(self.CHAIN), window=2, workers=2)
+
+        self.assertEqual(created, 4)
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_balances(self):
+        ingest_blocks(0, max(self.CHAIN), window=3, workers=2)
+
+        balances = dict(Address.objects.values_list("address", "balance"))
+        self.assertEqual(balances["A"], Decimal("89"))
+        self.assertEqual(balances["B"], Decimal("5.9"))
+        self.assertEqual(balances["C"], Decimal("3.9"))
+        self.assertEqual(MasterNode.objects.get(address="VAL").block_count, 4)
+
+    def test_rebuilt_balances_match_ingestion(self):
+        ingest_blocks(0, max(self.CHAIN), window=3, workers=2)
+        expected = self.snapshot()
+
+        Address.objects.filter(address="A").update(balance=Decimal("-1"))
+        Address.objects.create(address="STALE", balance=Decimal("7"))
+
+        self.assertEqual(rebuild_balances(), 2)
+        Address.objects.filter(address="STALE").delete()
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(rebuild_balances(), 0)
+
+    def test_replaying_a_window_is_a_no_op(self):
+        ingest_blocks(0, 2, window=10)
+        before = self.snapshot()
+
+        self.assertEqual(ingest_blocks(0, 2, window=10), 0)
+        self.assertEqual(self.snapshot(), before)
+
+    def test_failed_window_rolls_back(self):
+        with patch("rbx.tasks.process_adnr", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                ingest_blocks(0, 4, window=2)
+
+        # Window 0-1 committed; window 2-3 left nothing behind.
+        self.assertEqual(
+            list(Block.objects.values_list("height", flat=True).order_by("height")),
+            [0, 1],
+        )
+        self.assertFalse(Transaction.objects.filter(height=2).exists())
+
+
+class AddressLedgerTests(TestCase):
+    """AddressLedger must always agree with Address.compute_balance, whether
+    it was built incrementally during ingestion or rebuilt from scratch."""
+
+    def setUp(self):
+        unlock = int(time.time()) + 3600
+        sale = {
+            "Function": "Sale_Complete()",
+            "ContractUID": "sc:sold",
+            "Transactions": [
+                {"ToAddress": "S", "FromAddress": "C", "Amount": "2", "Fee": "0.01"},
+                {"ToAddress": "R", "FromAddress": "C", "Amount": "1", "Fee": "0"},
+            ],
+        }
+        self.chain = {
+            1: block_payload(
+                1,
+                [
+                    tx_payload("l1", "Coinbase_BlkRwd", "A", "100"),
+                    tx_payload("l2", "A", "B", "10", fee="0.1", UnlockTime=unlock),
+                    tx_payload("l3", "A", "xRBXC", "5", fee="0.1", UnlockTime=unlock),
+                    tx_payload("l4", "A", "C", "20", fee="0.1"),
+                ],
+            ),
+            2: block_payload(
+                2,
+                [
+                    tx_payload(
+                        "l5", "A", "Reserve_Base", "0", fee="0.1",
+                        TransactionType=Transaction.Type.RESERVE,
+                        Data=json.dumps({"Function": "CallBack()", "Hash": "l2"}),
+                    ),
+                    tx_payload(
+                        "l6", "C", "C", "0", fee="0.1",
+                        TransactionType=Transaction.Type.ADDRESS,
+                        Data=json.dumps({"Function": "AdnrCreate()", "Name": "c"}),
+                    ),
+                    tx_payload(
+                        "l7", "C", "S", "0", fee="0.1",
+                        TransactionType=Transaction.Type.NFT_SALE,
+                        Data=json.dumps(sale),
+                    ),
+                ],
+            ),
+        }
+        self.patches = [
+            patch("rbx.ingest.get_block", side_effect=self.chain.get),
+            patch("rbx.notifications.push"),
+        ]
+        for p in self.patches:
+            p.start()
+
+        ingest_blocks(1, 2)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def assertLedgerMatches(self):
+        addresses = set(
+            Transaction.objects.values_list("to_address", flat=True)
+        ) | set(Transaction.objects.values_list("from_address", flat=True))
+        for address in addresses:
+            ledger = AddressLedger.objects.get(address=address)
+            self.assertEqual(
+                ledger.get_balance(),
+                Address(address=address).compute_balance(),
+                address,
+            )
+
+    def test_incremental_ledger_matches_aggregates(self):
+        self.assertLedgerMatches()
+
+        a = AddressLedger.objects.get(address="A")
+        # 100 in, 35.4 out with fees, the called-back 10 returned, 5 locked.
+        self.assertEqual(
+            a.get_balance(), [Decimal("69.6"), Decimal(5), Decimal("74.6")]
+        )
+
+    def test_sweep_releases_expired_locks(self):
+        Transaction.objects.filter(unlock_time__isnull=False).update(
+            unlock_time=timezone.now() - timezone.timedelta(seconds=1)
+        )
+
+        self.assertEqual(sweep_locks(), 2)
+        self.assertEqual(AddressLedger.objects.get(address="A").locked, 0)
+        self.assertLedgerMatches()
+
+    def test_rebuild_matches_incremental(self):
+        before = list(
+            AddressLedger.objects.order_by("address").values_list(
+                "address", "settled", "locked", "received", "sent", "holdings"
+            )
+        )
+
+        rebuild_ledger()
+
+        after = list(
+            AddressLedger.objects.order_by("address").values_list(
+                "address", "settled", "locked", "received", "sent", "holdings"
+            )
+        )
+        self.assertEqual(after, before)
+
+    @override_settings(RBX_ADDRESS_LEDGER=True)
+    def test_get_balance_reads_ledger(self):
+        AddressLedger.objects.filter(address="A").update(settled=Decimal(1))
+
+        self.assertEqual(
+            Address(address="A").get_balance(),
+            [Decimal(-4), Decimal(5), Decimal(1)],
+        )
+        # No row yet: fall back to the aggregates.
+        self.assertEqual(
+            Address(address="nobody").get_balance(),
+            [Decimal(0), Decimal(0), Decimal(0)],
+        )
+
+
+class TransactionListQueryTests(TestCase):
+    """Serializing a page of transactions costs a fixed number of queries no
+    matter how many RESERVE rows or NFTs are on it."""
+
+    def setUp(self):
+        self.block = make_block(height=500)
+
+    def add_page(self, n):
+        for i in range(n):
+            nft = Nft.objects.create(
+                identifier=f"nft-{n}-{i}",
+                name="",
+                minter_address="M",
+                owner_address="M",
+                minter_name="",
+                primary_asset_name="",
+                primary_asset_size=0,
+                data="",
+                smart_contract_data="",
+                minted_at=timezone.now(),
+            )
+            original = make_tx(
+                self.block, f"orig-{n}-{i}", Transaction.Type.TX, "A", "B"
+            )
+            original.nft = nft
+            original.save()
+
+            make_tx(
+                self.block, f"cb-{n}-{i}", Transaction.Type.RESERVE, "A",
+                data={"Function": "CallBack()", "Hash": original.hash},
+            )
+
+            recover = make_tx(
+                self.block, f"rec-{n}-{i}", Transaction.Type.RESERVE, "A",
+                data={"Function": "Recover()", "RecoveryAddress": "N"},
+            )
+            recovery = Recovery.objects.create(
+                original_address="A", new_address="N", transaction=recover
+            )
+            recovery.outstanding_transactions.set([original])
+
+    def serialize(self):
+        return TransactionSerializer(
+            Transaction.objects.select_related("nft").order_by("hash"), many=True
+        ).data
+
+    def test_query_count_is_constant(self):
+        self.add_page(2)
+        with self.assertNumQueries(5):
+            small = self.serialize()
+
+        self.add_page(10)
+        with self.assertNumQueries(5):
+            large = self.serialize()
+
+        self.assertEqual(len(small), 6)
+        self.assertEqual(len(large), 36)
+
+    def test_matches_per_row_serialization(self):
+        self.add_page(3)
+
+        rows = [
+            TransactionSerializer(tx).data
+            for tx in Transaction.objects.order_by("hash")
+        ]
+
+        self.assertEqual(self.serialize(), rows)
+        callbacks = [r for r in rows if r["hash"].startswith("cb-")]
+        self.assertTrue(all(r["callback_details"] for r in callbacks))
+        recoveries = [r for r in rows if r["hash"].startswith("rec-")]
+        self.assertTrue(all(r["recovery_details"] for r in recoveries))
+
+
+class ChainTotalsTests(TestCase):
+    """ChainTotals, maintained during ingestion, must agree with the
+    aggregates NetworkMetricsView used to run on every request."""
+
+    CHAIN = {
+        0: block_payload(0, [tx_payload("g0", "Coinbase_BlkRwd", "A", "100")]),
+        1: block_payload(
+            1,
+            [
+                tx_payload("c1", "A", "B", "10", fee="0.5"),
+                tx_payload(
+                    "c2", "A", "Adnr_Base", "1", fee="0.1",
+                    TransactionType=Transaction.Type.ADDRESS,
+                    Data=json.dumps({"Function": "AdnrCreate()", "Name": "a"}),
+                ),
+                tx_payload(
+                    "c3", "B", "Reserve_Base", "4", fee="0.2",
+                    TransactionType=Transaction.Type.RESERVE,
+                    Data=json.dumps({"Function": "Register()"}),
+                ),
+            ],
+        ),
+        2: block_payload(2, [tx_payload("c4", "Coinbase_BlkRwd", "VAL", "32")]),
+    }
+
+    FIELDS = COUNTERS + ("recent_block_times",)
+
+    def setUp(self):
+        self.patches = [
+            patch("rbx.ingest.get_block", side_effect=self.CHAIN.get),
+            patch("rbx.tasks.get_block", side_effect=self.CHAIN.get),
+            patch("rbx.notifications.push"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def values(self, totals):
+        return {field: getattr(totals, field) for field in self.FIELDS}
+
+    def test_batch_ingestion_matches_aggregates(self):
+        ingest_blocks(0, 2, window=2)
+
+        totals = ChainTotals.load()
+        self.assertIsNotNone(totals.rebuilt_at)
+        self.assertEqual(self.values(totals), self.values(aggregate_totals()))
+        self.assertEqual(totals.block_count, 3)
+        self.assertEqual(totals.transaction_count, 3)
+        self.assertEqual(totals.total_burned, Decimal("0.8") + 1 + 4)
+
+    def test_sync_block_matches_aggregates(self):
+        for height in sorted(self.CHAIN):
+            sync_block(height)
+
+        totals = ChainTotals.load()
+        self.assertEqual(self.values(totals), self.values(aggregate_totals()))
+
+    def test_unbuilt_totals_fall_back_to_aggregates(self):
+        # Blocks indexed without passing through genesis.
+        ingest_blocks(1, 2)
+        self.assertIsNone(ChainTotals.load().rebuilt_at)
+        self.assertEqual(current_totals().block_count, 2)
+
+        rebuild_totals()
+        self.assertEqual(
+            self.values(ChainTotals.load()), self.values(aggregate_totals())
+        )
+
+    def test_average_block_time(self):
+        ingest_blocks(0, 2)
+
+        totals = ChainTotals.load()
+        since = datetime.fromtimestamp(1700000000, pytz.UTC)
+        self.assertEqual(totals.average_block_time(since), 1)
+        self.assertIsNone(
+            totals.average_block_time(since + timezone.timedelta(seconds=2))
+        )
+
+
+@override_settings(RBX_ADDRESS_LEDGER=True)
+class TopHoldersTests(TestCase):
+    """The ledger-backed leaderboard ranks addresses exactly as the old
+    received-minus-sent aggregate did."""
+
+    def setUp(self):
+        cache.clear()
+        self.block = make_block(height=700)
+        for i, (to_address, amount) in enumerate(
+            [("A", "100"), ("B", "50"), ("C", "75"), ("B", "40"), ("D", "5")]
+        ):
+            tx = make_tx(
+                self.block, f"h{i}", Transaction.Type.TX,
+                "Coinbase_BlkRwd", to_address,
+            )
+            tx.total_amount = Decimal(amount)
+            tx.save()
+        spend = make_tx(self.block, "h-spend", Transaction.Type.TX, "A", "D")
+        spend.total_amount = Decimal(30)
+        spend.total_fee = Decimal(1)
+        spend.save()
+
+        rebuild_ledger()
+        self.user = User.objects.create_user(email="t@example.com", password="x")
+
+    def get(self, path, **params):
+        request = APIRequestFactory().get(path, params)
+        force_authenticate(request, user=self.user)
+        if path.endswith("top-holders/"):
+            return AddressTopHoldersListView.as_view()(request)
+        return AddressTopHolderRankView.as_view()(
+            request, address=path.rstrip("/").split("/")[-1]
+        )
+
+    def test_matches_aggregate(self):
+        ledger = self.get("/api/addresses/top-holders/").data
+        aggregate = AddressTopHoldersListView().aggregate_top_holders(0, 100)
+
+        self.assertEqual(
+            [row["address"] for row in ledger],
+            ["B", "C", "A", "D", "Coinbase_BlkRwd"],
+        )
+        self.assertEqual(
+            [(r["address"], r["balance"]) for r in ledger[:4]],
+            [(r["address"], r["balance"]) for r in aggregate],
+        )
+
+    def test_pages_and_rank(self):
+        page = self.get("/api/addresses/top-holders/", offset=1, limit=2).data
+        self.assertEqual(
+            [(r["rank"], r["address"]) for r in page], [(2, "C"), (3, "A")]
+        )
+
+        rank = self.get("/api/addresses/top-holders/A/").data
+        self.assertEqual(rank["rank"], 3)
+        self.assertEqual(rank["balance"], Decimal(69))
+
+        self.assertEqual(
+            self.get("/api/addresses/top-holders/nobody/").status_code, 404
+        )
+
+    def test_tied_holders_rank_as_listed(self):
+        tx = make_tx(
+            self.block, "h-tie", Transaction.Type.TX, "Coinbase_BlkRwd", "AA"
+        )
+        tx.total_amount = Decimal(75)
+        tx.save()
+        rebuild_ledger()
+
+        listed = self.get("/api/addresses/top-holders/", limit=3).data
+        self.assertEqual(
+            [(r["rank"], r["address"]) for r in listed],
+            [(1, "B"), (2, "AA"), (3, "C")],
+        )
+        for row in listed:
+            ranked = self.get(f"/api/addresses/top-holders/{row['address']}/").data
+            self.assertEqual(ranked["rank"], row["rank"])
+
+
+class CursorPaginationTests(TestCase):
+    """?cursor= pages through a listing by keyset, including across rows that
+    share a date_crafted, and ?page= keeps working unchanged."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="t@example.com", password="x")
+        block = make_block(height=900)
+        crafted = timezone.now()
+        for i in range(7):
+            tx = make_tx(block, f"k{i}", Transaction.Type.TX, "A", "B")
+            # Pairs of transactions share a timestamp.
+            tx.date_crafted = crafted - timezone.timedelta(seconds=i // 2)
+            tx.save()
+
+        self.expected = list(
+            Transaction.objects.order_by("-date_crafted", "-hash").values_list(
+                "hash", flat=True
+            )
+        )
+
+    def get(self, **params):
+        request = APIRequestFactory().get("/api/transactions/", params)
+        force_authenticate(request, user=self.user)
+        response = TransactionListView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_forward_and_back(self):
+        pages = []
+        data = self.get(cursor="", limit=3)
+        self.assertIsNone(data["previous"])
+        pages.append(data)
+        while data["next"]:
+            data = self.get(cursor=data["next"], limit=3)
+            pages.append(data)
+
+        hashes = [[r["hash"] for r in p["results"]] for p in pages]
+        self.assertEqual(sum(hashes, []), self.expected)
+        self.assertEqual([len(h) for h in hashes], [3, 3, 1])
+
+        back = self.get(cursor=pages[-1]["previous"], limit=3)
+        self.assertEqual([r["hash"] for r in back["results"]], hashes[1])
+        back = self.get(cursor=back["previous"], limit=3)
+        self.assertEqual([r["hash"] for r in back["results"]], hashes[0])
+        self.assertIsNone(back["previous"])
+
+    def test_page_numbers_still_work(self):
+        data = self.get(page=2, limit=3)
+        self.assertEqual(data["count"], 7)
+        self.assertEqual(data["page"], 2)
+        self.assertEqual(len(data["results"]), 3)
+
+    def test_invalid_cursor(self):
+        request = APIRequestFactory().get("/api/transactions/", {"cursor": "nope"})
+        force_authenticate(request, user=self.user)
+        response = TransactionListView.as_view()(request)
+        self.assertEqual(response.status_code, 404)
+
+
+class CountingPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.block = make_block(height=1)
+        for i in range(3):
+            make_tx(self.block, f"n{i}", Transaction.Type.TX, "A", f"B{i}")
+
+    def test_unfiltered_uses_maintained_totals(self):
+        totals = ChainTotals.load()
+        totals.indexed_transaction_count = 1234
+        totals.block_count = 99
+        totals.rebuilt_at = timezone.now()
+        totals.save()
+
+        self.assertEqual(queryset_count(Transaction.objects.all()), 1234)
+        self.assertEqual(queryset_count(Block.objects.all()), 99)
+
+    def test_unbuilt_totals_count_exactly(self):
+        self.assertEqual(queryset_count(Transaction.objects.all()), 3)
+
+    def test_unbuilt_totals_are_not_aggregated_for_a_count(self):
+        user = User.objects.create_user(email="c@example.com", password="x")
+        request = APIRequestFactory().get("/api/transactions/", {"page": 1})
+        force_authenticate(request, user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = TransactionListView.as_view()(request)
+
+        self.assertEqual(response.data["count"], 3)
+        aggregates = [q["sql"] for q in queries if "SUM(" in q["sql"].upper()]
+        self.assertEqual(aggregates, [])
+
+    def test_filtered_counts_are_cached(self):
+        queryset = Transaction.objects.filter(from_address="A")
+        self.assertEqual(queryset_count(queryset), 3)
+
+        make_tx(self.block, "n3", Transaction.Type.TX, "A", "B3")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                queryset_count(Transaction.objects.filter(from_address="A")), 3
+            )
+
+        cache.clear()
+        self.assertEqual(queryset_count(queryset.all()), 4)
+
+    @override_settings(API_COUNT_ESTIMATE_THRESHOLD=0)
+    def test_large_unfiltered_tables_use_the_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE rbx_address")
+        Address.objects.create(address="only-after-analyze")
+
+        # The estimate reflects the table as last analysed.
+        self.assertEqual(queryset_count(Address.objects.all()), 0)
+
+
+class StubBtcClient(BtcClient):
+    """Answers balance lookups locally, recording which provider served each
+    call, so the sweep can be exercised without network access."""
+
+    def __init__(self, tip="tip-1", names=("mempool.space", "blockstream.info")):
+        super().__init__()
+        self.is_testnet = False
+        self.tip = tip
+        self.names = names
+        self.calls = []
+
+    def get_tip_hash(self, limiters=None):
+        return self.tip
+
+    def balance_providers(self):
+        return [(name, partial(self.fetch, name)) for name in self.names]
+
+    def fetch(self, name, address):
+        self.calls.append((name, address))
+        if name == "blockdaemon":
+            return {"balance": Decimal("2"), "partial": True}
+        return {
+            "total_received": Decimal("3"),
+            "total_sent": Decimal("1"),
+            "balance": Decimal("2"),
+            "tx_count": 4,
+        }
+
+
+class VbtcBalanceSweepTests(TestCase):
+    def setUp(self):
+        self.tokens = [
+            make_token(sc_identifier=f"sc:{i}") for i in range(20)
+        ]
+
+    def test_token_bucket_paces_calls(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=1, clock=lambda: now[0])
+
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertAlmostEqual(bucket.wait_time(), 0.5)
+
+        now[0] = 0.5
+        self.assertTrue(bucket.try_acquire())
+
+    def test_sweep_updates_in_bulk_and_skips_tokens_read_at_tip(self):
+        client = StubBtcClient()
+
+        result = sweep_balances(client=client, limiters={}, batch_size=7)
+        self.assertEqual((result.checked, result.updated, result.skipped), (20, 20, 0))
+
+        token = VbtcV2Token.objects.get(pk=self.tokens[0].pk)
+        self.assertEqual(token.global_balance, Decimal("2"))
+        self.assertEqual(token.total_received, Decimal("3"))
+        self.assertEqual(token.tx_count, 4)
+        self.assertEqual(token.balance_tip, "tip-1")
+
+        client.calls = []
+        result = sweep_balances(client=client, limiters={})
+        self.assertEqual((result.checked, result.skipped), (0, 20))
+        self.assertEqual(client.calls, [])
+
+        client.tip = "tip-2"
+        result = sweep_balances(client=client, limiters={})
+        self.assertEqual(result.checked, 20)
+
+    def test_partial_results_keep_historical_totals(self):
+        VbtcV2Token.objects.update(total_received=Decimal("9"), tx_count=7)
+        client = StubBtcClient(names=("blockdaemon",))
+
+        sweep_balances(client=client, limiters={})
+
+        token = VbtcV2Token.objects.get(pk=self.tokens[0].pk)
+        self.assertEqual(token.global_balance, Decimal("2"))
+        self.assertEqual(token.total_received, Decimal("9"))
+        self.assertEqual(token.tx_count, 7)
+
+    def test_sweep_time_follows_provider_rates(self):
+        # Benchmark against the stub: the serial sweep spent 2s per token
+        # (40s here). Paced at 20 calls/s on each of two providers, 20 tokens
+        # take about half a second, with the overflow spread across both.
+        client = StubBtcClient()
+        limiters = {
+            "mempool.space": TokenBucket(rate=20, capacity=1),
+            "blockstream.info": TokenBucket(rate=20, capacity=1),
+        }
+
+        started = time.monotonic()
+        result = sweep_balances(client=client, limiters=limiters, workers=8)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(result.updated, 20)
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertLess(elapsed, 5)
+        served = {name for name, _ in client.calls}
+        self.assertEqual(served, {"mempool.space", "blockstream.info"})
+
+
+class CliSessionTests(TestCase):
+    def test_endpoint_name_drops_path_parameters(self):
+        self.assertEqual(
+            endpoint_name("http://localhost:7292/api/V1/SendBlock/1234"),
+            "api/V1/SendBlock",
+        )
+        self.assertEqual(
+            endpoint_name("http://localhost:7292//scapi/scv1/GetSmartContractData/x/"),
+            "scapi/scv1/GetSmartContractData",
+        )
+
+    def test_session_is_pooled_and_retries_only_gets(self):
+        session = CliSession()
+        self.assertIs(session.session, session.session)
+
+        retries = session.session.get_adapter("http://localhost").max_retries
+        self.assertEqual(retries.allowed_methods, frozenset(["GET"]))
+        self.assertEqual(retries.read, 0)
+
+    def test_requests_record_latency_and_default_timeout(self):
+        session = CliSession()
+        response = requests.Response()
+        response.status_code = 200
+
+        with patch.object(
+            requests.Session, "request", return_value=response
+        ) as request:
+            session.get("http://localhost:7292/api/V1/SendBlock/1")
+            session.get("http://localhost:7292/api/V1/SendBlock/2", timeout=3)
+
+        self.assertEqual(request.call_args_list[0].kwargs["timeout"], (5, 60))
+        self.assertEqual(request.call_args_list[1].kwargs["timeout"], 3)
+        stats = session.stats["api/V1/SendBlock"]
+        self.assertEqual((stats.calls, stats.errors), (2, 0))
+        self.assertIn("api/V1/SendBlock: 2 calls", session.summary())
+
+
+class BadGatewayHandler(BaseHTTPRequestHandler):
+    """Answers every request with a 502 and records its path."""
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        self.send_response(502)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(RBX_HTTP_BACKOFF=0)
+class CliRetryTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), BadGatewayHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def test_gateway_errors_are_retried_for_reads(self):
+        CliSession().get(f"{self.url}/api/V1/SendBlock/1")
+
+        self.assertEqual(len(self.server.paths), settings.RBX_HTTP_RETRIES + 1)
+
+    @override_settings(FAUCET_ENABLED=True)
+    def test_faucet_send_is_not_replayed_on_a_gateway_error(self):
+        with patch.object(rbx_client, "BASE_URL", self.url), patch.object(
+            rbx_client, "cli", CliSession()
+        ):
+            rbx_client.send_testnet_funds("A", "B", Decimal("1.0"))
+
+        self.assertEqual(self.server.paths, ["/api/V1/SendTransaction/A/B/1"])
+
+
+class SmartContractSnapshotTests(TestCase):
+    def cli_response(self, payload, status=200):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode("utf-8")
+        return response
+
+    def test_replays_reuse_the_snapshot_for_their_state(self):
+        payload = {"SmartContractMain": {"Name": "Token"}}
+        with patch.object(
+            rbx_client.cli, "get", return_value=self.cli_response(payload)
+        ) as get:
+            self.assertEqual(rbx_client.get_nft("sc:1", state="mint"), payload)
+            self.assertEqual(rbx_client.get_nft("sc:1", state="mint"), payload)
+            self.assertEqual(get.call_count, 1)
+
+            # An evolve is a new state and goes back to the CLI.
+            rbx_client.get_nft("sc:1", state="evolve")
+            self.assertEqual(get.call_count, 2)
+
+    def test_refresh_replaces_the_snapshot(self):
+        with patch.object(
+            rbx_client.cli, "get", return_value=self.cli_response({"v": 1})
+        ):
+            rbx_client.get_nft("sc:1", state="mint")
+
+        with patch.object(
+            rbx_client.cli, "get", return_value=self.cli_response({"v": 2})
+        ) as get:
+            self.assertEqual(rbx_client.get_nft("sc:1", state="mint"), {"v": 1})
+            self.assertEqual(
+                rbx_client.get_nft("sc:1", state="mint", refresh=True), {"v": 2}
+            )
+            self.assertEqual(rbx_client.get_nft("sc:1", state="mint"), {"v": 2})
+            self.assertEqual(get.call_count, 1)
+
+    def test_refusals_are_not_cached(self):
+        with patch.object(
+            rbx_client.cli, "get", return_value=self.cli_response({}, status=500)
+        ):
+            self.assertIsNone(rbx_client.get_nft("sc:1", state="mint"))
+
+        self.assertFalse(SmartContractSnapshot.objects.exists())
+
+
+class SnapshotRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_snapshot_is_served_and_refreshed_once(self):
+        Circulation.load()
+        Circulation.objects.update(
+            balance=Decimal("7"), updated_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        with patch("rbx.tasks.refresh_snapshot.apply_async") as apply_async:
+            for _ in range(5):
+                self.assertEqual(load_snapshot("circulation").balance, Decimal("7"))
+
+        apply_async.assert_called_once_with(args=["circulation"])
+
+    def test_fresh_snapshot_is_not_refreshed(self):
+        Circulation.load().save()
+
+        with patch("rbx.tasks.refresh_snapshot.apply_async") as apply_async:
+            load_snapshot("circulation")
+
+        apply_async.assert_not_called()
+
+    def test_refresh_holds_the_lock_for_a_window(self):
+        NetworkMetrics.load()
+
+        with patch("rbx.tasks.network_metrics", return_value=None):
+            refresh_snapshot("network_metrics")
+
+        # created_at did not move, but the refresh that just ran still counts.
+        with patch("rbx.tasks.refresh_snapshot.apply_async") as apply_async:
+            load_snapshot("network_metrics")
+        apply_async.assert_not_called()
+
+
+class MasterNodeSyncTests(TestCase):
+    def sent(self, address, minutes_ago, ip="10.0.0.1"):
+        answered = timezone.now() - timedelta(minutes=minutes_ago)
+        return SentMasterNode.objects.create(
+            address=address,
+            name=address.lower(),
+            ip_address=ip,
+            wallet_version="5.0.1",
+            date_connected="2026-01-01T00:00:00Z",
+            last_answer=answered.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        )
+
+    def test_reconciles_the_active_set_in_bulk(self):
+        MasterNode.objects.create(
+            address="KEEP", date_connected=timezone.now(), block_count=7
+        )
+        MasterNode.objects.create(address="GONE", date_connected=timezone.now())
+        self.sent("KEEP", minutes_ago=1, ip="10.0.0.1")
+        self.sent("NEW", minutes_ago=2, ip="10.0.0.1")
+        self.sent("STALE", minutes_ago=60)
+
+        location = {
+            "city": "Oslo",
+            "region": "03",
+            "country_name": "Norway",
+            "time_zone": "Europe/Oslo",
+            "latitude": 59.9,
+            "longitude": 10.7,
+        }
+        with patch(
+            "rbx.tasks.get_ip_locations", return_value={"10.0.0.1": location}
+        ) as lookup:
+            sync_master_nodes()
+
+        self.assertEqual(list(lookup.call_args.args[0]), ["10.0.0.1", "10.0.0.1"])
+        active = set(
+            MasterNode.objects.filter(is_active=True).values_list("address", flat=True)
+        )
+        self.assertEqual(active, {"KEEP", "NEW"})
+        keep = MasterNode.objects.get(address="KEEP")
+        self.assertEqual((keep.city, keep.block_count, keep.name), ("Oslo", 7, "keep"))
+        self.assertFalse(MasterNode.objects.filter(address="STALE").exists())
+
+    def test_backfills_block_master_nodes_in_one_update(self):
+        node = MasterNode.objects.create(address="VAL", date_connected=timezone.now())
+        block = make_block(height=1)
+        Block.objects.filter(pk=block.pk).update(validator_address="VAL")
+        self.sent("VAL", minutes_ago=1)
+
+        with patch("rbx.tasks.get_ip_locations", return_value={}):
+            sync_master_nodes(update_blocks=True)
+
+        block.refresh_from_db()
+        self.assertEqual(block.master_node, node)
+
+    def test_ip_locations_are_cached_in_one_round_trip(self):
+        cache.clear()
+        location = {"city": "Oslo"}
+        cache.set(settings.RBX_IP_LOCATION_CACHE_PREFIX + "10.0.0.1", location)
+
+        with patch("rbx.utils.GeoIP2") as geoip:
+            geoip.return_value.city.return_value = {"city": "Bergen"}
+            locations = get_ip_locations(["10.0.0.1", "10.0.0.2", "10.0.0.2"])
+
+        self.assertEqual(locations["10.0.0.1"], location)
+        self.assertEqual(locations["10.0.0.2"], {"city": "Bergen"})
+        geoip.return_value.city.assert_called_once_with("10.0.0.2")
+        self.assertEqual(
+            cache.get(settings.RBX_IP_LOCATION_CACHE_PREFIX + "10.0.0.2"),
+            {"city": "Bergen"},
+        )
+
+
+class SendMasterNodesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="cli@example.com", password="x")
+
+    def entry(self, address, name):
+        return {
+            "Address": address,
+            "UniqueName": name,
+            "IpAddress": "10.0.0.1",
+            "WalletVersion": "5.0.1",
+            "ConnectDate": "2026-01-01T00:00:00Z",
+            "LastAnswerSendDate": "2026-01-01T00:05:00Z",
+        }
+
+    def post(self, payload):
+        request = APIRequestFactory().post(
+            "/api/masternodes/send/", payload, format="json"
+        )
+        force_authenticate(request, user=self.user)
+        return SendMasterNodesView.as_view()(request)
+
+    def test_payload_is_upserted_in_one_statement(self):
+        SentMasterNode.objects.create(address="A", name="old")
+        payload = [self.entry("A", "new"), self.entry("B", "b"), self.entry("B", "b2")]
+
+        with self.assertNumQueries(1):
+            response = self.post(payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SentMasterNode.objects.get(address="A").name, "new")
+        self.assertEqual(SentMasterNode.objects.get(address="B").name, "b2")
+
+    @override_settings(RBX_FORWARD_SEND_MASTER_NODES="http://forward.example/send/")
+    def test_forwarding_is_queued_once_per_batch(self):
+        with patch("rbx.tasks.send_forwarded_master_nodes.apply_async") as queued:
+            self.post([self.entry("A", "first")])
+            self.post([self.entry("A", "second")])
+
+        queued.assert_called_once_with()
+
+        with patch("rbx.tasks.requests.post") as post:
+            send_forwarded_master_nodes()
+
+        forwarded = json.loads(post.call_args.kwargs["data"])
+        self.assertEqual(forwarded[0]["UniqueName"], "second")
+        self.assertIsNone(cache.get(settings.RBX_FORWARD_PENDING_KEY))
+
+
+class ValidatorProductionTests(TestCase):
+    def block(self, height, validator, crafted):
+        block = make_block(height=height)
+        Block.objects.filter(pk=block.pk).update(
+            validator_address=validator, date_crafted=crafted
+        )
+        block.refresh_from_db()
+        return block
+
+    def test_record_and_rebuild_agree(self):
+        MasterNode.objects.create(address="VAL", date_connected=timezone.now())
+        now = timezone.now()
+        blocks = [
+            self.block(1, "VAL", now - timedelta(days=10)),
+            self.block(2, "VAL", now),
+            self.block(3, "OTHER", now),
+            self.block(4, "VAL", now),
+        ]
+
+        record_production(blocks[:2])
+        record_production(blocks[2:])
+
+        node = MasterNode.objects.get(address="VAL")
+        self.assertEqual(node.block_count, 3)
+        self.assertEqual(
+            node.production(),
+            {"blocks_today": 2, "blocks_last_week": 2, "last_block_height": 4},
+        )
+        recorded = set(
+            ValidatorProduction.objects.values_list(
+                "validator_address", "day", "blocks", "first_height", "last_height"
+            )
+        )
+
+        self.assertEqual(rebuild_production(), 3)
+        rebuilt = set(
+            ValidatorProduction.objects.values_list(
+                "validator_address", "day", "blocks", "first_height", "last_height"
+            )
+        )
+        self.assertEqual(recorded, rebuilt)
+        self.assertEqual(MasterNode.objects.get(address="VAL").block_count, 3)
+
+    def test_resyncing_a_block_does_not_count_it_again(self):
+        MasterNode.objects.create(address="VAL", date_connected=timezone.now())
+
+        with patch("rbx.tasks.get_block", return_value=block_payload(1)), patch(
+            "rbx.notifications.push"
+        ):
+            sync_block(1)
+            sync_block(1)
+
+        self.assertEqual(MasterNode.objects.get(address="VAL").block_count, 1)
+        self.assertEqual(
+            ValidatorProduction.objects.get(validator_address="VAL").last_height, 1
+        )
+
+
+class ChainCoverageTests(TestCase):
+    def test_ranges_merge_as_heights_land(self):
+        record_heights([0, 1, 2, 5, 6, 9])
+        self.assertEqual(
+            list(BlockRange.objects.order_by("start").values_list("start", "end")),
+            [(0, 2), (5, 6), (9, 9)],
+        )
+        self.assertEqual(missing_ranges(0, 10), [(3, 4), (7, 8), (10, 10)])
+
+        record_heights([3, 4, 7])
+        record_heights([8])
+        self.assertEqual(
+            list(BlockRange.objects.values_list("start", "end")), [(0, 9)]
+        )
+        self.assertEqual(missing_ranges(2, 12), [(10, 12)])
+
+    def test_rebuild_matches_the_block_table(self):
+        for height in (0, 1, 2, 4, 7, 8):
+            make_block(height=height)
+
+        self.assertEqual(rebuild_coverage(), 3)
+        self.assertEqual(missing_ranges(0, 8), [(3, 3), (5, 6)])
+
+    def test_gaps_are_resynced_through_the_ingester(self):
+        chain = {h: block_payload(h) for h in range(6)}
+        with patch("rbx.ingest.get_block", side_effect=chain.get), patch(
+            "rbx.notifications.push"
+        ):
+            ingest_blocks(0, 1)
+            ingest_blocks(4, 5)
+            self.assertEqual(missing_ranges(0, 5), [(2, 3)])
+
+            self.assertEqual(resync_ranges(missing_ranges(0, 5), workers=2), 2)
+
+        self.assertEqual(missing_ranges(0, 5), [])
+
+    def test_chain_breaks_stream_mismatched_links(self):
+        for height in range(4):
+            make_block(height=height)
+        Block.objects.filter(height__in=[1, 2]).update(previous_hash="block-0")
+        Block.objects.filter(height=3).update(previous_hash="bogus")
+
+        self.assertEqual(
+            list(chain_breaks(chunk_size=2)),
+            [(2, "block-0", "block-1"), (3, "bogus", "block-2")],
+        )
+
+
+@override_settings(SOCKET_BASE_URL="http://socket.test", SOCKET_BATCH_MAX=2)
+class SocketNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for height in range(4):
+            make_block(height=height)
+
+    def queue(self, *heights):
+        with patch(
+            "rbx.tasks.flush_block_notifications.apply_async"
+        ) as apply_async, self.captureOnCommitCallbacks(execute=True):
+            for height in heights:
+                notify_new_blocks([height])
+        return apply_async
+
+    def sent_events(self):
+        with patch("rbx.notifications.requests.post") as post:
+            flush_notifications()
+        return [json.loads(c.kwargs["data"]) for c in post.call_args_list]
+
+    def test_a_burst_is_flushed_once_as_a_batch(self):
+        apply_async = self.queue(1, 2, 3, 3)
+        apply_async.assert_called_once()
+
+        batch, tip = self.sent_events()
+        self.assertEqual(batch["type"], "new_blocks")
+        self.assertEqual([b["height"] for b in batch["data"]], [2, 3])
+        self.assertEqual(tip["type"], "new_block")
+        self.assertEqual(tip["data"]["height"], 3)
+
+        # The outbox is empty and the next block queues a new flush.
+        self.assertEqual(self.sent_events(), [])
+        self.queue(4).assert_called_once()
+
+    def test_a_single_block_sends_one_event(self):
+        self.queue(2)
+
+        (event,) = self.sent_events()
+        self.assertEqual(event["type"], "new_block")
+        self.assertEqual(event["message"], "block 2")
+
+    @override_settings(SOCKET_COMPACT_BLOCKS=True)
+    def test_compact_payload(self):
+        self.queue(2)
+
+        (event,) = self.sent_events()
+        self.assertEqual(event["data"]["hash"], "block-2")
+        self.assertEqual(event["data"]["transaction_count"], 0)
+        self.assertNotIn("transactions", event["data"])
+
+    def test_socket_errors_are_not_raised(self):
+        self.queue(2)
+        with patch(
+            "rbx.notifications.requests.post",
+            side_effect=requests.ConnectionError("down"),
+        ):
+            self.assertEqual(flush_notifications(), 0)
+
+
+class FungibleTokenBalanceTests(TestCase):
+    def setUp(self):
+        self.block = make_block()
+        deploy = make_tx(self.block, "deploy", Transaction.Type.NFT_MINT, "OWNER")
+        self.token = FungibleToken.objects.create(
+            sc_identifier="ft:1",
+            name="Token",
+            ticker="TKN",
+            owner_address="OWNER",
+            original_owner_address="OWNER",
+            smart_contract=make_token(sc_identifier="ft:1").nft,
+            create_transaction=deploy,
+            image_base64="",
+            decimal_places=2,
+            initial_supply=Decimal("100"),
+            can_mint=True,
+            can_burn=True,
+            can_vote=False,
+        )
+        record_deploy(self.token)
+
+        self.token_tx("t1", Transaction.Type.FTKN_MINT, "TokenMint()", "OWNER", amount="50")
+        self.token_tx("t2", Transaction.Type.FTKN_TX, "TokenTransfer()", "OWNER", "A", "30")
+        self.token_tx("t3", Transaction.Type.FTKN_TX, "TokenTransfer()", "A", "B", "30")
+        self.token_tx("t4", Transaction.Type.FTKN_BURN, "TokenBurn()", "OWNER", amount="20")
+
+    def token_tx(self, tx_hash, tx_type, function, from_address, to_address=None, amount="0"):
+        data = {
+            "Function": function,
+            "ContractUID": "ft:1",
+            "FromAddress": from_address,
+            "ToAddress": to_address,
+            "Amount": amount,
+        }
+        process_transaction(make_tx(self.block, tx_hash, tx_type, from_address, data=[data]))
+
+    def balances(self):
+        return dict(
+            FungibleTokenBalance.objects.filter(token=self.token).values_list(
+                "address", "balance"
+            )
+        )
+
+    def test_balances_match_the_aggregates(self):
+        balances = self.balances()
+        self.assertEqual(
+            balances, {"OWNER": Decimal("100"), "A": Decimal("0"), "B": Decimal("30")}
+        )
+        for address, balance in balances.items():
+            self.assertEqual(self.token.compute_address_balance(address), balance)
+
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.circulating_supply, Decimal("130"))
+        self.assertEqual(
+            self.token.circulating_supply, self.token.compute_circulating_supply()
+        )
+
+    def test_rebuild_matches_incremental(self):
+        expected = self.balances()
+        FungibleTokenBalance.objects.all().delete()
+        FungibleToken.objects.update(supply=0)
+
+        self.assertEqual(rebuild_token_balances(), 3)
+        self.assertEqual(self.balances(), expected)
+        self.assertEqual(FungibleToken.objects.get().supply, Decimal("130"))
+
+    def test_icon_upload_keeps_supply_minted_during_it(self):
+        def upload(*args, **kwargs):
+            self.token_tx("t5", Transaction.Type.FTKN_MINT, "TokenMint()", "OWNER", amount="5")
+            return "https://example.com/icon.png"
+
+        with patch("rbx.tasks.upload_to_s3", side_effect=upload):
+            handle_token_icon_upload("ft:1")
+
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.image_base64_url, "https://example.com/icon.png")
+        self.assertEqual(self.token.supply, Decimal("135"))
+
+    def test_holders_endpoints(self):
+        user = User.objects.create(email="ft@example.com")
+        factory = APIRequestFactory()
+
+        request = factory.get("/api/fungible-tokens/ft:1/holders/")
+        force_authenticate(request, user=user)
+        response = FungibleTokenHoldersListView.as_view()(request, sc_identifier="ft:1")
+        self.assertEqual(
+            [(h["address"], Decimal(h["balance"])) for h in response.data["results"]],
+            [("OWNER", Decimal("100")), ("B", Decimal("30"))],
+        )
+
+        request = factory.get("/api/fungible-tokens/ft:1/")
+        force_authenticate(request, user=user)
+        # Token, holders, and the serializer's description and created_at,
+        # however many holders there are.
+        with self.assertNumQueries(4):
+            response = FungibleTokenRetrieveView.as_view()(request, sc_identifier="ft:1")
+        self.assertEqual(set(response.data["holders"]), {"OWNER", "A", "B"})
+
+
+class VbtcV2LedgerTests(TestCase):
+    def setUp(self):
+        self.block = make_block()
+        self.token = make_token(owner="O", global_balance="0.001")
+
+    def transfer(self, tx_hash, from_address, to_address, amount):
+        tx = make_tx(self.block, tx_hash, Transaction.Type.VBTC_V2_TRANSFER)
+        return add_transfer(self.token, tx, from_address, to_address, amount)
+
+    def withdrawal(self, tx_hash, requestor, amount, status):
+        tx = make_tx(self.block, tx_hash, Transaction.Type.VBTC_V2_WITHDRAWAL_REQUEST)
+        return add_withdrawal(self.token, tx, requestor, amount, status)
+
+    def assert_matches_history(self):
+        # Entries emptied by a deleted row stay behind at zero.
+        self.assertEqual(ledger_mismatches(self.token), [])
+
+    def test_ledger_follows_transfers_and_withdrawals(self):
+        self.transfer("t1", "O", "U", "0.0004")
+        self.transfer("t2", "U", "V", "0.0001")
+        pending = self.withdrawal(
+            "w1", "U", "0.0002", VbtcV2WithdrawalRequest.Status.REQUESTED
+        )
+        self.assert_matches_history()
+        self.assertEqual(self.token.ledger_entries()["U"], Decimal("0.0003"))
+
+        # Completing debits U once, however often the row is saved.
+        pending = VbtcV2WithdrawalRequest.objects.get(pk=pending.pk)
+        pending.status = VbtcV2WithdrawalRequest.Status.COMPLETED
+        pending.save(update_fields=["status"])
+        pending.save()
+        self.assert_matches_history()
+        self.assertEqual(self.token.ledger_entries()["U"], Decimal("0.0001"))
+
+        pending.delete()
+        Transaction.objects.filter(hash="t2").delete()
+        self.assert_matches_history()
+
+    def test_addresses_aggregate_withdrawals_unless_prefetched(self):
+        self.transfer("t1", "O", "U", "0.0004")
+        self.withdrawal("w1", "U", "0.0001", VbtcV2WithdrawalRequest.Status.COMPLETED)
+        self.withdrawal("w2", "U", "0.0001", VbtcV2WithdrawalRequest.Status.REQUESTED)
+        table = VbtcV2WithdrawalRequest._meta.db_table
+
+        token = VbtcV2Token.objects.get(pk=self.token.pk)
+        with CaptureQueriesContext(connection) as queries:
+            addresses = token.addresses
+        withdrawals = [q["sql"] for q in queries if table in q["sql"]]
+        self.assertEqual(len(withdrawals), 1)
+        self.assertIn("SUM(", withdrawals[0].upper())
+
+        prefetched = VbtcV2Token.objects.prefetch_related(
+            "ledger", "withdrawal_requests"
+        ).get(pk=self.token.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(prefetched.addresses, addresses)
+
+    def test_verify_reports_and_fixes_drift(self):
+        self.transfer("t1", "O", "U", "0.0004")
+        VbtcV2Balance.objects.filter(address="U").update(balance=Decimal("1"))
+
+        ((token, mismatches),) = verify_ledger(fix=True)
+        self.assertEqual(token, self.token)
+        self.assertEqual(mismatches, [("U", Decimal("1"), Decimal("0.0004"))])
+
+        self.assert_matches_history()
+        self.assertEqual(list(verify_ledger()), [])
+
+
+class VbtcListEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="vbtc@example.com")
+        self.factory = APIRequestFactory()
+        block = make_block()
+        self.tokens = [
+            make_token(owner="O", global_balance="0.001", sc_identifier=f"v2:{i}")
+            for i in range(3)
+        ]
+        for i, token in enumerate(self.tokens[:2]):
+            tx = make_tx(block, f"t{i}", Transaction.Type.VBTC_V2_TRANSFER)
+            add_transfer(token, tx, "O", f"U{i}", "0.0001")
+
+    def call(self, view, request, **kwargs):
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request, **kwargs)
+
+    def identifiers(self, response):
+        return sorted(t["sc_identifier"] for t in response.data["results"])
+
+    def test_tokens_held_by_one_address(self):
+        request = self.factory.get("/api/btc/vbtc-v2/U0/")
+        response = self.call(VbtcV2ListView, request, vfx_address="U0")
+
+        self.assertEqual(self.identifiers(response), ["v2:0"])
+        (token,) = response.data["results"]
+        self.assertEqual(token["addresses"]["U0"], Decimal("0.0001"))
+
+    def test_bulk_listing_queries_do_not_grow_with_tokens(self):
+        request = self.factory.post(
+            "/api/btc/vbtc-v2/bulk/", {"addresses": ["U0", "U1"]}, format="json"
+        )
+        with self.assertNumQueries(5):
+            response = self.call(VbtcV2BulkListView, request)
+        self.assertEqual(self.identifiers(response), ["v2:0", "v2:1"])
+
+        request = self.factory.post("/api/btc/vbtc-v2/bulk/", {"addresses": "U0"}, format="json")
+        self.assertEqual(self.call(VbtcV2BulkListView, request).status_code, 400)
+
+    def test_pagination_is_opt_in(self):
+        request = self.factory.get("/api/btc/vbtc-v2/O/", {"limit": 2})
+        response = self.call(VbtcV2ListView, request, vfx_address="O")
+
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(len(response.data["results"]), 2)
@@ -0,0 +1,151 @@
+"""Incremental maintenance of FungibleTokenBalance and FungibleToken.supply.
+
+The token detail page used to collect every address that ever touched a
+token and run four Sum aggregates over FungibleTokenTx per address. Instead,
+process_transaction hands each TokenDeploy and FungibleTokenTx to this module,
+which adds it to the per-holder balances with one upsert. token_deltas mirrors
+FungibleToken.compute_address_balance; if that changes, TOKEN_BALANCES_SQL
+has to change with it and the balances must be rebuilt.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable, List, NamedTuple
+
+from django.db import connection
+from django.db.models import F
+from django.db.transaction import atomic as atomic_transaction
+from psycopg2.extras import execute_values
+
+from rbx.models import FungibleToken, FungibleTokenBalance, FungibleTokenTx
+
+
+class TokenDelta(NamedTuple):
+    token_id: int
+    address: str
+    amount: Decimal
+
+
+def token_deltas(ftt: FungibleTokenTx) -> List[TokenDelta]:
+    """The balance changes from one token transaction. Mints and burns are
+    recorded against receiving_address, the minter or burner."""
+
+    # amount is whatever the CLI sent until the row is reloaded.
+    amount = Decimal(str(ftt.amount))
+
+    if ftt.type == FungibleTokenTx.Type.MINT:
+        return [TokenDelta(ftt.token_id, ftt.receiving_address, amount)]
+    if ftt.type == FungibleTokenTx.Type.BURN:
+        return [TokenDelta(ftt.token_id, ftt.receiving_address, -amount)]
+
+    return [
+        TokenDelta(ftt.token_id, ftt.receiving_address, amount),
+        TokenDelta(ftt.token_id, ftt.sending_address, -amount),
+    ]
+
+
+def apply_token_deltas(deltas: Iterable[TokenDelta]) -> None:
+    """Add the deltas to FungibleTokenBalance in one upsert."""
+
+    totals = defaultdict(Decimal)
+    for delta in deltas:
+        if delta.address:
+            totals[(delta.token_id, delta.address)] += delta.amount
+
+    if not totals:
+        return
+
+    table = FungibleTokenBalance._meta.db_table
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table} (token_id, address, balance) VALUES %s
+            ON CONFLICT (token_id, address) DO UPDATE SET
+                balance = {table}.balance + EXCLUDED.balance
+            """,
+            [
+                (token, address, amount)
+                for (token, address), amount in sorted(totals.items())
+            ],
+        )
+
+
+def record_deploy(token: FungibleToken) -> None:
+    """Credit the initial supply of a newly deployed token to its deployer."""
+
+    initial_supply = Decimal(str(token.initial_supply))
+
+    FungibleToken.objects.filter(pk=token.pk).update(supply=initial_supply)
+    apply_token_deltas(
+        [
+            TokenDelta(
+                token.pk, token.original_owner_address, max(initial_supply, Decimal(0))
+            )
+        ]
+    )
+
+
+def record_token_tx(ftt: FungibleTokenTx) -> None:
+    """Count a newly saved token transaction towards balances and supply."""
+
+    deltas = token_deltas(ftt)
+    apply_token_deltas(deltas)
+
+    if ftt.type in (FungibleTokenTx.Type.MINT, FungibleTokenTx.Type.BURN):
+        FungibleToken.objects.filter(pk=ftt.token_id).update(
+            supply=F("supply") + deltas[0].amount
+        )
+
+
+# compute_address_balance for every (token, address) pair at once.
+TOKEN_BALANCES_SQL = f"""
+    SELECT token_id, address, SUM(amount) FROM (
+        SELECT id AS token_id, original_owner_address AS address,
+            GREATEST(initial_supply, 0) AS amount
+        FROM {FungibleToken._meta.db_table}
+        UNION ALL
+        SELECT token_id, receiving_address, CASE
+            WHEN type = %(burn)s THEN -amount ELSE amount END
+        FROM {FungibleTokenTx._meta.db_table}
+        UNION ALL
+        SELECT token_id, sending_address, -amount
+        FROM {FungibleTokenTx._meta.db_table}
+        WHERE type = %(transfer)s
+    ) entries
+    WHERE address IS NOT NULL AND address <> ''
+    GROUP BY token_id, address
+"""
+
+SUPPLY_SQL = f"""
+    UPDATE {FungibleToken._meta.db_table} t
+    SET supply = t.initial_supply + COALESCE((
+        SELECT SUM(CASE WHEN x.type = %(burn)s THEN -x.amount ELSE x.amount END)
+        FROM {FungibleTokenTx._meta.db_table} x
+        WHERE x.token_id = t.id AND x.type IN (%(mint)s, %(burn)s)
+    ), 0)
+"""
+
+
+def rebuild_token_balances() -> int:
+    """Recompute every FungibleTokenBalance row and FungibleToken.supply from
+    FungibleTokenTx, in one transaction so readers keep the old rows until
+    it commits. Returns the number of balance rows written."""
+
+    table = FungibleTokenBalance._meta.db_table
+    params = {
+        "mint": FungibleTokenTx.Type.MINT,
+        "burn": FungibleTokenTx.Type.BURN,
+        "transfer": FungibleTokenTx.Type.TRANSFER,
+    }
+
+    with atomic_transaction(), connection.cursor() as cursor:
+        FungibleTokenBalance.objects.all().delete()
+        cursor.execute(
+            f"INSERT INTO {table} (token_id, address, balance) {TOKEN_BALANCES_SQL}",
+            params,
+        )
+        written = cursor.rowcount
+        cursor.execute(SUPPLY_SQL, params)
+
+    return written
@@ -0,0 +1,178 @@
+"""Incremental maintenance of ChainTotals.
+
+block_totals mirrors the aggregates NetworkMetricsView and sync_circulation
+used to run over the whole Transaction table; rebuild_totals runs those
+aggregates once to seed the row on a database that was not synced from
+genesis.
+"""
+
+import bisect
+from datetime import timedelta
+from decimal import Decimal
+from typing import Iterable, List, Tuple
+
+from django.db.models import Count, Q, Sum
+from django.db.transaction import atomic as atomic_transaction
+from django.utils import timezone
+
+from rbx.models import Block, ChainTotals, Transaction
+
+BLOCK_TIME_WINDOW = timedelta(minutes=5)
+
+# Bounds the window should blocks ever be crafted faster than expected.
+MAX_RECENT_BLOCK_TIMES = 1000
+
+COUNTERS = (
+    "block_count",
+    "transaction_count",
+    "indexed_transaction_count",
+    "fees_burned",
+    "adnr_burned",
+    "dst_burned",
+    "vault_activations",
+)
+
+
+def block_totals(transactions: Iterable[Transaction]) -> dict:
+    """ChainTotals counter increments for indexing these transactions."""
+
+    totals = {
+        "transaction_count": 0,
+        "indexed_transaction_count": 0,
+        "fees_burned": Decimal(0),
+        "adnr_burned": Decimal(0),
+        "dst_burned": Decimal(0),
+        "vault_activations": 0,
+    }
+
+    for tx in transactions:
+        totals["indexed_transaction_count"] += 1
+
+        if tx.from_address != "Coinbase_BlkRwd":
+            totals["transaction_count"] += 1
+
+        totals["fees_burned"] += tx.total_fee
+
+        if tx.type == Transaction.Type.ADDRESS:
+            totals["adnr_burned"] += tx.total_amount
+        elif tx.type == Transaction.Type.DST_REGISTRATION:
+            totals["dst_burned"] += tx.total_amount
+        elif tx.type == Transaction.Type.RESERVE and tx.to_address == "Reserve_Base":
+            totals["vault_activations"] += 1
+
+    return totals
+
+
+def trim_block_times(times: List[float]) -> List[float]:
+    if not times:
+        return times
+
+    cutoff = times[-1] - BLOCK_TIME_WINDOW.total_seconds()
+    times = times[bisect.bisect_left(times, cutoff) :]
+    return times[-MAX_RECENT_BLOCK_TIMES:]
+
+
+def record_blocks(blocks: Iterable[Tuple[Block, List[Transaction]]]) -> None:
+    """Add newly indexed blocks and their transactions to ChainTotals.
+
+    The row is locked for the update, so concurrent sync_block workers
+    serialise here rather than losing each other's increments. Call it inside
+    the transaction that writes the blocks, so the totals commit with them.
+    """
+
+    blocks = list(blocks)
+    if not blocks:
+        return
+
+    ChainTotals.load()
+
+    with atomic_transaction():
+        totals = ChainTotals.objects.select_for_update().get(pk=1)
+
+        if any(block.height == 0 for block, _ in blocks):
+            # Syncing from genesis: whatever was counted before is stale, and
+            # what follows covers the whole chain.
+            for field in COUNTERS:
+                setattr(totals, field, 0)
+            totals.recent_block_times = []
+            totals.rebuilt_at = timezone.now()
+
+        times = list(totals.recent_block_times)
+        for block, transactions in blocks:
+            totals.block_count += 1
+            for field, value in block_totals(transactions).items():
+                setattr(totals, field, getattr(totals, field) + value)
+            bisect.insort(times, block.date_crafted.timestamp())
+
+        totals.recent_block_times = trim_block_times(times)
+        totals.save()
+
+
+def aggregate_totals() -> ChainTotals:
+    """An unsaved ChainTotals computed from the indexed blocks and
+    transactions with full-table aggregates."""
+
+    aggregates = Transaction.objects.aggregate(
+        transaction_count=Count("pk", filter=~Q(from_address="Coinbase_BlkRwd")),
+        indexed_transaction_count=Count("pk"),
+        fees_burned=Sum("total_fee"),
+        adnr_burned=Sum("total_amount", filter=Q(type=Transaction.Type.ADDRESS)),
+        dst_burned=Sum(
+            "total_amount", filter=Q(type=Transaction.Type.DST_REGISTRATION)
+        ),
+        vault_activations=Count(
+            "pk",
+            filter=Q(type=Transaction.Type.RESERVE, to_address="Reserve_Base"),
+        ),
+    )
+
+    totals = ChainTotals(block_count=Block.objects.count())
+    for field, value in aggregates.items():
+        setattr(totals, field, value or 0)
+
+    newest = (
+        Block.objects.order_by("-height")
+        .values_list("date_crafted", flat=True)
+        .first()
+    )
+    if newest:
+        totals.recent_block_times = trim_block_times(
+            sorted(
+                t.timestamp()
+                for t in Block.objects.filter(
+                    date_crafted__gte=newest - BLOCK_TIME_WINDOW
+                ).values_list("date_crafted", flat=True)
+            )
+        )
+
+    return totals
+
+
+def current_totals() -> ChainTotals:
+    """The maintained totals, or freshly aggregated ones if they have never
+    been built."""
+
+    totals = ChainTotals.load()
+    if totals.rebuilt_at:
+        return totals
+    return aggregate_totals()
+
+
+def rebuild_totals() -> ChainTotals:
+    """Recompute ChainTotals from scratch.
+
+    Pause block syncing while this runs: sync_block commits a block's
+    transactions before it records them here, so a block landing mid-rebuild
+    can be counted twice.
+    """
+
+    with atomic_transaction():
+        ChainTotals.load()
+        ChainTotals.objects.select_for_update().get(pk=1)
+
+        totals = aggregate_totals()
+        totals.pk = 1
+        totals.rebuilt_at = timezone.now()
+        totals.save()
+
+    return totals
@@ -9,7 +9,7 @@ from decimal import Decimal
 
 from rbx.client import get_info, get_network_metrics, validate_signature
 from rbx.models import Block, NetworkMetrics
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
 
 def get_ip_location(address: str, use_cache: bool = True) -> dict:
@@ -24,6 +24,40 @@ def get_ip_location(address: str, use_cache: bool = True) -> dict:
     return location
 
 
+def get_ip_locations(addresses: Iterable[str]) -> Dict[str, Optional[dict]]:
+    """get_ip_location for many addresses: one cache round trip for the
+    known ones, and a single GeoIP2 reader for the rest. Addresses that
+    cannot be located map to None and are not cached."""
+
+    prefix = settings.RBX_IP_LOCATION_CACHE_PREFIX
+    addresses = {a for a in addresses if a}
+
+    cached = cache.get_many([prefix + a for a in addresses])
+    locations = {a: cached.get(prefix + a) for a in addresses}
+
+    missing = [a for a, location in locations.items() if not location]
+    if missing:
+        found = {}
+        try:
+            reader = GeoIP2()
+        except Exception:
+            reader = None
+
+        for address in missing if reader else []:
+            try:
+                found[address] = reader.city(address)
+            except Exception:
+                continue
+
+        locations.update(found)
+        cache.set_many(
+            {prefix + a: location for a, location in found.items()},
+            settings.RBX_IP_LOCATION_CACHE_TIMEOUT,
+        )
+
+    return locations
+
+
 def get_local_max_height() -> Optional[int]:
     return Block.objects.aggregate(value=Max("height"))["value"]
 
@@ -0,0 +1,176 @@
+"""Incremental maintenance of VbtcV2Balance, the per-address vBTC V2 ledger.
+
+VbtcV2Token.ledger_entries used to replay every transfer and completed
+withdrawal of the token on each call, and the token list, detail page and
+ownership transfer settlement all go through it. The signal receivers below
+apply each change to VbtcV2Balance instead, inside the transaction that
+writes the row:
+
+- a new VbtcV2TokenTransfer credits to_address and debits from_address;
+- a withdrawal that becomes COMPLETED debits requestor_address, and one that
+  stops being COMPLETED (or is deleted while completed) gives it back.
+
+verify_ledger compares the ledger with a replay of the history and can
+rewrite the tokens that disagree.
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable, Iterator, List, NamedTuple, Tuple
+
+from django.db import connection
+from django.db.models.signals import post_delete, post_init, post_save
+from django.db.transaction import atomic as atomic_transaction
+from django.dispatch import receiver
+from psycopg2.extras import execute_values
+
+from rbx.models import (
+    VbtcV2Balance,
+    VbtcV2Token,
+    VbtcV2TokenTransfer,
+    VbtcV2WithdrawalRequest,
+)
+
+COMPLETED = VbtcV2WithdrawalRequest.Status.COMPLETED
+
+
+class VbtcDelta(NamedTuple):
+    token_id: int
+    address: str
+    amount: Decimal
+
+
+def transfer_deltas(transfer: VbtcV2TokenTransfer, sign: int = 1) -> List[VbtcDelta]:
+    amount = Decimal(str(transfer.amount)) * sign
+    return [
+        VbtcDelta(transfer.token_id, transfer.to_address, amount),
+        VbtcDelta(transfer.token_id, transfer.from_address, -amount),
+    ]
+
+
+def withdrawal_deltas(
+    withdrawal: VbtcV2WithdrawalRequest, sign: int = 1
+) -> List[VbtcDelta]:
+    amount = Decimal(str(withdrawal.amount)) * sign
+    return [VbtcDelta(withdrawal.token_id, withdrawal.requestor_address, -amount)]
+
+
+def apply_vbtc_deltas(deltas: Iterable[VbtcDelta], insert: bool = True) -> None:
+    """Add the deltas to VbtcV2Balance in one statement.
+
+    Reverting a deleted row passes insert=False: it only adjusts existing
+    entries, so a row deleted along with its token does not recreate ledger
+    entries for a token that no longer exists.
+    """
+
+    totals = defaultdict(Decimal)
+    for delta in deltas:
+        totals[(delta.token_id, delta.address)] += delta.amount
+
+    if not totals:
+        return
+
+    rows = [
+        (token, address, amount) for (token, address), amount in sorted(totals.items())
+    ]
+    table = VbtcV2Balance._meta.db_table
+    with connection.cursor() as cursor:
+        if insert:
+            sql = f"""
+                INSERT INTO {table} (token_id, address, balance) VALUES %s
+                ON CONFLICT (token_id, address) DO UPDATE SET
+                    balance = {table}.balance + EXCLUDED.balance
+            """
+        else:
+            sql = f"""
+                UPDATE {table} b SET balance = b.balance + v.amount
+                FROM (VALUES %s) AS v (token_id, address, amount)
+                WHERE b.token_id = v.token_id AND b.address = v.address
+            """
+        execute_values(cursor, sql, rows)
+
+
+@receiver(post_init, sender=VbtcV2WithdrawalRequest)
+def remember_withdrawal_status(sender, instance=None, **kwargs):
+    # What the ledger has already counted for this row, so a save can tell
+    # whether it completes (or un-completes) the withdrawal. Read from
+    # __dict__ so a deferred status is not fetched for every loaded row.
+    status = instance.__dict__.get("status")
+    if instance.pk is None:
+        instance._ledger_completed = False
+    elif status is None:
+        instance._ledger_completed = None
+    else:
+        instance._ledger_completed = status == COMPLETED
+
+
+@receiver(post_save, sender=VbtcV2TokenTransfer)
+def apply_transfer(sender, instance=None, created=False, **kwargs):
+    if created:
+        apply_vbtc_deltas(transfer_deltas(instance))
+
+
+@receiver(post_delete, sender=VbtcV2TokenTransfer)
+def revert_transfer(sender, instance=None, **kwargs):
+    apply_vbtc_deltas(transfer_deltas(instance, sign=-1), insert=False)
+
+
+@receiver(post_save, sender=VbtcV2WithdrawalRequest)
+def apply_withdrawal(sender, instance=None, **kwargs):
+    if instance._ledger_completed is None:
+        logging.warning(
+            f"VbtcV2WithdrawalRequest {instance.pk} was loaded without its "
+            f"status; run verify_vbtc_ledger to check the ledger."
+        )
+        return
+
+    completed = instance.status == COMPLETED
+    if completed != instance._ledger_completed:
+        apply_vbtc_deltas(withdrawal_deltas(instance, sign=1 if completed else -1))
+        instance._ledger_completed = completed
+
+
+@receiver(post_delete, sender=VbtcV2WithdrawalRequest)
+def revert_withdrawal(sender, instance=None, **kwargs):
+    if instance._ledger_completed:
+        apply_vbtc_deltas(withdrawal_deltas(instance, sign=-1), insert=False)
+
+
+def ledger_mismatches(token: VbtcV2Token) -> List[Tuple[str, Decimal, Decimal]]:
+    """(address, stored, replayed) wherever the ledger disagrees with the
+    history."""
+
+    stored = token.ledger_entries()
+    replayed = token.replay_ledger_entries()
+
+    return [
+        (address, stored.get(address, Decimal(0)), replayed.get(address, Decimal(0)))
+        for address in sorted(set(stored) | set(replayed))
+        if stored.get(address, Decimal(0)) != replayed.get(address, Decimal(0))
+    ]
+
+
+def rewrite_ledger(token: VbtcV2Token) -> None:
+    """Replace the token's ledger with a replay of its history."""
+
+    with atomic_transaction():
+        VbtcV2Balance.objects.filter(token=token).delete()
+        VbtcV2Balance.objects.bulk_create(
+            VbtcV2Balance(token=token, address=address, balance=balance)
+            for address, balance in token.replay_ledger_entries().items()
+        )
+
+
+def verify_ledger(
+    fix: bool = False,
+) -> Iterator[Tuple[VbtcV2Token, List[Tuple[str, Decimal, Decimal]]]]:
+    """Yield (token, mismatches) for every token whose ledger disagrees with
+    its history, rewriting it from the history first when fix is set."""
+
+    for token in VbtcV2Token.objects.order_by("pk").iterator():
+        mismatches = ledger_mismatches(token)
+        if mismatches:
+            if fix:
+                rewrite_ledger(token)
+            yield token, mismatches
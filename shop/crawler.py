@@ -0,0 +1,150 @@
+"""Concurrent shop liveness checks for the shop_online_crawler command.
+
+connect_to_shop retries recursively with fixed sleeps, so one offline shop
+could hold a serial crawl for 20 seconds or more and a few hundred shops
+overran the crawler's own schedule. Here every shop gets a deadline
+(RBX_SHOP_CHECK_DEADLINE) instead of a retry count, up to
+RBX_SHOP_CHECK_WORKERS shops are checked at once, and the results are
+written back with one UPDATE per outcome.
+
+Pings are polled rather than re-sent, and the crawler wallet's ping table
+is cleared once after the whole crawl, not after each shop: clearing it
+mid-crawl would drop the pings other workers are still waiting on.
+"""
+
+import logging
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from project.utils.string import get_random_string
+from rbx.client import (
+    check_shop_ping,
+    clear_pings,
+    get_active_connections,
+    request_shop_connection,
+    request_shop_ping,
+)
+from shop.models import Shop
+
+
+@dataclass
+class CrawlResult:
+    online: List[int] = field(default_factory=list)
+    offline: List[int] = field(default_factory=list)
+    elapsed: float = 0
+
+    def __str__(self):
+        return (
+            f"{len(self.online)} online, {len(self.offline)} offline "
+            f"[elapsed: {self.elapsed:.1f}s]"
+        )
+
+
+class Deadline:
+    def __init__(self, seconds: float, clock=time.monotonic):
+        self.clock = clock
+        self.expires = clock() + seconds
+
+    def remaining(self) -> float:
+        return max(self.expires - self.clock(), 0)
+
+    def timeout(self) -> Optional[float]:
+        """The HTTP timeout for the next call, or None once expired."""
+
+        remaining = self.remaining()
+        if remaining <= 0:
+            return None
+        return min(remaining, settings.RBX_HTTP_READ_TIMEOUT)
+
+
+def ping(shop_url: str, deadline: Deadline, sleep=time.sleep) -> bool:
+    """Ping a shop through the crawler wallet and wait for the answer until
+    the deadline."""
+
+    ping_id = get_random_string(string.ascii_letters + string.digits, 16)
+
+    requested = False
+    while not requested:
+        timeout = deadline.timeout()
+        if timeout is None:
+            return False
+        requested = request_shop_ping(shop_url, ping_id, timeout)
+        if not requested:
+            sleep(min(settings.RBX_SHOP_PING_INTERVAL, deadline.remaining()))
+
+    while True:
+        timeout = deadline.timeout()
+        if timeout is None:
+            return False
+        if check_shop_ping(ping_id, timeout):
+            return True
+        sleep(min(settings.RBX_SHOP_PING_INTERVAL, deadline.remaining()))
+
+
+def check_shop(shop_url: str, deadline: Deadline, sleep=time.sleep) -> bool:
+    """Whether the crawler wallet can connect to and ping the shop before
+    the deadline. Network errors count as offline."""
+
+    try:
+        timeout = deadline.timeout()
+        if timeout is None or not request_shop_connection(shop_url, timeout):
+            return False
+        return ping(shop_url, deadline, sleep=sleep)
+    except (requests.RequestException, ValueError) as e:
+        logging.info(f"Shop {shop_url} check failed: {e}")
+        return False
+
+
+def crawl_shops(
+    shops: Iterable[Shop],
+    workers: Optional[int] = None,
+    deadline: Optional[float] = None,
+    sleep=time.sleep,
+) -> CrawlResult:
+    """Check every shop concurrently and record which are online."""
+
+    started = time.monotonic()
+    workers = workers or settings.RBX_SHOP_CHECK_WORKERS
+    deadline = deadline or settings.RBX_SHOP_CHECK_DEADLINE
+    shops = list(shops)
+    result = CrawlResult()
+
+    # The wallet already holds connections to these, which the serial crawler
+    # also took as proof the shop is up.
+    active_urls = {s["DecShopURL"] for s in get_active_connections() or []}
+
+    pending = []
+    for shop in shops:
+        if shop.url in active_urls:
+            result.online.append(shop.pk)
+        else:
+            pending.append(shop)
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Each check gets its own deadline, started when a worker picks
+            # it up rather than when it was queued.
+            alive = executor.map(
+                lambda shop: check_shop(shop.url, Deadline(deadline), sleep=sleep),
+                pending,
+            )
+            for shop, is_alive in zip(pending, alive):
+                (result.online if is_alive else result.offline).append(shop.pk)
+
+        try:
+            clear_pings()
+        except requests.RequestException as e:
+            logging.warning(f"Could not clear shop pings: {e}")
+
+    Shop.objects.filter(pk__in=result.online).update(offline_at=None)
+    Shop.objects.filter(pk__in=result.offline).update(offline_at=timezone.now())
+
+    result.elapsed = time.monotonic() - started
+    return result
@@ -0,0 +1,455 @@
+"""Diff-based import of a crawled shop's collections, listings, auctions and
+bids.
+
+_import_shop_data used to upsert every item of the MultiDecShopData payload
+with its own get and save, each lookup joining through
+collection__shop__unique_id, and then saved every listing of the shop again
+to flag the hidden ones. A shop with a few thousand listings cost tens of
+thousands of queries per crawl. Here the shop's existing rows are loaded once
+per model, diffed against the payload in memory, and only the rows that
+changed are written, with bulk_create and bulk_update in one transaction.
+
+The payload is also hashed. When it matches the hash of the last import the
+shop is skipped outright. The hash is only recorded once every listing could
+be imported: a listing whose NFT is not indexed yet is retried on the next
+crawl even if the shop has not changed.
+"""
+
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.transaction import atomic as atomic_transaction
+from django.utils import timezone
+
+from rbx.models import Nft
+from shop.media import upload_thumbs
+from shop.models import Auction, Bid, Collection, Listing, Shop
+
+PAYLOAD_KEYS = ("Collections", "Listings", "Auctions", "Bids")
+
+COLLECTION_FIELDS = ["name", "description", "is_deleted"]
+
+LISTING_FIELDS = [
+    "collection",
+    "nft",
+    "owner_address",
+    "buy_now_price",
+    "floor_price",
+    "reserve_price",
+    "start_date",
+    "end_date",
+    "is_visible_before_start_date",
+    "is_visible_after_end_date",
+    "final_price",
+    "winning_address",
+    "purchase_key",
+    "is_deleted",
+]
+
+AUCTION_FIELDS = [
+    "auction_id",
+    "listing",
+    "current_bid_price",
+    "is_auction_over",
+    "current_winning_address",
+]
+
+BID_FIELDS = [
+    "listing",
+    "address",
+    "signature",
+    "amount",
+    "is_buy_now",
+    "purchase_key",
+    "status",
+    "send_receive",
+    "send_time",
+    "is_processed",
+]
+
+
+def content_hash(data: dict) -> str:
+    """A hash of the parts of a shop data payload that the import reads."""
+
+    payload = {key: data[key] for key in PAYLOAD_KEYS if key in data}
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def clean(field: models.Field, value):
+    """The value as it will read back from the database, so that unchanged
+    rows compare equal to the payload."""
+
+    if value is None:
+        return None
+
+    value = field.to_python(value)
+    if isinstance(field, models.DecimalField):
+        value = value.quantize(Decimal(10) ** -field.decimal_places)
+    elif isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def assign(instance: models.Model, values: dict) -> bool:
+    """Set each field on the instance and return whether any of them
+    changed. Relations are compared by primary key."""
+
+    changed = False
+    for name, value in values.items():
+        field = instance._meta.get_field(name)
+        if field.is_relation:
+            # A parent created in this import has no pk yet, so it is always
+            # a change.
+            new = getattr(value, "pk", None)
+            same = getattr(instance, field.attname) == new
+            same = same and (value is None or new is not None)
+        else:
+            value = clean(field, value)
+            same = getattr(instance, field.attname) == value
+
+        if not same:
+            setattr(instance, name, value)
+            changed = True
+
+    return changed
+
+
+def resolve_relations(instance: models.Model, names: List[str]) -> None:
+    """Copy the pk of each assigned parent into its foreign key column.
+    bulk_create does this itself, but bulk_update does not, and a parent
+    may only have been created earlier in the same write."""
+
+    for name in names:
+        field = instance._meta.get_field(name)
+        if field.is_relation and field.is_cached(instance):
+            related = getattr(instance, name)
+            setattr(instance, field.attname, related.pk if related else None)
+
+
+def price(listing: dict, key: str) -> Optional[str]:
+    # Shops send 0 for a price that is not set.
+    return listing.get(key) or None
+
+
+class ShopImport:
+    """The in-memory diff of one shop's rows against its payload."""
+
+    def __init__(self, shop: Shop, data: dict):
+        self.shop = shop
+        self.data = data
+        self.complete = True
+
+        self.collections = list(Collection.objects.filter(shop=shop))
+        self.listings = list(Listing.objects.filter(collection__shop=shop))
+        self.auctions = list(Auction.objects.filter(listing__collection__shop=shop))
+        self.bids = list(Bid.objects.filter(listing__collection__shop=shop))
+
+        # New rows are keyed by id() since they have no pk to tell them apart.
+        self.created: Dict[type, Dict[int, models.Model]] = {
+            Collection: {},
+            Listing: {},
+            Auction: {},
+            Bid: {},
+        }
+        self.updated: Dict[type, Dict[int, models.Model]] = {
+            Collection: {},
+            Listing: {},
+            Auction: {},
+            Bid: {},
+        }
+        self.index_listings()
+
+    def save(self, instance: models.Model, changed: bool) -> None:
+        if instance.pk is None:
+            self.created[type(instance)][id(instance)] = instance
+        elif changed:
+            self.updated[type(instance)][instance.pk] = instance
+
+    def first_live(self, rows: List[models.Model], key) -> dict:
+        """The first row by pk for each key, among rows that are not
+        deleted, which is the row the old per-item get() matched."""
+
+        live = {}
+        for row in sorted(rows, key=lambda r: r.pk):
+            if not row.is_deleted:
+                live.setdefault(key(row), row)
+        return live
+
+    def import_collections(self) -> None:
+        payload = self.data.get("Collections")
+        if "Collections" not in self.data:
+            return
+
+        collection_ids = {c["Id"] for c in payload or []}
+        live = self.first_live(self.collections, lambda c: c.collection_id)
+
+        for c in payload or []:
+            collection = live.get(c["Id"])
+            if collection is None:
+                collection = Collection(shop=self.shop, collection_id=c["Id"])
+                live[c["Id"]] = collection
+
+            changed = assign(
+                collection,
+                {
+                    "name": c["Name"],
+                    "description": c["Description"],
+                    "is_deleted": False,
+                },
+            )
+            self.save(collection, changed)
+
+        # Hide the collections the shop no longer lists.
+        for collection in self.collections:
+            if collection.collection_id not in collection_ids:
+                self.save(collection, assign(collection, {"is_deleted": True}))
+
+    def collection_for(self, collection_id: int) -> Optional[Collection]:
+        rows = self.collections + list(self.created[Collection].values())
+        for collection in rows:
+            if collection.collection_id == collection_id and not collection.is_deleted:
+                return collection
+        for collection in rows:
+            if collection.collection_id == collection_id:
+                return collection
+        return None
+
+    def import_listings(self) -> None:
+        if "Listings" not in self.data:
+            return
+
+        payload = self.data["Listings"] or []
+        live = self.first_live(
+            self.listings, lambda l: (l.listing_id, l.smart_contract_uid)
+        )
+        nfts = Nft.objects.in_bulk({l["SmartContractUID"] for l in payload})
+
+        # Existing listings that are still current; every other listing of
+        # the shop is hidden, including ones whose listing id was reused for
+        # a different smart contract.
+        kept = set()
+
+        for l in payload:
+            sc_id = l["SmartContractUID"]
+            listing = live.get((l["Id"], sc_id))
+            if listing is not None:
+                kept.add(listing.pk)
+
+            collection = self.collection_for(l["CollectionId"])
+            if collection is None:
+                logging.error(
+                    f"Collection not found with id of {l['CollectionId']} and shop with unique_id of {self.shop.unique_id}"
+                )
+                continue
+
+            nft = nfts.get(sc_id)
+            if nft is None:
+                logging.error(f"NFT with sc id of {sc_id} not found")
+                self.complete = False
+                continue
+
+            if listing is None:
+                listing = Listing(listing_id=l["Id"], smart_contract_uid=sc_id)
+                live[(l["Id"], sc_id)] = listing
+
+            changed = assign(
+                listing,
+                {
+                    "collection": collection,
+                    "nft": nft,
+                    "owner_address": l["AddressOwner"],
+                    "buy_now_price": price(l, "BuyNowPrice"),
+                    "floor_price": price(l, "FloorPrice"),
+                    "reserve_price": price(l, "ReservePrice"),
+                    "start_date": l["StartDate"],
+                    "end_date": l["EndDate"],
+                    "is_visible_before_start_date": l["IsVisibleBeforeStartDate"],
+                    "is_visible_after_end_date": l["IsVisibleAfterEndDate"],
+                    "final_price": l["FinalPrice"],
+                    "winning_address": l["WinningAddress"],
+                    "purchase_key": l["PurchaseKey"],
+                    "is_deleted": False,
+                },
+            )
+            self.save(listing, changed)
+
+        for listing in self.listings:
+            if listing.pk not in kept:
+                self.save(listing, assign(listing, {"is_deleted": True}))
+
+        self.index_listings()
+
+    def index_listings(self) -> None:
+        # Existing rows first, in pk order, then the ones created here.
+        self.by_number: Dict[int, List[Listing]] = defaultdict(list)
+        for listing in self.listings + list(self.created[Listing].values()):
+            self.by_number[listing.listing_id].append(listing)
+
+    def listing_for(self, listing_id: int, open_only: bool = False):
+        """The listing an auction or bid with this listing id belongs to."""
+
+        rows = self.by_number.get(listing_id, [])
+        live = [l for l in rows if not l.is_deleted]
+
+        if open_only:
+            live = [l for l in live if not l.is_sale_complete]
+            return live[0] if live else None
+        if live:
+            return live[0]
+        return rows[0] if rows else None
+
+    def import_auctions(self) -> None:
+        listings = {l.pk: l for l in self.listings}
+        by_listing = {}
+        by_number = {}
+        for auction in self.auctions:
+            listing = listings[auction.listing_id]
+            by_listing[id(listing)] = auction
+            by_number.setdefault(listing.listing_id, auction)
+
+        for a in self.data.get("Auctions") or []:
+            listing = self.listing_for(a["ListingId"], open_only=True)
+            if listing is None:
+                logging.error(
+                    f"(AUCTIONS) Listing not found with id of {a['ListingId']} and shop with unique_id of {self.shop.unique_id}"
+                )
+                continue
+
+            if not listing.is_auction:
+                continue
+
+            # An auction left on an earlier listing with the same id moves to
+            # the current one, as the per-item lookup did.
+            auction = by_listing.get(id(listing)) or by_number.get(a["ListingId"])
+            if auction is None:
+                auction = Auction()
+                by_number[a["ListingId"]] = auction
+
+            changed = assign(
+                auction,
+                {
+                    "auction_id": a["Id"],
+                    "listing": listing,
+                    "current_bid_price": a["CurrentBidPrice"],
+                    "is_auction_over": a["IsAuctionOver"],
+                    "current_winning_address": a["CurrentWinningAddress"],
+                },
+            )
+            by_listing[id(listing)] = auction
+            self.save(auction, changed)
+
+    def import_bids(self) -> None:
+        listing_numbers = {l.pk: l.listing_id for l in self.listings}
+        bids = {
+            (bid.bid_id, listing_numbers.get(bid.listing_id)): bid for bid in self.bids
+        }
+
+        for b in self.data.get("Bids") or []:
+            listing = self.listing_for(b["ListingId"])
+            if listing is None:
+                logging.error(
+                    f"(BIDS) Listing not found with id of {b['ListingId']} and shop with unique_id of {self.shop.unique_id}"
+                )
+                continue
+
+            bid = bids.get((b["Id"], b["ListingId"]))
+            if bid is None:
+                bid = Bid(bid_id=b["Id"])
+                bids[(b["Id"], b["ListingId"])] = bid
+
+            changed = assign(
+                bid,
+                {
+                    "listing": listing,
+                    "address": b["BidAddress"],
+                    "signature": b["BidSignature"],
+                    "amount": b["BidAmount"],
+                    "is_buy_now": b["IsBuyNow"],
+                    "purchase_key": b["PurchaseKey"],
+                    "status": b["BidStatus"],
+                    "send_receive": b["BidSendReceive"],
+                    "send_time": b["BidSendTime"],
+                    "is_processed": b["IsProcessed"],
+                },
+            )
+            self.save(bid, changed)
+
+    def write(self) -> Tuple[int, int]:
+        """Apply the diff, parents first so children get their foreign
+        keys. Returns the number of rows created and updated."""
+
+        fields = [
+            (Collection, COLLECTION_FIELDS),
+            (Listing, LISTING_FIELDS),
+            (Auction, AUCTION_FIELDS),
+            (Bid, BID_FIELDS),
+        ]
+
+        created = updated = 0
+        for model, model_fields in fields:
+            rows = list(self.created[model].values())
+            if rows:
+                model.objects.bulk_create(rows)
+                created += len(rows)
+
+            rows = list(self.updated[model].values())
+            if rows:
+                for row in rows:
+                    resolve_relations(row, model_fields)
+                model.objects.bulk_update(rows, model_fields)
+                updated += len(rows)
+
+        return created, updated
+
+
+def queue_missing_thumbnails(shop: Shop) -> None:
+    """Start thumbnail uploads for the shop's listings that have none, so a
+    failed upload is retried on the next crawl."""
+
+    listings = Listing.objects.filter(
+        Q(thumbnails__isnull=True) | Q(thumbnails__len=0),
+        collection__shop=shop,
+        is_deleted=False,
+    ).values_list("pk", "smart_contract_uid")
+
+    for pk, sc_id in listings:
+        upload_thumbs.apply_async(args=[pk, sc_id, []], countdown=30)
+
+
+def import_shop_data(shop: Shop, data: dict) -> bool:
+    """Reconcile the shop's rows with a MultiDecShopData payload. Returns
+    False when the payload was unchanged since the last import and skipped."""
+
+    digest = content_hash(data)
+    unchanged = shop.content_hash == digest
+
+    with atomic_transaction():
+        if unchanged:
+            logging.info(f"Shop {shop.unique_id} is unchanged. Skipping import.")
+        else:
+            shop_import = ShopImport(shop, data)
+            shop_import.import_collections()
+            shop_import.import_listings()
+            shop_import.import_auctions()
+            shop_import.import_bids()
+            created, updated = shop_import.write()
+            logging.info(
+                f"Imported shop {shop.unique_id} [created: {created}, updated: {updated}]"
+            )
+            shop.content_hash = digest if shop_import.complete else None
+
+        shop.offline_at = None
+        shop.last_crawled = timezone.now()
+        shop.save(update_fields=["offline_at", "last_crawled", "content_hash"])
+
+        transaction.on_commit(lambda: queue_missing_thumbnails(shop))
+
+    return not unchanged
@@ -1,14 +1,20 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from shop.tasks import import_shop
+from shop.crawler import crawl_shops
 from shop.models import Shop
-from rbx.client import get_all_shops, connect_to_shop, get_active_connections
 from django.db.models import Q
 
+"""
+python manage.py shop_online_crawler [--all] [--workers 16]
+"""
+
 
 class Command(BaseCommand):
+    help = "Check which shops are online, concurrently, and record the result"
+
     def add_arguments(self, parser) -> None:
         parser.add_argument("--all", action="store_true")
+        parser.add_argument("--workers", type=int, default=None)
 
     def handle(self, *args, **options):
         all = options["all"]
@@ -39,14 +45,5 @@ class Command(BaseCommand):
             )
         )
 
-        active_shops = get_active_connections()
-        active_shop_urls = [s["DecShopURL"] for s in active_shops]
-
-        for shop in shops:
-            if shop.url in active_shop_urls:
-                shop.offline_at = None
-                shop.save()
-            else:
-                can_connect, _ = connect_to_shop(shop.url, 1, 1)
-                shop.offline_at = None if can_connect else timezone.now()
-                shop.save()
+        result = crawl_shops(shops, workers=options["workers"])
+        self.stdout.write(f"Checked shops: {result}")
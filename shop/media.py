@@ -5,7 +5,9 @@ import logging
 import uuid
 import shutil
 import os
-import paramiko
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from urllib.parse import urlparse
 import requests
 import os
@@ -15,6 +17,7 @@ from project.utils.string import get_random_string
 from project.celery import app
 from rbx.exceptions import RBXException
 from shop.models import Listing
+from shop.sftp import SSHConnection, sftp_session
 
 
 @app.task(autoretry_for=[RBXException])
@@ -132,6 +135,19 @@ def _upload_thumbs_local(sc_uid: str) -> list[str]:
     return urls
 
 
+@lru_cache(maxsize=None)
+def s3_client(access_key: str, secret_key: str):
+    """One S3 client per worker process and credentials. boto3 clients are
+    thread-safe and keep their own connection pool, so reusing one saves
+    rebuilding the client and its connections for every upload."""
+
+    return boto3.client(
+        "s3",
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+    )
+
+
 def upload_to_s3(sc_uid: str, path: str, bucket: str = settings.AWS_BUCKET):
 
     ACCESS_KEY = settings.AWS_ACCESS_KEY
@@ -145,11 +161,7 @@ def upload_to_s3(sc_uid: str, path: str, bucket: str = settings.AWS_BUCKET):
     filename = os.path.basename(path)
     key = f"{bucket_directory}/{filename}"
 
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=ACCESS_KEY,
-        aws_secret_access_key=SECRET_KEY,
-    )
+    s3 = s3_client(ACCESS_KEY, SECRET_KEY)
 
     logging.info(f"Uploading file: {key}")
 
@@ -161,19 +173,8 @@ def upload_to_s3(sc_uid: str, path: str, bucket: str = settings.AWS_BUCKET):
 
 
 def scp_down_folder(folder_name: str, host: str):
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
     host = urlparse(host).hostname
 
-    ssh_client.connect(
-        host,
-        username=settings.RBX_SHOP_WALLET_USERNAME,
-        password="",
-        key_filename=settings.RBX_WALLET_SSH_KEY_PATH,
-    )
-
-    sftp = ssh_client.open_sftp()
     remote_path = f"{settings.RBX_SHOP_ASSETS_FOLDER_PATH}/{folder_name}"
     logging.info(f"Remote Path: {remote_path}")
     local_path = f"{settings.RBX_TEMP_PATH}/{folder_name}"
@@ -183,43 +184,68 @@ def scp_down_folder(folder_name: str, host: str):
         shutil.rmtree(local_path)
         os.makedirs(local_path)
 
-    sftp_get_recursive(remote_path, local_path, sftp)
+    with sftp_session(host) as connection:
+        sftp_get_recursive(remote_path, local_path, connection)
 
     return local_path
 
 
-def sftp_get_recursive(path, dest, sftp):
+def sftp_list_recursive(path, dest, sftp) -> list[tuple[str, str]]:
+    """(remote, local) paths of the files under path that are not in dest
+    yet, creating the local folders on the way."""
 
-    item_list = sftp.listdir_attr(path)
+    files = []
     dest = str(dest)
     if not os.path.isdir(dest):
         os.makedirs(dest, exist_ok=True)
-    for item in item_list:
+    for item in sftp.listdir_attr(path):
         mode = item.st_mode
         if S_ISDIR(mode):
-            sftp_get_recursive(
+            files += sftp_list_recursive(
                 path + "/" + item.filename, dest + "/" + item.filename, sftp
             )
         else:
             destination = dest + "/" + item.filename
             if os.path.isfile(destination):
                 continue
-            sftp.get(path + "/" + item.filename, dest + "/" + item.filename)
+            files.append((path + "/" + item.filename, destination))
+    return files
 
 
-def scp_up_file(local_path: str, remote_path: str):
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    ssh_client.connect(
-        settings.RBX_SHOP_WALLET_IP,
-        username=settings.RBX_SHOP_WALLET_USERNAME,
-        password="",
-        key_filename=settings.RBX_WALLET_SSH_KEY_PATH,
-    )
+def sftp_get_recursive(path, dest, connection: SSHConnection):
+    """Download a remote folder, up to RBX_SFTP_TRANSFER_WORKERS files at a
+    time. Each worker gets its own SFTP channel on the same connection;
+    paramiko channels are not safe to share between threads."""
+
+    files = sftp_list_recursive(path, dest, connection.sftp)
+    if not files:
+        return
 
-    sftp = ssh_client.open_sftp()
-    sftp.put(local_path, remote_path)
+    workers = min(settings.RBX_SFTP_TRANSFER_WORKERS, len(files))
+    channels = queue.Queue()
+    channels.put(connection.sftp)
+    extra = [connection.open_sftp() for _ in range(workers - 1)]
+    for channel in extra:
+        channels.put(channel)
+
+    def get(remote_local):
+        channel = channels.get()
+        try:
+            channel.get(*remote_local)
+        finally:
+            channels.put(channel)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(get, files))
+    finally:
+        for channel in extra:
+            channel.close()
+
+
+def scp_up_file(local_path: str, remote_path: str):
+    with sftp_session(settings.RBX_SHOP_WALLET_IP) as connection:
+        connection.sftp.put(local_path, remote_path)
 
 
 def scp_up_url(url: str):
@@ -246,21 +272,11 @@ def scp_up_url(url: str):
 
 
 def scp_down_file(remote_path: str):
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-
-    ssh_client.connect(
-        settings.RBX_SHOP_WALLET_IP,
-        username=settings.RBX_SHOP_WALLET_USERNAME,
-        password="",
-        key_filename=settings.RBX_WALLET_SSH_KEY_PATH,
-    )
-
     filename = os.path.basename(remote_path)
 
     local_path = f"{settings.RBX_TEMP_PATH}/{filename}"  # TODO: generate random folder
 
-    sftp = ssh_client.open_sftp()
-    sftp.get(remote_path, local_path)
+    with sftp_session(settings.RBX_SHOP_WALLET_IP) as connection:
+        connection.sftp.get(remote_path, local_path)
 
     return local_path
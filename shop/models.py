@@ -24,6 +24,10 @@ class Shop(models.Model):
     offline_at = models.DateTimeField(blank=True, null=True)
     ignore_import = models.BooleanField(default=False)
 
+    # Hash of the last shop data payload that was fully imported, so an
+    # unchanged shop can be skipped. Clear it to force a full import.
+    content_hash = models.CharField(max_length=64, blank=True, null=True)
+
     def __str__(self):
         return self.name
 
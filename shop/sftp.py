@@ -0,0 +1,151 @@
+"""Pooled SSH connections for the shop media transfers in shop.media.
+
+Every scp_* helper used to open its own paramiko.SSHClient, which costs a TCP
+connect, key exchange and key authentication per file. upload_thumbs runs once
+per listing, so a crawl paid for thousands of handshakes against the same
+wallet host. sftp_session instead hands out an authenticated connection from a
+per-process pool and takes it back afterwards:
+
+- a pooled connection is checked before reuse (transport still active, SFTP
+  channel open, and one SFTP round trip) and replaced if it fails the check;
+- connections idle for longer than RBX_SFTP_IDLE_TIMEOUT are closed, and at
+  most RBX_SFTP_POOL_SIZE are kept per host;
+- the pool is per process: a Celery worker child that inherits one from its
+  parent across a fork starts with an empty pool instead of sharing sockets.
+
+Extra SFTP channels for concurrent downloads are opened on the pooled
+connection's transport, so they need no handshake of their own.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import paramiko
+from django.conf import settings
+
+
+class SSHConnection:
+    def __init__(self, host: str, port: int):
+        self.key = (host, port)
+        self.client = paramiko.SSHClient()
+        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.client.connect(
+            host,
+            port=port,
+            username=settings.RBX_SHOP_WALLET_USERNAME,
+            password="",
+            key_filename=settings.RBX_WALLET_SSH_KEY_PATH,
+        )
+        self.sftp = self.client.open_sftp()
+        self.last_used = time.monotonic()
+
+    def open_sftp(self) -> paramiko.SFTPClient:
+        """Another SFTP channel on this connection."""
+
+        return self.client.open_sftp()
+
+    def is_healthy(self) -> bool:
+        transport = self.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if self.sftp.get_channel().closed:
+            return False
+
+        # The transport only notices a dropped connection once it reads from
+        # it, so make one round trip.
+        try:
+            self.sftp.normalize(".")
+        except (EOFError, OSError, paramiko.SSHException):
+            return False
+        return True
+
+    def close(self) -> None:
+        try:
+            self.client.close()
+        except Exception as e:
+            logging.info(f"Error closing SSH connection to {self.key}: {e}")
+
+
+class SSHPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle: Dict[Tuple[str, int], List[SSHConnection]] = defaultdict(list)
+        self.pid = os.getpid()
+
+    def acquire(self, host: str, port: int) -> SSHConnection:
+        while True:
+            with self.lock:
+                self.evict_idle()
+                idle = self.idle[(host, port)]
+                connection = idle.pop() if idle else None
+
+            if connection is None:
+                logging.info(f"Opening SSH connection to {host}:{port}")
+                return SSHConnection(host, port)
+
+            if connection.is_healthy():
+                return connection
+
+            logging.info(f"Dropping broken SSH connection to {host}:{port}")
+            connection.close()
+
+    def release(self, connection: SSHConnection) -> None:
+        connection.last_used = time.monotonic()
+
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Acquired before a fork; leave the parent's socket alone.
+                return
+
+            idle = self.idle[connection.key]
+            if len(idle) < settings.RBX_SFTP_POOL_SIZE:
+                idle.append(connection)
+                return
+
+        connection.close()
+
+    def evict_idle(self) -> None:
+        """Close connections idle for too long. Called with the lock held."""
+
+        if os.getpid() != self.pid:
+            # Forked: the sockets belong to the parent, so drop them without
+            # sending anything on them.
+            self.idle = defaultdict(list)
+            self.pid = os.getpid()
+            return
+
+        cutoff = time.monotonic() - settings.RBX_SFTP_IDLE_TIMEOUT
+        for key, idle in self.idle.items():
+            stale = [c for c in idle if c.last_used < cutoff]
+            self.idle[key] = [c for c in idle if c.last_used >= cutoff]
+            for connection in stale:
+                connection.close()
+
+    def clear(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, defaultdict(list)
+
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+pool = SSHPool()
+
+
+@contextmanager
+def sftp_session(host: str, port: int = None) -> Iterator[SSHConnection]:
+    """A pooled connection to the host, returned to the pool on exit. A
+    connection broken during the block fails its health check on the next
+    acquire and is replaced then."""
+
+    connection = pool.acquire(host, port or settings.RBX_WALLET_SSH_PORT)
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
@@ -1,3 +1,681 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+import paramiko
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rbx import client as rbx_client
+from rbx.models import Nft
+from shop.crawler import crawl_shops
+from shop.importer import content_hash, import_shop_data
+from shop.media import s3_client, scp_down_file, scp_down_folder, scp_up_file
+from shop.media import upload_to_s3
+from shop.sftp import pool as sftp_pool
+from shop.thumbnails import thumbnail_previews
+from shop.models import Auction, Bid, Listing, Shop
+
+
+class StubResponse:
+    def __init__(self, payload, status_code=200):
+        self.status_code = status_code
+        self.text = payload if isinstance(payload, str) else json.dumps(payload)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class StubShopWallet:
+    """The crawler wallet's wsapi/WebShopV1 endpoints.
+
+    Shops in `online` accept connections and answer pings on the second
+    CheckPingShop poll; shops in `silent` accept connections but never answer;
+    shops in `active` are already connected; every other shop refuses the
+    connection after `refuse_delay` seconds.
+    """
+
+    def __init__(self, online=(), silent=(), active=(), refuse_delay=0.0):
+        self.online = set(online)
+        self.silent = set(silent)
+        self.active = set(active)
+        self.refuse_delay = refuse_delay
+        self.pings = {}
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return self.route(url.split("wsapi/WebShopV1/", 1)[1].strip("/"))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def route(self, path):
+        endpoint, _, rest = path.partition("/")
+        self.calls.append(endpoint)
+
+        if endpoint == "GetConnections":
+            return StubResponse(
+                {
+                    "Success": True,
+                    "Connected": True,
+                    "MultiDecShop": [{"DecShopURL": url} for url in self.active],
+                }
+            )
+        if endpoint == "ConnectToDecShop":
+            shop_url = rest.split("/", 1)[1]
+            accepted = shop_url in self.online | self.silent
+            if not accepted:
+                time.sleep(self.refuse_delay)
+            return StubResponse("true" if accepted else "false")
+        if endpoint == "PingShop":
+            ping_id, shop_url = rest.split("/", 1)
+            self.pings[ping_id] = [shop_url, 0]
+            return StubResponse({"Success": True})
+        if endpoint == "CheckPingShop":
+            ping = self.pings[rest]
+            ping[1] += 1
+            answered = ping[0] in self.online and ping[1] >= 2
+            return StubResponse({"Success": True, "Ping": {"Item1": answered}})
+        if endpoint == "ClearPingRequest":
+            self.pings.clear()
+            return StubResponse({"Success": True})
+        raise AssertionError(f"unexpected wsapi call {path}")
+
+
+def make_shop(url, **fields):
+    return Shop.objects.create(
+        shop_id=1,
+        unique_id=url,
+        name=url,
+        url=url,
+        description="",
+        owner_address="OWNER",
+        **fields,
+    )
+
+
+class ShopCrawlerTests(TestCase):
+    def crawl(self, wallet, shops, **kwargs):
+        with patch.object(rbx_client.cli, "get", side_effect=wallet.get):
+            return crawl_shops(shops, sleep=lambda seconds: None, **kwargs)
+
+    def test_liveness_is_written_back(self):
+        up = make_shop("rbx://up")
+        down = make_shop("rbx://down")
+        active = make_shop("rbx://active", offline_at=timezone.now())
+        wallet = StubShopWallet(online={"rbx://up"}, active={"rbx://active"})
+
+        result = self.crawl(wallet, [up, down, active])
+
+        self.assertEqual(sorted(result.online), sorted([up.pk, active.pk]))
+        self.assertEqual(result.offline, [down.pk])
+        self.assertIsNone(Shop.objects.get(pk=up.pk).offline_at)
+        self.assertIsNone(Shop.objects.get(pk=active.pk).offline_at)
+        self.assertIsNotNone(Shop.objects.get(pk=down.pk).offline_at)
+
+        # Pings are cleared once, after every check has finished.
+        self.assertEqual(wallet.calls.count("ClearPingRequest"), 1)
+        self.assertEqual(wallet.calls[-1], "ClearPingRequest")
+
+    def test_offline_shops_are_checked_concurrently(self):
+        shops = [make_shop(f"rbx://down-{i}") for i in range(8)]
+        wallet = StubShopWallet(refuse_delay=0.2)
+
+        started = time.monotonic()
+        result = self.crawl(wallet, shops, workers=4)
+
+        self.assertEqual(len(result.offline), 8)
+        self.assertEqual(wallet.max_in_flight, 4)
+        self.assertLess(time.monotonic() - started, 8 * 0.2)
+
+    def test_unanswered_ping_counts_as_offline_at_the_deadline(self):
+        shop = make_shop("rbx://silent")
+        wallet = StubShopWallet(silent={"rbx://silent"})
+
+        result = self.crawl(wallet, [shop], deadline=0.05)
+
+        self.assertEqual(result.offline, [shop.pk])
+        self.assertGreater(wallet.calls.count("CheckPingShop"), 1)
+
+
+def make_nft(identifier):
+    return Nft.objects.create(
+        identifier=identifier,
+        name="",
+        minter_address="OWNER",
+        owner_address="OWNER",
+        minter_name="",
+        primary_asset_name="",
+        primary_asset_size=0,
+        data="",
+        smart_contract_data="",
+        minted_at=timezone.now(),
+        is_published=True,
+    )
+
+
+def listing_payload(listing_id, sc_id, collection_id=1, **fields):
+    return {
+        "Id": listing_id,
+        "CollectionId": collection_id,
+        "SmartContractUID": sc_id,
+        "AddressOwner": "OWNER",
+        "BuyNowPrice": 10,
+        "FloorPrice": None,
+        "ReservePrice": None,
+        "StartDate": "2023-01-01T00:00:00",
+        "EndDate": "2024-01-01T00:00:00",
+        "IsVisibleBeforeStartDate": True,
+        "IsVisibleAfterEndDate": True,
+        "FinalPrice": None,
+        "WinningAddress": None,
+        "PurchaseKey": f"key-{listing_id}",
+        **fields,
+    }
+
+
+def shop_payload(listings, auctions=(), bids=()):
+    return {
+        "DecShop": {"CollectionCount": 1, "ListingCount": len(listings)},
+        "Collections": [{"Id": 1, "Name": "Art", "Description": ""}],
+        "Listings": list(listings),
+        "Auctions": list(auctions),
+        "Bids": list(bids),
+    }
+
+
+@patch("shop.importer.upload_thumbs")
+class ShopImportTests(TestCase):
+    def setUp(self):
+        self.shop = make_shop("rbx://shop")
+
+    def listings(self, **filters):
+        return Listing.objects.filter(collection__shop=self.shop, **filters)
+
+    def test_import_creates_and_reconciles_rows(self, upload_thumbs):
+        make_nft("sc:1")
+        make_nft("sc:2")
+        auction = listing_payload(2, "sc:2", BuyNowPrice=0, FloorPrice=1.5)
+        bid = {
+            "Id": "bid-1",
+            "ListingId": 2,
+            "BidAddress": "BIDDER",
+            "BidSignature": "sig",
+            "BidAmount": 2,
+            "IsBuyNow": False,
+            "PurchaseKey": "key-2",
+            "BidStatus": Bid.BidStatus.ACCEPTED,
+            "BidSendReceive": Bid.BidSendReceive.SEND,
+            "BidSendTime": 1,
+            "IsProcessed": True,
+        }
+        data = shop_payload(
+            [listing_payload(1, "sc:1"), auction],
+            auctions=[
+                {
+                    "Id": 1,
+                    "ListingId": 2,
+                    "CurrentBidPrice": 2,
+                    "IsAuctionOver": False,
+                    "CurrentWinningAddress": "BIDDER",
+                }
+            ],
+            bids=[bid],
+        )
+
+        self.assertTrue(import_shop_data(self.shop, data))
+
+        self.assertEqual(self.listings(is_deleted=False).count(), 2)
+        listing = self.listings().get(listing_id=2)
+        self.assertIsNone(listing.buy_now_price)
+        self.assertEqual(listing.floor_price, Decimal("1.5"))
+        self.assertEqual(listing.auction.current_winning_address, "BIDDER")
+        self.assertEqual(listing.bids.get().amount, Decimal(2))
+        self.assertEqual(self.shop.content_hash, content_hash(data))
+
+        # Hide listing 1 and reprice listing 2; nothing else is rewritten.
+        data["Listings"] = [{**auction, "FloorPrice": 3}]
+        self.assertTrue(import_shop_data(self.shop, data))
+
+        self.assertTrue(self.listings().get(listing_id=1).is_deleted)
+        self.assertEqual(self.listings().get(listing_id=2).floor_price, Decimal(3))
+        self.assertEqual(Auction.objects.count(), 1)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_unchanged_shop_is_skipped(self, upload_thumbs):
+        make_nft("sc:1")
+        data = shop_payload([listing_payload(1, "sc:1")])
+        import_shop_data(self.shop, data)
+
+        self.shop.refresh_from_db()
+        crawled = json.loads(json.dumps(data))
+        # Only the shop's own UPDATE, inside a savepoint.
+        with self.assertNumQueries(3):
+            self.assertFalse(import_shop_data(self.shop, crawled))
+
+    def test_reused_listing_id_replaces_the_old_listing(self, upload_thumbs):
+        make_nft("sc:1")
+        make_nft("sc:2")
+        import_shop_data(self.shop, shop_payload([listing_payload(1, "sc:1")]))
+        import_shop_data(self.shop, shop_payload([listing_payload(1, "sc:2")]))
+
+        self.assertEqual(
+            list(self.listings(is_deleted=False).values_list("smart_contract_uid")),
+            [("sc:2",)],
+        )
+        self.assertTrue(self.listings().get(smart_contract_uid="sc:1").is_deleted)
+
+    def test_unindexed_nft_is_retried(self, upload_thumbs):
+        data = shop_payload([listing_payload(1, "sc:1")])
+        import_shop_data(self.shop, data)
+
+        self.assertFalse(self.listings().exists())
+        self.assertIsNone(self.shop.content_hash)
+
+        make_nft("sc:1")
+        self.assertTrue(import_shop_data(self.shop, data))
+        self.assertTrue(self.listings(is_deleted=False).exists())
+
+    def test_query_count_does_not_grow_with_the_shop(self, upload_thumbs):
+        def import_queries(count, price):
+            data = shop_payload(
+                [
+                    listing_payload(i, f"sc:{i}", BuyNowPrice=price)
+                    for i in range(count)
+                ]
+            )
+            with CaptureQueriesContext(connection) as queries:
+                import_shop_data(self.shop, data)
+            return len(queries)
+
+        for i in range(50):
+            make_nft(f"sc:{i}")
+
+        # Creating, then updating, 5 listings costs as many queries as 50.
+        small = import_queries(5, 1), import_queries(5, 2)
+        self.shop.collections.all().delete()
+        self.assertEqual((import_queries(50, 1), import_queries(50, 2)), small)
+
+
+class StubShopDataWallet:
+    """GetDecShopData for one shop whose data trickles in: its listings
+    arrive on the `listings_after`th poll, the auction of each listing one
+    poll after it was requested, and with `bids_after`, a bid on it that many
+    polls after it was requested."""
+
+    def __init__(self, shop_url, listings, listings_after=3, bids_after=None):
+        self.shop_url = shop_url
+        self.listings = listings
+        self.listings_after = listings_after
+        self.bids_after = bids_after
+        self.polls = 0
+        self.requested = {}
+
+    def get(self, url, timeout=None, **kwargs):
+        endpoint, _, rest = url.split("wsapi/WebShopV1/", 1)[1].partition("/")
+
+        if endpoint == "GetShopSpecificAuction":
+            self.requested[int(rest.split("/", 1)[0])] = self.polls
+            return StubResponse("true")
+        if endpoint == "GetShopListingBids":
+            return StubResponse("true")
+        if endpoint != "GetDecShopData":
+            raise AssertionError(f"unexpected wsapi call {url}")
+
+        self.polls += 1
+        listings = self.listings if self.polls >= self.listings_after else []
+        auctions = [
+            {"Id": listing_id, "ListingId": listing_id}
+            for listing_id, requested_at in self.requested.items()
+            if self.polls > requested_at
+        ]
+        bids = [
+            {"Id": listing_id, "ListingId": listing_id}
+            for listing_id, requested_at in self.requested.items()
+            if self.bids_after and self.polls >= requested_at + self.bids_after
+        ]
+        shop = {
+            "DecShop": {"CollectionCount": 1, "ListingCount": len(self.listings)},
+            "Collections": [{"Id": 1, "Name": "Art", "Description": ""}],
+            "Listings": listings,
+            "Auctions": auctions,
+            "Bids": bids,
+        }
+        return StubResponse(
+            {"Success": True, "MultiDecShopData": {self.shop_url: shop}}
+        )
+
+
+@patch("rbx.client.connect_to_shop", return_value=(True, True))
+class ShopDataReadinessTests(TestCase):
+    def fetch(self, wallet):
+        sleeps = []
+        with patch.object(rbx_client.cli, "get", side_effect=wallet.get), patch(
+            "rbx.client.time.sleep", side_effect=sleeps.append
+        ):
+            return rbx_client.get_shop_data(wallet.shop_url), sleeps
+
+    def test_returns_once_listings_and_auctions_arrive(self, connect):
+        listings = [
+            listing_payload(i, f"sc:{i}", FloorPrice=1) for i in range(1, 201)
+        ]
+        wallet = StubShopDataWallet("rbx://shop", listings)
+
+        data, sleeps = self.fetch(wallet)
+
+        self.assertEqual(len(data["Listings"]), 200)
+        self.assertEqual(len(data["Auctions"]), 200)
+        # Every listing's auction and bids were requested in one batch,
+        # without sleeping between listings.
+        self.assertEqual(sorted(wallet.requested), list(range(1, 201)))
+        self.assertLess(sum(sleeps), 3)
+        self.assertLessEqual(max(sleeps), settings.RBX_SHOP_DATA_POLL_MAX)
+
+    def test_waits_for_late_bids(self, connect):
+        listings = [listing_payload(i, f"sc:{i}", FloorPrice=1) for i in (1, 2)]
+        wallet = StubShopDataWallet("rbx://shop", listings, bids_after=3)
+
+        data, sleeps = self.fetch(wallet)
+
+        self.assertEqual(len(data["Auctions"]), 2)
+        self.assertEqual(len(data["Bids"]), 2)
+
+    @override_settings(RBX_SHOP_DATA_TIMEOUT=0)
+    def test_returns_partial_data_at_the_timeout(self, connect):
+        wallet = StubShopDataWallet(
+            "rbx://shop", [listing_payload(1, "sc:1")], listings_after=100
+        )
+
+        data, sleeps = self.fetch(wallet)
+
+        self.assertEqual(data["Listings"], [])
+        self.assertEqual(wallet.requested, {})
+
+
+class StubSFTPHandle(paramiko.SFTPHandle):
+    def stat(self):
+        f = self.readfile or self.writefile
+        return paramiko.SFTPAttributes.from_stat(os.fstat(f.fileno()))
+
+
+class StubSFTPServer(paramiko.SFTPServerInterface):
+    """Serves the local filesystem as is."""
+
+    def list_folder(self, path):
+        try:
+            return [
+                paramiko.SFTPAttributes.from_stat(
+                    os.stat(os.path.join(path, name)), name
+                )
+                for name in os.listdir(path)
+            ]
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        try:
+            return paramiko.SFTPAttributes.from_stat(os.stat(path))
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+    lstat = stat
+
+    def open(self, path, flags, attr):
+        writing = flags & (os.O_WRONLY | os.O_RDWR)
+        try:
+            f = open(path, "wb" if writing else "rb")
+        except OSError as e:
+            return paramiko.SFTPServer.convert_errno(e.errno)
+
+        handle = StubSFTPHandle(flags)
+        if writing:
+            handle.writefile = f
+        else:
+            handle.readfile = f
+        return handle
+
+
+class StubSSHServer(paramiko.ServerInterface):
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+
+class LocalSFTPServer:
+    """An SFTP server on localhost that counts completed handshakes."""
+
+    def __init__(self):
+        self.host_key = paramiko.RSAKey.generate(1024)
+        self.handshakes = 0
+        self.transports = []
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+
+            transport = paramiko.Transport(conn)
+            transport.add_server_key(self.host_key)
+            transport.set_subsystem_handler(
+                "sftp", paramiko.SFTPServer, StubSFTPServer
+            )
+            transport.start_server(server=StubSSHServer())
+            self.transports.append(transport)
+            self.handshakes += 1
+
+    def drop_connections(self):
+        for transport in self.transports:
+            transport.close()
+
+    def close(self):
+        self.sock.close()
+        self.drop_connections()
+
+
+class PooledMediaTransferTests(TestCase):
+    def setUp(self):
+        self.server = LocalSFTPServer()
+        self.addCleanup(self.server.close)
+        self.addCleanup(sftp_pool.clear)
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.remote = os.path.join(self.tmp, "remote")
+        self.local = os.path.join(self.tmp, "local")
+        os.makedirs(self.remote)
+        os.makedirs(self.local)
+
+        key_path = os.path.join(self.tmp, "id_rsa")
+        paramiko.RSAKey.generate(1024).write_private_key_file(key_path)
+
+        overrides = override_settings(
+            RBX_WALLET_SSH_KEY_PATH=key_path,
+            RBX_SHOP_WALLET_IP="127.0.0.1",
+            RBX_WALLET_SSH_PORT=self.server.port,
+            RBX_SHOP_ASSETS_FOLDER_PATH=self.remote,
+            RBX_TEMP_PATH=self.local,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def write_remote(self, name, content=b"asset"):
+        path = os.path.join(self.remote, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_transfers_reuse_one_handshake(self):
+        for i in range(10):
+            remote = self.write_remote(f"file-{i}.png", f"{i}".encode())
+            local = scp_down_file(remote)
+            with open(local, "rb") as f:
+                self.assertEqual(f.read(), f"{i}".encode())
+
+            scp_up_file(local, os.path.join(self.remote, f"copy-{i}.png"))
+
+        self.assertTrue(os.path.isfile(os.path.join(self.remote, "copy-9.png")))
+        self.assertEqual(self.server.handshakes, 1)
+
+    def test_folder_pull_downloads_every_file_on_one_connection(self):
+        names = [f"sc1/thumbs/{i}.png" for i in range(8)] + ["sc1/thumbs/a/b.txt"]
+        for name in names:
+            self.write_remote(name, name.encode())
+
+        for _ in range(3):
+            local = scp_down_folder("sc1/thumbs", "http://127.0.0.1:7292")
+
+        for name in names:
+            path = os.path.join(local, name[len("sc1/thumbs/") :])
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), name.encode())
+        self.assertEqual(self.server.handshakes, 1)
+
+    def test_broken_connection_is_replaced(self):
+        remote = self.write_remote("file.png")
+        scp_down_file(remote)
+
+        self.server.drop_connections()
+        scp_down_file(remote)
+
+        self.assertEqual(self.server.handshakes, 2)
+
+    @override_settings(RBX_SFTP_IDLE_TIMEOUT=-1)
+    def test_idle_connections_are_evicted(self):
+        remote = self.write_remote("file.png")
+        scp_down_file(remote)
+        scp_down_file(remote)
+
+        self.assertEqual(self.server.handshakes, 2)
+
+    @override_settings(AWS_ACCESS_KEY="key", AWS_SECRET_KEY="secret", AWS_BUCKET="b")
+    def test_s3_client_is_reused(self):
+        path = self.write_remote("file.png")
+        with patch("shop.media.boto3.client") as client:
+            s3_client.cache_clear()
+            upload_to_s3("sc:1", path, bucket="b")
+            upload_to_s3("sc:2", path, bucket="b")
+        s3_client.cache_clear()
+
+        self.assertEqual(client.call_count, 1)
+        self.assertEqual(client.return_value.upload_file.call_count, 2)
+
+
+class StubDownload:
+    """A streamed requests response that records how much was read."""
+
+    def __init__(self, content, chunk_size=4):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), self.chunk_size):
+            chunk = self.content[i : i + self.chunk_size]
+            self.read += len(chunk)
+            yield chunk
+
+
+class ThumbnailPreviewTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+        overrides = override_settings(RBX_TEMP_PATH=self.tmp)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.downloads = {}
+        self.renders = []
+
+        def render(path, preview_path):
+            self.renders.append(path)
+            with open(preview_path, "wb") as f:
+                f.write(b"jpeg")
+            return True
+
+        patches = [
+            patch(
+                "shop.thumbnails.requests.get",
+                side_effect=lambda url, **kwargs: self.downloads[url],
+            ),
+            patch.dict("shop.thumbnails.RENDERERS", {"pdf": render}),
+            patch(
+                "shop.thumbnails.upload_to_s3",
+                side_effect=lambda folder, path, bucket: f"s3://{folder}/{path[-9:]}",
+            ),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_identical_assets_are_rendered_once(self):
+        content = f"pdf {time.time()}".encode()
+        self.downloads = {
+            "https://assets/a.pdf": StubDownload(content),
+            "https://assets/b.pdf": StubDownload(content),
+        }
+
+        previews = thumbnail_previews(
+            {
+                "a.pdf": "https://assets/a.pdf",
+                "b.pdf": "https://assets/b.pdf",
+                "c.png": "https://assets/c.png",
+            }
+        )
+
+        self.assertEqual(len(self.renders), 1)
+        self.assertEqual(set(previews), {"a.pdf", "b.pdf"})
+        self.assertEqual(previews["a.pdf"], previews["b.pdf"])
+        # Downloads and previews are removed once uploaded.
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    @override_settings(RBX_THUMBNAIL_MAX_DOWNLOAD=10)
+    def test_oversized_assets_stop_downloading_at_the_limit(self):
+        asset = StubDownload(b"x" * 1000)
+        self.downloads = {"https://assets/big.pdf": asset}
+
+        self.assertEqual(thumbnail_previews({"big.pdf": "https://assets/big.pdf"}), {})
+
+        self.assertEqual(self.renders, [])
+        self.assertLessEqual(asset.read, 12)
+        self.assertEqual(os.listdir(self.tmp), [])
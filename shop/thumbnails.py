@@ -0,0 +1,142 @@
+"""Bounded-memory thumbnail previews for listing assets.
+
+update_thumbnail_previews used to read each asset whole with
+requests.get(url).content, which could be up to the 150MB upload limit. It
+rendered every page of a PDF to keep the first one, and opened a VideoFileClip
+with its audio track to grab one frame without closing it. A few large
+assets on one worker were enough to get the pod OOM-killed. Now each asset is:
+
+- streamed to a temporary folder in CHUNK_SIZE pieces and hashed on the way,
+  stopping once it passes RBX_THUMBNAIL_MAX_DOWNLOAD;
+- looked up by its content hash, so identical assets (the same file on many
+  NFTs, or twice on one) are rendered and uploaded once;
+- rendered at RBX_THUMBNAIL_WIDTH: only the first page of a PDF, and a single
+  frame of a video, which ffmpeg seeks to and scales itself;
+- removed together with its preview once the preview is uploaded, or when
+  rendering fails.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import pdf2image
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from moviepy.video.io.VideoFileClip import VideoFileClip
+from PIL import Image
+
+from shop.media import upload_to_s3
+
+CHUNK_SIZE = 1024 * 1024
+
+# Previews are stored under their content hash, so a preview that drops out of
+# the cache is re-rendered onto the same S3 key rather than a new one.
+PREVIEW_FOLDER = "previews"
+
+
+def download(url: str, folder: str) -> Optional[Tuple[str, str]]:
+    """Stream url into folder. Returns (path, sha256), or None if the asset
+    is larger than RBX_THUMBNAIL_MAX_DOWNLOAD."""
+
+    filename = os.path.basename(urlparse(url).path) or "asset"
+    path = os.path.join(folder, filename)
+    digest = hashlib.sha256()
+    size = 0
+
+    with requests.get(
+        url,
+        stream=True,
+        timeout=(settings.RBX_HTTP_CONNECT_TIMEOUT, settings.RBX_HTTP_READ_TIMEOUT),
+    ) as response:
+        response.raise_for_status()
+
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.RBX_THUMBNAIL_MAX_DOWNLOAD:
+                    logging.error(f"Asset {url} is larger than the download limit")
+                    return None
+
+                digest.update(chunk)
+                f.write(chunk)
+
+    return path, digest.hexdigest()
+
+
+def render_pdf(path: str, preview_path: str) -> bool:
+    images = pdf2image.convert_from_path(
+        path, first_page=1, last_page=1, size=(settings.RBX_THUMBNAIL_WIDTH, None)
+    )
+
+    if len(images) < 1:
+        logging.error(f"No pages rendered for {path}")
+        return False
+
+    images[0].convert("RGB").save(preview_path, "JPEG")
+    return True
+
+
+def render_video(path: str, preview_path: str) -> bool:
+    # target_resolution makes ffmpeg scale the frame, and get_frame seeks
+    # straight to it rather than decoding from the start.
+    with VideoFileClip(
+        path, audio=False, target_resolution=(None, settings.RBX_THUMBNAIL_WIDTH)
+    ) as video:
+        frame = video.get_frame(round(video.duration / 2))
+
+    Image.fromarray(frame).save(preview_path, "JPEG")
+    return True
+
+
+RENDERERS = {
+    "pdf": render_pdf,
+    "mp4": render_video,
+}
+
+
+def preview_for(url: str) -> Optional[str]:
+    """The S3 URL of a preview for the asset at url, or None if the asset
+    type has no preview or it could not be rendered."""
+
+    render = RENDERERS.get(url.split("/")[-1].split(".")[-1].lower())
+    if not render:
+        return None
+
+    with tempfile.TemporaryDirectory(dir=settings.RBX_TEMP_PATH) as folder:
+        downloaded = download(url, folder)
+        if not downloaded:
+            return None
+
+        path, digest = downloaded
+        key = f"{settings.RBX_THUMBNAIL_CACHE_PREFIX}{digest}"
+        preview = cache.get(key)
+        if preview:
+            logging.info(f"Reusing preview of {digest} for {url}")
+            return preview
+
+        preview_path = os.path.join(folder, f"{digest}.jpg")
+        if not render(path, preview_path):
+            return None
+
+        preview = upload_to_s3(PREVIEW_FOLDER, preview_path, bucket=settings.AWS_BUCKET)
+        if preview:
+            cache.set(key, preview, settings.RBX_THUMBNAIL_CACHE_TIMEOUT)
+
+        return preview
+
+
+def thumbnail_previews(asset_urls: Dict[str, str]) -> Dict[str, str]:
+    """Previews for an Nft.asset_urls mapping, keyed by asset name."""
+
+    previews = {}
+    for name, url in asset_urls.items():
+        preview = preview_for(url)
+        if preview:
+            previews[name] = preview
+
+    return previews